@@ -0,0 +1,213 @@
+# Copyright 2020 Palo Alto Networks, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = '''
+---
+author:
+    - Palo Alto Networks techbizdev (@paloaltonetworks)
+httpapi: panos
+short_description: Persistent HttpApi plugin for PAN-OS devices.
+description:
+    - This HttpApi plugin keeps a single authenticated XML API session to a
+      PAN-OS firewall or Panorama open for the duration of the play.
+    - The API key is generated once (or taken from I(api_key)) and the device
+      metadata from C(show system info) is retrieved once and then cached.
+    - Modules in this role use the persistent connection automatically when
+      C(ansible_connection=httpapi) and C(ansible_network_os=panos) are set and
+      no I(provider) / classic connectivity params are given.
+version_added: "2.9"
+options:
+    api_key:
+        description:
+            - The API key to use instead of generating one from
+              C(ansible_user) / C(ansible_password).
+        type: str
+        vars:
+            - name: ansible_httpapi_panos_api_key
+'''
+
+import base64
+import xml.etree.ElementTree as ET
+
+from ansible.module_utils._text import to_bytes, to_text
+from ansible.module_utils.connection import ConnectionError
+from ansible.module_utils.six.moves.urllib.parse import urlencode
+from ansible.plugins.httpapi import HttpApiBase
+
+
+API_PATH = '/api/'
+
+
+class HttpApi(HttpApiBase):
+    def __init__(self, connection):
+        super(HttpApi, self).__init__(connection)
+        self._api_key = None
+        self._device_info = None
+        self._credentials = None
+        self._can_reauth = False
+        self._reauthenticated = False
+
+    def login(self, username, password):
+        """Generates (or loads) the API key for this session."""
+        try:
+            api_key = self.get_option('api_key')
+        except KeyError:
+            api_key = None
+
+        if api_key:
+            self._api_key = api_key
+        elif username and password:
+            self._credentials = (username, password)
+            self._api_key = self._keygen(username, password)
+        else:
+            raise ConnectionError(
+                'Either ansible_httpapi_panos_api_key or username/password is required')
+
+        # Mark the session as authenticated for the connection plugin.
+        self.connection._auth = {'X-PAN-KEY': self._api_key}
+
+    def logout(self):
+        self._api_key = None
+        self._device_info = None
+
+    def update_auth(self, response, response_text):
+        # The API key is stable for the session; nothing to refresh.
+        return None
+
+    def handle_httperror(self, exc):
+        # An invalid key returns 403; regenerate it once per request if we
+        # can.  The request isn't resent here, as its body has the old key;
+        # _send() rebuilds it with the new one instead.
+        if exc.code == 403 and self._credentials is not None and self._can_reauth:
+            self._can_reauth = False
+            self.connection._auth = None
+            self.login(*self._credentials)
+            self._reauthenticated = True
+
+        # Hand the error body back so the module sees the PAN-OS error message.
+        return exc
+
+    def api_key(self):
+        """Returns the API key in use by this session."""
+        if self._api_key is None:
+            self.connection._connect()
+        return self._api_key
+
+    def device_info(self):
+        """Returns the cached device metadata from "show system info".
+
+        Returns:
+            dict: hostname, port, model, version, serial, and multi_vsys.
+        """
+        if self._device_info is None:
+            cmd = '<show><system><info></info></system></show>'
+            root = self._xml_request({'type': 'op', 'cmd': cmd})
+            system = root.find('./result/system')
+            if system is None:
+                raise ConnectionError('Unexpected "show system info" response')
+            # Same default port as the connection's URL.
+            port = self.connection.get_option('port')
+            if not port:
+                port = 443 if self.connection.get_option('use_ssl') else 80
+            self._device_info = {
+                'hostname': self.connection.get_option('host'),
+                'port': port,
+                'model': system.findtext('model'),
+                'version': system.findtext('sw-version'),
+                'serial': system.findtext('serial'),
+                'multi_vsys': system.findtext('multi-vsys') == 'on',
+            }
+
+        return self._device_info
+
+    def send_request(self, query, body=None, headers=None):
+        """Sends one XML API request over the persistent session.
+
+        This mirrors the request that pan.xapi.PanXapi would have made, so
+        the module side can feed the response straight back to pan-python.
+
+        Args:
+            query(dict): The XML API query params.
+            body(str): Base64 encoded body (file imports only).
+            headers(dict): Extra HTTP headers (file imports only).
+
+        Returns:
+            dict: The HTTP status, response headers, and base64 encoded body.
+        """
+        query = dict(query)
+        query.setdefault('key', self.api_key())
+        response, response_data = self._send(query, body, headers)
+
+        return {
+            'status': getattr(response, 'status', None) or response.getcode(),
+            'headers': dict((k.lower(), v) for k, v in response.info().items()),
+            'body': to_text(base64.b64encode(response_data.getvalue())),
+        }
+
+    def _send(self, query, body=None, headers=None):
+        """Sends `query`, and resends it once with a new key after a 403."""
+        self._reauthenticated = False
+        self._can_reauth = True
+        try:
+            response, response_data = self._send_once(query, body, headers)
+        finally:
+            self._can_reauth = False
+
+        if self._reauthenticated:
+            self._reauthenticated = False
+            query = dict(query, key=self._api_key)
+            response, response_data = self._send_once(query, body, headers)
+
+        return response, response_data
+
+    def _send_once(self, query, body=None, headers=None):
+        data = urlencode(query)
+        path = API_PATH
+        kwargs = {'method': 'POST', 'headers': dict(headers or {})}
+        if body is not None:
+            path += '?' + data
+            data = base64.b64decode(body)
+        else:
+            kwargs['headers'].setdefault(
+                'Content-Type', 'application/x-www-form-urlencoded')
+            data = to_bytes(data)
+
+        return self.connection.send(path, data, **kwargs)
+
+    def _keygen(self, username, password):
+        root = self._xml_request(
+            {'type': 'keygen', 'user': username, 'password': password},
+            with_key=False)
+        key = root.findtext('./result/key')
+        if not key:
+            raise ConnectionError('Failed to generate API key')
+        return key
+
+    def _xml_request(self, query, with_key=True):
+        if with_key:
+            query['key'] = self._api_key
+            response, response_data = self._send(query)
+        else:
+            response, response_data = self._send_once(query)
+        try:
+            root = ET.fromstring(response_data.getvalue())
+        except ET.ParseError as e:
+            raise ConnectionError('Failed to parse XML API response: {0}'.format(e))
+        if root.attrib.get('status') != 'success':
+            msg = ' '.join(x.strip() for x in root.itertext() if x.strip())
+            raise ConnectionError(msg or 'XML API request failed')
+        return root
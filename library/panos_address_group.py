@@ -99,17 +99,22 @@ RETURN = '''
 '''
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.network.panos.objects import address_group_argument_spec
+from ansible.module_utils.network.panos.objects import address_group_spec
 from ansible.module_utils.network.panos.panos import get_connection
 
 
 try:
     from pandevice.objects import AddressGroup
-    from pandevice.errors import PanDeviceError
 except ImportError:
     pass
 
 
 def main():
+    argument_spec = address_group_argument_spec()
+    argument_spec.update(
+        commit=dict(type='bool', default=True),
+    )
     helper = get_connection(
         vsys=True,
         device_group=True,
@@ -118,14 +123,7 @@ def main():
         required_one_of=[
             ['static_value', 'dynamic_value'],
         ],
-        argument_spec=dict(
-            name=dict(type='str', required=True),
-            static_value=dict(type='list'),
-            dynamic_value=dict(),
-            description=dict(),
-            tag=dict(type='list'),
-            commit=dict(type='bool', default=True),
-        ),
+        argument_spec=argument_spec,
     )
     mutually_exclusive = [
         ['static_value', 'dynamic_value']
@@ -142,29 +140,17 @@ def main():
     parent = helper.get_pandevice_parent(module)
 
     # Object params.
-    spec = {
-        'name': module.params['name'],
-        'static_value': module.params['static_value'],
-        'dynamic_value': module.params['dynamic_value'],
-        'description': module.params['description'],
-        'tag': module.params['tag'],
-    }
+    spec = address_group_spec(module.params)
 
     # Other info.
     commit = module.params['commit']
 
-    # Retrieve current info.
-    try:
-        listing = AddressGroup.refreshall(parent, add=False)
-    except PanDeviceError as e:
-        module.fail_json(msg='Failed refresh: {0}'.format(e))
-
     # Build the object based on the user spec.
     obj = AddressGroup(**spec)
     parent.add(obj)
 
     # Apply the state.
-    changed = helper.apply_state(obj, listing, module)
+    changed = helper.apply_state(obj, None, module)
 
     # Commit.
     if commit and changed:
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#  Copyright 2020 Palo Alto Networks, Inc
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+ANSIBLE_METADATA = {'metadata_version': '1.1',
+                    'status': ['preview'],
+                    'supported_by': 'community'}
+
+
+DOCUMENTATION = '''
+---
+module: panos_address_object_bulk
+short_description: Declaratively manage many address objects at once.
+description:
+    - Makes the address objects of a vsys or device group match the given
+      list of objects.
+    - The existing objects are read once and indexed by name, the creates,
+      updates, and deletes needed are worked out locally, and then sent as
+      batched (multi-config) requests.
+    - Each object takes the same options as M(panos_address_object).
+author:
+    - Garfield Lee Freeman (@shinmog)
+version_added: "2.9"
+requirements:
+    - pan-python can be obtained from PyPI U(https://pypi.python.org/pypi/pan-python)
+    - pandevice can be obtained from PyPI U(https://pypi.python.org/pypi/pandevice)
+notes:
+    - Checkmode is supported, and returns the changes that would be made.
+    - Diff mode is supported.
+    - Panorama is supported.
+extends_documentation_fragment:
+    - panos.transitional_provider
+    - panos.vsys
+    - panos.device_group
+options:
+    objects:
+        description:
+            - The desired address objects.
+            - Each object has the same options as M(panos_address_object),
+              with the same defaults; I(name) and I(value) are required.
+        type: list
+    src:
+        description:
+            - Path to a file with the desired address objects, either as a
+              JSON list or as JSON lines (one object per line).
+            - The file is read by the host running the module, which is the
+              Ansible controller when using C(connection: local).
+            - Mutually exclusive with I(objects).
+    purge:
+        description:
+            - Delete the address objects that are not in I(objects) or I(src).
+            - Deleting an object that is still in use fails the batch.
+        type: bool
+        default: false
+    batch_size:
+        description:
+            - The max number of creates, updates, and deletes sent in each
+              request.
+        type: int
+        default: 1000
+    commit:
+        description:
+            - Commit configuration if changed.
+        type: bool
+        default: true
+'''
+
+EXAMPLES = '''
+- name: Manage the address objects from a vars file
+  panos_address_object_bulk:
+    provider: '{{ provider }}'
+    objects:
+      - name: 'web-1'
+        value: '10.1.1.10'
+        tag: ['web']
+      - name: 'web-pool'
+        address_type: 'ip-range'
+        value: '10.1.1.100-10.1.1.199'
+
+- name: Make the address objects match a file exported from the IPAM
+  panos_address_object_bulk:
+    provider: '{{ provider }}'
+    src: 'files/addresses.jsonl'
+    purge: true
+  check_mode: true
+  register: result
+'''
+
+RETURN = '''
+changes:
+    description: The changes that were (or in check mode, would be) made.
+    returned: success
+    type: complex
+    contains:
+        create:
+            description: Names of the objects created.
+            type: list
+        update:
+            description: The objects updated, with the before / after value of each param that changed.
+            type: list
+        delete:
+            description: Names of the objects deleted.
+            type: list
+diff_summary:
+    description: The number of creates, updates, and deletes.
+    returned: success
+    type: dict
+batch_stats:
+    description: The number of requests and bytes used to make the changes.
+    returned: when changes were made
+    type: dict
+timings:
+    description:
+        - The time taken by each phase, in seconds; I(load) is building the
+          desired objects, I(refresh) is reading the current ones, I(diff)
+          is working out the changes, I(write) is sending them, and
+          I(commit) is the commit.
+    returned: success
+    type: dict
+    sample: {"load": 0.812, "refresh": 2.107, "diff": 0.655, "write": 9.31, "commit": 0}
+'''
+
+import json
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.network.panos.objects import address_object_argument_spec
+from ansible.module_utils.network.panos.objects import address_object_spec
+from ansible.module_utils.network.panos.panos import bulk_diff
+from ansible.module_utils.network.panos.panos import get_connection
+from ansible.module_utils.six import string_types
+
+
+try:
+    from pandevice.errors import PanDeviceError
+    from pandevice.objects import AddressObject
+except ImportError:
+    pass
+
+
+def read_objects(path):
+    """Reads a JSON list or JSON lines file of objects."""
+    with open(path) as fd:
+        data = fd.read()
+
+    if data.lstrip().startswith('['):
+        return json.loads(data)
+
+    return [json.loads(line) for line in data.splitlines() if line.strip()]
+
+
+def validate_params(obj, spec):
+    """Checks one object from a file against `spec` and sets its defaults.
+
+    This mirrors what AnsibleModule does for the suboptions of I(objects).
+
+    Returns:
+        str: The problem with `obj`, or None.
+    """
+    if not isinstance(obj, dict):
+        return 'not a dict'
+
+    unknown = sorted(set(obj) - set(spec))
+    if unknown:
+        return 'unsupported parameters: {0}'.format(', '.join(unknown))
+
+    for key, opts in spec.items():
+        value = obj.get(key)
+        if value is None:
+            if opts.get('required'):
+                return 'missing required parameter: {0}'.format(key)
+            obj[key] = opts.get('default')
+            continue
+        if opts.get('type') == 'list' and isinstance(value, string_types):
+            obj[key] = value = [x.strip() for x in value.split(',')]
+        if 'choices' in opts and value not in opts['choices']:
+            return '{0} must be one of: {1}'.format(key, ', '.join(opts['choices']))
+
+
+def main():
+    helper = get_connection(
+        vsys=True,
+        device_group=True,
+        with_classic_provider_spec=True,
+        required_one_of=[
+            ['objects', 'src'],
+        ],
+        argument_spec=dict(
+            objects=dict(type='list', elements='dict',
+                         options=address_object_argument_spec()),
+            src=dict(type='path'),
+            purge=dict(type='bool', default=False),
+            batch_size=dict(type='int', default=1000),
+            commit=dict(type='bool', default=True),
+        ),
+    )
+    module = AnsibleModule(
+        argument_spec=helper.argument_spec,
+        supports_check_mode=True,
+        required_one_of=helper.required_one_of,
+        mutually_exclusive=[['objects', 'src']],
+    )
+
+    if module.params['batch_size'] < 1:
+        module.fail_json(msg='batch_size must be at least 1')
+
+    # Verify imports, build pandevice object tree.
+    parent = helper.get_pandevice_parent(module)
+    timings = {}
+
+    # Build the desired objects.
+    start = time.time()
+    params_list = module.params['objects']
+    if params_list is None:
+        try:
+            params_list = read_objects(module.params['src'])
+        except (IOError, OSError, ValueError) as e:
+            module.fail_json(msg='Failed to read {0}: {1}'.format(module.params['src'], e))
+        if not isinstance(params_list, list):
+            module.fail_json(msg='{0} is not a list of objects'.format(module.params['src']))
+        spec = address_object_argument_spec()
+        for num, params in enumerate(params_list):
+            problem = validate_params(params, spec)
+            if problem is not None:
+                module.fail_json(msg='Object {0} of {1}: {2}'.format(
+                    num + 1, module.params['src'], problem))
+
+    objs = []
+    seen = set()
+    for params in params_list:
+        if params['value'] is None:
+            module.fail_json(msg='Object "{0}" has no value'.format(params['name']))
+        obj = AddressObject(**address_object_spec(params))
+        if obj.uid in seen:
+            module.fail_json(msg='Object "{0}" is specified more than once'.format(obj.uid))
+        seen.add(obj.uid)
+        parent.add(obj)
+        objs.append(obj)
+    timings['load'] = round(time.time() - start, 3)
+
+    # Retrieve the current objects.
+    start = time.time()
+    try:
+        listing = AddressObject.refreshall(parent, add=False)
+    except PanDeviceError as e:
+        module.fail_json(msg='Failed refresh: {0}'.format(e))
+    timings['refresh'] = round(time.time() - start, 3)
+
+    start = time.time()
+    changed, changes = helper.apply_bulk_state(
+        objs, listing, module,
+        purge=module.params['purge'],
+        batch_size=module.params['batch_size'],
+    )
+    timings['write'] = helper.result_info.get('batch_stats', {}).get('elapsed', 0)
+    timings['diff'] = round(max(time.time() - start - timings['write'], 0), 3)
+
+    # Optional commit.
+    start = time.time()
+    if changed and module.params['commit']:
+        helper.commit(module)
+    timings['commit'] = round(time.time() - start, 3)
+
+    # Done.
+    result = dict(changed=changed, changes=changes, timings=timings)
+    if module._diff:
+        result['diff'] = {'prepared': bulk_diff(changes)}
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
@@ -30,6 +30,11 @@ description:
     - NOTE: The modules in this role are deprecated in favour of the modules in the collection U(https://paloaltonetworks.github.io/pan-os-ansible)
     - Module that will commit the candidate configuration of a PAN-OS device.
     - The new configuration will become active immediately.
+    - If the C(PANOS_DEFER_COMMIT) environment variable is set, other modules
+      in this role record their commits instead of committing.  This module
+      then performs all of the recorded commits for the device at once (one
+      commit, plus one commit-all per device group on Panorama).  Running it
+      as a handler is a convenient way to commit once at the end of the play.
 author:
     - Michael Richardson (@mrichardson03)
     - Garfield Lee Freeman (@shinmog)
@@ -71,10 +76,25 @@ EXAMPLES = '''
   panos_commit:
     provider: '{{ provider }}'
     admins: ['admin1','admin2']
+
+# With PANOS_DEFER_COMMIT set, notify this from the tasks that change config.
+- name: commit all deferred changes
+  panos_commit:
+    provider: '{{ provider }}'
+  listen: commit panos
 '''
 
 RETURN = '''
-# Default return values
+commit:
+    description: How the commit was handled.
+    returned: success
+    type: str
+    sample: "executed"
+commit_requests:
+    description: The number of commit requests (this one plus any deferred ones) performed.
+    returned: success
+    type: int
+    sample: 3
 '''
 
 
@@ -115,7 +135,7 @@ def main():
         module.params['device_group'] = module.params['devicegroup']
 
     helper.get_pandevice_parent(module)
-    changed = helper.commit(
+    changed = helper.flush_commits(
         module,
         include_template=module.params['include_template'],
         admins=module.params['admins'],
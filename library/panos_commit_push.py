@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#  Copyright 2020 Palo Alto Networks, Inc
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+ANSIBLE_METADATA = {'metadata_version': '1.1',
+                    'status': ['preview'],
+                    'supported_by': 'community'}
+
+DOCUMENTATION = '''
+---
+module: panos_commit_push
+short_description: Push Panorama config to many device groups and templates.
+description:
+    - Pushes (commit-all) the running config of Panorama to a list of device
+      groups, templates, and template stacks in parallel.
+    - Each push is its own commit-all job.  Up to I(max_concurrent) jobs are
+      outstanding at once, and all of them are polled together with a single
+      C(show jobs) per I(interval).
+    - As each push or device finishes, a line is written to the module log.
+    - This does not commit the candidate config on Panorama itself; use
+      M(panos_commit) for that first.
+author:
+    - Garfield Lee Freeman (@shinmog)
+version_added: "2.9"
+requirements:
+    - pan-python can be obtained from PyPI U(https://pypi.python.org/pypi/pan-python)
+    - pandevice can be obtained from PyPI U(https://pypi.python.org/pypi/pandevice)
+notes:
+    - Panorama is supported.
+    - Check mode is supported.
+extends_documentation_fragment:
+    - panos.transitional_provider
+options:
+    device_groups:
+        description:
+            - The device groups to push to.
+        type: list
+    templates:
+        description:
+            - The templates to push to.
+        type: list
+    template_stacks:
+        description:
+            - The template stacks to push to.
+        type: list
+    include_template:
+        description:
+            - Include template changes in the device group pushes.
+        type: bool
+    description:
+        description:
+            - The commit-all description.
+    max_concurrent:
+        description:
+            - The max number of commit-all jobs to have outstanding at once.
+        type: int
+        default: 5
+    interval:
+        description:
+            - Seconds between job status polls.
+        type: float
+        default: 5
+    timeout:
+        description:
+            - Seconds to wait for all pushes to finish.
+            - Set to 0 to wait forever.
+        type: int
+        default: 0
+'''
+
+EXAMPLES = '''
+- name: Push to all branch office device groups
+  panos_commit_push:
+    provider: '{{ provider }}'
+    device_groups: '{{ branch_device_groups }}'
+    templates: ['branch-network']
+    max_concurrent: 10
+'''
+
+RETURN = '''
+push:
+    description: The results and timings of the pushes.  Times are in seconds.
+    returned: success
+    type: complex
+    contains:
+        elapsed:
+            description: Total time taken.
+            type: float
+        polls:
+            description: Number of C(show jobs) polls made.
+            type: int
+        failed:
+            description: Number of pushes that did not succeed.
+            type: int
+        pushes:
+            description:
+                - One entry per push, with type, name, job, status, messages,
+                  queued (when it was submitted, relative to the start),
+                  elapsed (from submission until done), and devices.
+                - Each device has serial, name, result, status, and elapsed.
+            type: list
+'''
+
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.network.panos.panos import get_connection
+
+
+def main():
+    helper = get_connection(
+        with_classic_provider_spec=True,
+        min_pandevice_version=(0, 12, 0),
+        firewall_error='This module is for Panorama only',
+        required_one_of=[
+            ['device_groups', 'templates', 'template_stacks'],
+        ],
+        argument_spec=dict(
+            device_groups=dict(type='list'),
+            templates=dict(type='list'),
+            template_stacks=dict(type='list'),
+            include_template=dict(type='bool'),
+            description=dict(),
+            max_concurrent=dict(type='int', default=5),
+            interval=dict(type='float', default=5),
+            timeout=dict(type='int', default=0),
+        ),
+    )
+
+    module = AnsibleModule(
+        argument_spec=helper.argument_spec,
+        supports_check_mode=True,
+        required_one_of=helper.required_one_of,
+    )
+
+    helper.get_pandevice_parent(module)
+
+    changed = helper.push(
+        module,
+        device_groups=module.params['device_groups'],
+        templates=module.params['templates'],
+        template_stacks=module.params['template_stacks'],
+        include_template=module.params['include_template'],
+        description=module.params['description'],
+        max_concurrent=module.params['max_concurrent'],
+        interval=module.params['interval'],
+        timeout=module.params['timeout'],
+    )
+
+    module.exit_json(changed=changed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#  Copyright 2018 Palo Alto Networks, Inc
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+ANSIBLE_METADATA = {'metadata_version': '1.1',
+                    'status': ['preview'],
+                    'supported_by': 'community'}
+
+DOCUMENTATION = '''
+---
+module: panos_dag_members
+short_description: Work out dynamic address group members offline.
+description:
+    - Evaluates the filters of dynamic address groups against the registered
+      IPs and their tags, and returns the IPs in each group.
+    - The registered IPs can be read from the firewall, or given as
+      I(registered_ips), for instance to preview the effect of tags before
+      they are registered.
+    - Filters are parsed once, and the registered IPs are indexed by tag, so
+      each group only costs a few set operations however many IPs there are.
+author:
+    - Garfield Lee Freeman (@shinmog)
+version_added: "2.9"
+requirements:
+    - pan-python can be obtained from PyPI U(https://pypi.python.org/pypi/pan-python)
+    - pandevice can be obtained from PyPI U(https://pypi.python.org/pypi/pandevice)
+notes:
+    - Checkmode is not supported.
+    - Panorama is not supported.
+extends_documentation_fragment:
+    - panos.transitional_provider
+    - panos.vsys
+options:
+    address_groups:
+        description:
+            - The dynamic address groups to evaluate.
+            - If not specified, every dynamic address group is evaluated,
+              unless I(filters) is specified.
+        type: list
+    filters:
+        description:
+            - Filters to evaluate as well, as a dict of name to filter, such
+              as C({"web": "'web' and not 'staging'"}).
+        type: dict
+    registered_ips:
+        description:
+            - IP addresses as keys, tags as values, as returned by
+              M(panos_registered_ip_facts).
+            - If not specified, the registered IPs are read from the firewall.
+        type: dict
+    count_only:
+        description:
+            - Only return the number of members of each group.
+        type: bool
+        default: false
+'''
+
+EXAMPLES = '''
+- name: Get the members of every dynamic address group
+  panos_dag_members:
+    provider: '{{ provider }}'
+  register: result
+
+- name: Preview a new filter against the desired tags
+  panos_dag_members:
+    provider: '{{ provider }}'
+    filters:
+      prod-web: "'web' and 'prod' and not 'quarantine'"
+    registered_ips: '{{ lookup("file", "tags.json") | from_json }}'
+    count_only: true
+'''
+
+RETURN = '''
+members:
+    description: Group names as keys, the sorted member IPs as values.
+    returned: When I(count_only) is false
+    type: dict
+    sample: {"prod-web": ["10.1.1.1", "10.1.1.2"]}
+counts:
+    description: Group names as keys, the number of members as values.
+    returned: always
+    type: dict
+    sample: {"prod-web": 2}
+unknown_tags:
+    description: Group names as keys, the tags their filter uses that no IP has as values.
+    returned: always
+    type: dict
+    sample: {"prod-web": ["quarantine"]}
+stats:
+    description: The number of registered IPs, tags, and groups, and the time to index and evaluate them.
+    returned: always
+    type: dict
+'''
+
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.network.panos.panos import get_connection
+from ansible.module_utils.network.panos.dag import DagFilter
+from ansible.module_utils.network.panos.dag import DagFilterError
+from ansible.module_utils.network.panos.dag import TagIndex
+
+try:
+    from pandevice.errors import PanDeviceError
+    from pandevice.objects import AddressGroup
+except ImportError:
+    pass
+
+
+def main():
+    helper = get_connection(
+        vsys=True,
+        with_classic_provider_spec=True,
+        panorama_error='Panorama is not supported for this module.',
+        argument_spec=dict(
+            address_groups=dict(type='list'),
+            filters=dict(type='dict'),
+            registered_ips=dict(type='dict'),
+            count_only=dict(type='bool', default=False),
+        ),
+    )
+
+    module = AnsibleModule(
+        argument_spec=helper.argument_spec,
+        supports_check_mode=False,
+        required_one_of=helper.required_one_of,
+    )
+
+    device = helper.get_pandevice_parent(module)
+
+    # Gather the filters.
+    filters = {}
+    names = module.params['address_groups']
+    if names or not module.params['filters']:
+        try:
+            listing = AddressGroup.refreshall(device, add=False)
+        except PanDeviceError as e:
+            module.fail_json(msg='Failed refresh: {0}'.format(e))
+        groups = dict((x.name, x.dynamic_value) for x in listing if x.dynamic_value)
+        for name in names or sorted(groups):
+            if name not in groups:
+                module.fail_json(msg='"{0}" is not a dynamic address group'.format(name))
+            filters[name] = groups[name]
+    filters.update(module.params['filters'] or {})
+
+    try:
+        compiled = dict((name, DagFilter(x)) for name, x in filters.items())
+    except DagFilterError as e:
+        module.fail_json(msg='Invalid filter: {0}'.format(e))
+
+    # Index the registered IPs.
+    registered = module.params['registered_ips']
+    if registered is None:
+        try:
+            registered = device.userid.get_registered_ip()
+        except PanDeviceError as e:
+            module.fail_json(msg='Failed get_registered_ip: {0}'.format(e))
+
+    start = time.time()
+    index = TagIndex(registered)
+    index_time = round(time.time() - start, 4)
+
+    # Evaluate the filters.
+    start = time.time()
+    members = dict((name, x.members(index)) for name, x in compiled.items())
+    eval_time = round(time.time() - start, 4)
+
+    ans = dict(
+        changed=False,
+        counts=dict((name, len(x)) for name, x in members.items()),
+        unknown_tags=dict(
+            (name, sorted(x.tags.difference(index.tags)))
+            for name, x in compiled.items()),
+        stats=dict(
+            registered_ips=len(index.ips),
+            tags=len(index.tags),
+            groups=len(compiled),
+            index_time=index_time,
+            eval_time=eval_time,
+        ),
+    )
+    if not module.params['count_only']:
+        ans['members'] = dict((name, sorted(x)) for name, x in members.items())
+
+    module.exit_json(**ans)
+
+
+if __name__ == '__main__':
+    main()
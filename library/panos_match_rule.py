@@ -26,6 +26,9 @@ short_description: Test for match against a security rule on PAN-OS devices or P
 description:
     - NOTE: The modules in this role are deprecated in favour of the modules in the collection U(https://paloaltonetworks.github.io/pan-os-ansible)
     - Security policies allow you to enforce rules and take action, and can be as general or specific as needed.
+    - Many flows can be tested at once with I(flows).  The test commands are
+      run concurrently, and the matched rules are then retrieved with one
+      request per rulebase.
 author: "Robert Hagen (@rnh556)"
 version_added: "2.5"
 requirements:
@@ -52,7 +55,7 @@ options:
     source_ip:
         description:
             - The source IP address.
-        required: true
+            - Required if I(flows) is not specified.
     source_port:
         description:
             - The source port.
@@ -69,11 +72,11 @@ options:
     destination_ip:
         description:
             - The destination IP address.
-        required: true
+            - Required if I(flows) is not specified.
     destination_port:
         description:
             - The destination port.
-        required: true
+            - Required if I(flows) is not specified.
         type: int
     application:
         description:
@@ -81,11 +84,24 @@ options:
     protocol:
         description:
             - The IP protocol number from 1 to 255.
-        required: true
+            - Required if I(flows) is not specified.
         type: int
     category:
         description:
             - URL category
+    flows:
+        description:
+            - Test many flows instead of one.
+            - Each flow has the same options as the single flow params
+              (I(source_zone), I(source_ip), and so on), with the same
+              required ones.
+            - Mutually exclusive with the single flow params.
+        type: list
+    workers:
+        description:
+            - The max number of test commands to run at once for I(flows).
+        type: int
+        default: 5
     vsys_id:
         description:
             - B(Removed)
@@ -157,27 +173,59 @@ EXAMPLES = '''
     protocol: '6'
   register: result
 - debug: msg='{{ result.rule }}'
+
+- name: check many flows at once
+  panos_match_rule:
+    provider: '{{ provider }}'
+    flows:
+      - source_ip: '10.0.0.1'
+        destination_ip: '8.8.8.8'
+        application: 'dns'
+        destination_port: 53
+        protocol: 17
+      - source_ip: '10.0.0.1'
+        destination_ip: '192.168.100.115'
+        destination_port: 22
+        protocol: 6
+  register: result
+- debug: msg='{{ result.results | map(attribute="rule_name") | list }}'
 '''
 
 RETURN = '''
 stdout_lines:
     description: B(DEPRECATED); use "rule" instead
-    returned: always
+    returned: When I(flows) is not specified
     type: str
 rule:
     description: The rule definition, either security rule or NAT rule
-    returned: always
+    returned: When I(flows) is not specified
     type: complex
 rulebase:
     description: Rule location; panorama-pre-rulebase, firewall-rulebase, or panorama-post-rulebase
-    returned: always
+    returned: When I(flows) is not specified
     type: str
+results:
+    description:
+        - The result of each flow, in the same order as I(flows).
+        - Each has I(rule_name), I(rule), and I(rulebase) (all null if no rule
+          matched), I(elapsed) (the seconds the test command took), and
+          I(msg) if the test failed or no rule matched.
+    returned: When I(flows) is specified
+    type: list
+stats:
+    description: The number of flows and workers, the number of rule lookups, and the total time taken.
+    returned: When I(flows) is specified
+    type: dict
 '''
 
 import json
+import time
 
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.network.panos.panos import get_connection
+from ansible.module_utils.network.panos.match import policy_match_cmd
+from ansible.module_utils.network.panos.match import policy_match_rule
+from ansible.module_utils.network.panos.policy import xpath_literal
 
 
 try:
@@ -197,35 +245,154 @@ except ImportError:
     HAS_LIB = False
 
 
+# This module used to refreshall on either the security rules or the NAT
+# rules, however if the rule matched came from Panorama, then this module
+# failed.  To account for this, instead directly query the 3 path locations
+# where the rule could exist, and return that instead.  When pandevice
+# supports querying the firewall for the pushed down Panorama config, change
+# this back to using normal pandevice objects.
+RULE_LOCATIONS = (
+    (
+        'panorama-pre-rulebase',
+        "/config/panorama/vsys/entry[@name='{0}']/pre-rulebase",
+    ),
+    (
+        'firewall-rulebase',
+        "/config/devices/entry[@name='localhost.localdomain']/vsys/entry[@name='{0}']/rulebase",
+    ),
+    (
+        'panorama-post-rulebase',
+        "/config/panorama/vsys/entry[@name='{0}']/post-rulebase",
+    ),
+)
+
+FLOW_PARAMS = (
+    'source_zone', 'source_ip', 'source_port', 'source_user', 'to_interface',
+    'destination_zone', 'destination_ip', 'destination_port', 'application',
+    'protocol', 'category',
+)
+
+REQUIRED_FLOW_PARAMS = ('source_ip', 'destination_ip', 'destination_port', 'protocol')
+
+
+def find_rules(obj, rtype, vsys, names):
+    """Finds the named rules, with one request per rulebase.
+
+    Returns:
+        tuple: A dict of name to (rulebase, rule), and the number of requests.
+    """
+    fw = obj.nearest_pandevice()
+    found = {}
+    requests = 0
+    for rulebase, prefix in RULE_LOCATIONS:
+        wanted = sorted(x for x in names if x not in found)
+        if not wanted:
+            break
+        xpath = prefix.format(vsys) + '/{0}/rules/entry[{1}]'.format(
+            rtype, ' or '.join('@name={0}'.format(xpath_literal(x)) for x in wanted))
+        requests += 1
+        try:
+            ans = fw.xapi.get(xpath)
+        except PanDeviceError as e:
+            if not str(e).startswith('No such node'):
+                raise
+            continue
+        if ans is None:
+            continue
+        for rule in obj.refreshall_from_xml(ans.find('./result')):
+            found[rule.name] = (rulebase, rule)
+
+    return found, requests
+
+
+def match_flows(module, helper, parent, obj):
+    """Tests each flow in the flows param and exits with the results."""
+    rtype = module.params['rule_type']
+    flows = module.params['flows']
+    for num, flow in enumerate(flows):
+        missing = [x for x in REQUIRED_FLOW_PARAMS if flow.get(x) is None]
+        if missing:
+            module.fail_json(msg='Flow {0} is missing: {1}'.format(num, ', '.join(missing)))
+
+    start = time.time()
+    cmds = [policy_match_cmd(x, rtype) for x in flows]
+    responses = helper.run_ops(cmds, parent.vsys, module.params['workers'])
+
+    results = []
+    for cmd, (response, error, elapsed) in zip(cmds, responses):
+        ans = dict(rule_name=None, rule=None, rulebase=None, elapsed=elapsed)
+        if error is not None:
+            ans['msg'] = 'Failed "{0}": {1}'.format(cmd, error)
+        else:
+            ans['rule_name'] = policy_match_rule(response)
+            if ans['rule_name'] is None:
+                ans['msg'] = 'No matching {0} rule'.format(rtype)
+        results.append(ans)
+
+    names = set(x['rule_name'] for x in results if x['rule_name'] is not None)
+    try:
+        found, requests = find_rules(obj, rtype, module.params['vsys'], names)
+    except PanDeviceError as e:
+        module.fail_json(msg='Failed rule lookup: {0}'.format(e))
+
+    for ans in results:
+        if ans['rule_name'] is None:
+            continue
+        if ans['rule_name'] not in found:
+            ans['msg'] = 'Matched "{0}", but wasn\'t in any rulebase'.format(ans['rule_name'])
+            continue
+        ans['rulebase'], rule = found[ans['rule_name']]
+        ans['rule'] = rule.about()
+
+    module.exit_json(
+        changed=False,
+        results=results,
+        stats=dict(
+            flows=len(flows),
+            workers=min(module.params['workers'], len(flows)),
+            lookups=requests,
+            elapsed=round(time.time() - start, 3),
+        ),
+    )
+
+
 def main():
+    flow_spec = dict(
+        source_zone=dict(),
+        source_ip=dict(),
+        source_port=dict(type='int'),
+        source_user=dict(),
+        to_interface=dict(),
+        destination_zone=dict(),
+        destination_ip=dict(),
+        destination_port=dict(type='int'),
+        application=dict(),
+        protocol=dict(type='int'),
+        category=dict(),
+    )
+    argument_spec = dict(
+        rule_type=dict(default='security', choices=['security', 'nat']),
+        flows=dict(type='list', elements='dict', options=flow_spec),
+        workers=dict(type='int', default=5),
+
+        # TODO(gfreeman) - Remove this in the next role release.
+        vsys_id=dict(),
+        rulebase=dict(),
+    )
+    argument_spec.update(flow_spec)
+
     helper = get_connection(
         vsys=True,
         with_classic_provider_spec=True,
         panorama_error='Panorama is not supported',
-        argument_spec=dict(
-            rule_type=dict(default='security', choices=['security', 'nat']),
-            source_zone=dict(),
-            source_ip=dict(required=True),
-            source_port=dict(type='int'),
-            source_user=dict(),
-            to_interface=dict(),
-            destination_zone=dict(),
-            destination_ip=dict(required=True),
-            destination_port=dict(required=True, type='int'),
-            application=dict(),
-            protocol=dict(required=True, type='int'),
-            category=dict(),
-
-            # TODO(gfreeman) - Remove this in the next role release.
-            vsys_id=dict(),
-            rulebase=dict(),
-        ),
+        argument_spec=argument_spec,
     )
 
     module = AnsibleModule(
         argument_spec=helper.argument_spec,
         supports_check_mode=False,
         required_one_of=helper.required_one_of,
+        mutually_exclusive=[['flows', x] for x in FLOW_PARAMS],
     )
 
     # TODO(gfreeman) - Remove this in the next role release.
@@ -238,135 +405,56 @@ def main():
             'Param "rulebase" is deprecated and may safely be removed from your playbook',
             '2.12',
         )
+    if module.params['flows'] is None:
+        missing = [x for x in REQUIRED_FLOW_PARAMS if module.params[x] is None]
+        if missing:
+            module.fail_json(msg='missing required arguments: {0}'.format(', '.join(missing)))
 
     parent = helper.get_pandevice_parent(module)
 
-    params = (
-        ('application', 'application', ['security', ]),
-        ('category', 'category', ['security', ]),
-        ('destination_ip', 'destination', ['security', 'nat']),
-        ('destination_port', 'destination-port', ['security', 'nat']),
-        ('source_zone', 'from', ['security', 'nat']),
-        ('protocol', 'protocol', ['security', 'nat']),
-        ('source_ip', 'source', ['security', 'nat']),
-        ('source_user', 'source-user', ['security', ]),
-        ('destination_zone', 'to', ['security', 'nat']),
-        ('to_interface', 'to-interface', ['nat', ]),
-    )
-
-    cmd = []
     rtype = module.params['rule_type']
     vsys = module.params['vsys']
 
-    # This module used to refreshall on either the security rules or the NAT
-    # rules, however if the rule matched came from Panorama, then this module
-    # failed.  To account for this, instead directly query the 3 path locations
-    # where the rule could exist, and return that instead.  When pandevice
-    # supports querying the firewall for the pushed down Panorama config, change
-    # this back to using normal pandevice objects.
-    rule_locations = (
-        (
-            'panorama-pre-rulebase',
-            "/config/panorama/vsys/entry[@name='{0}']/pre-rulebase",
-        ),
-        (
-            'firewall-rulebase',
-            "/config/devices/entry[@name='localhost.localdomain']/vsys/entry[@name='{0}']/rulebase",
-        ),
-        (
-            'panorama-post-rulebase',
-            "/config/panorama/vsys/entry[@name='{0}']/post-rulebase",
-        ),
-    )
-    suffix = "/{0}/rules/entry[@name='{1}']"
-
     if rtype == 'security':
-        cmd.append('test security-policy-match')
         obj = SecurityRule()
     else:
-        cmd.append('test nat-policy-match')
         obj = NatRule()
     parent.add(obj)
 
-    for ansible_param, cmd_param, rule_types in params:
-        if rtype not in rule_types or module.params[ansible_param] is None:
-            continue
-        cmd.append('{0} "{1}"'.format(cmd_param, module.params[ansible_param]))
+    if module.params['flows'] is not None:
+        match_flows(module, helper, parent, obj)
 
     # Submit the op command with the appropriate test string
-    test_string = ' '.join(cmd)
+    test_string = policy_match_cmd(module.params, rtype)
     try:
         response = helper.device.op(cmd=test_string, vsys=parent.vsys)
     except PanDeviceError as e:
         module.fail_json(msg='Failed "{0}": {1}'.format(test_string, e))
 
-    elm = response.find('./result/rules/entry')
-    elm2 = response.find('./result/msg/line')
-    if elm is not None:
-        try:
-            rule_name = elm.attrib['name']
-        except KeyError:
-            rule_name = elm.text
-    elif elm2 is not None:
-        '''
-        From 8.1 (matching Panorama rule):
-        NOTE: Ending newlines have been truncated to appease codestyle rules.
-
-<response cmd="status" status="success"><result><msg><line><![CDATA["Rule Name; index: 1" {
-        from L3-trust;
-        source [ 10.0.0.1 1.1.1.1 ];
-        source-region none;
-        to L3-untrust;
-        destination [ 8.8.8.8 ];
-        destination-region none;
-        user any;
-        category any;
-        application/service [0:any/tcp/any/21 1:any/tcp/any/22 ];
-        action allow;
-        icmp-unreachable: no
-        terminal yes;
-}
-
-]]></line></msg></result></response>
-        '''
-        rule_name = elm2.text.split(';')[0].split('"')[1].strip()
-    else:
+    rule_name = policy_match_rule(response)
+    if rule_name is None:
         msg = 'No matching {0} rule; resp = {1}'.format(
-            rtype, ET.tostring(response, enoding='utf-8'),
+            rtype, ET.tostring(response, encoding='utf-8'),
         )
         module.exit_json(msg=msg)
 
-    '''
-    Example response (newlines after newlines to appease pycodestyle line length limitations):
-
-    <response cmd="status" status="success"><result><rules>\n
-\t<entry>deny all and log; index: 3</entry>\n
-</rules>\n
-</result></response>
-    '''
-    tokens = rule_name.split(';')
-    if len(tokens) == 2 and tokens[1].startswith(' index: '):
-        rule_name = tokens[0]
+    try:
+        found, _ = find_rules(obj, rtype, vsys, [rule_name])
+    except PanDeviceError as e:
+        module.fail_json(msg='Failed rule lookup: {0}'.format(e))
 
-    fw = obj.nearest_pandevice()
-    for rulebase, prefix in rule_locations:
-        xpath = prefix.format(vsys) + suffix.format(rtype, rule_name)
-        ans = fw.xapi.get(xpath)
-        if ans is None:
-            continue
-        rules = obj.refreshall_from_xml(ans.find('./result'))
-        if rules:
-            x = rules[0]
-            module.deprecate(
-                'The "stdout_lines" output is deprecated; use "rule" instead',
-                '2.12',
-            )
-            module.exit_json(
-                stdout_lines=json.dumps(xmltodict.parse(x.element_str()), indent=2),
-                msg='Rule matched',
-                rule=x.about(),
-                rulebase=rulebase,
-            )
+    if rule_name in found:
+        rulebase, x = found[rule_name]
+        module.deprecate(
+            'The "stdout_lines" output is deprecated; use "rule" instead',
+            '2.12',
+        )
+        module.exit_json(
+            stdout_lines=json.dumps(xmltodict.parse(x.element_str()), indent=2),
+            msg='Rule matched',
+            rule=x.about(),
+            rulebase=rulebase,
+        )
 
     module.fail_json(msg='Matched "{0}" with "{1}", but wasn\'t in any rulebase'.format(rule_name, test_string))
 
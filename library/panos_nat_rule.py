@@ -210,8 +210,10 @@ ANSIBLE_METADATA = {'metadata_version': '1.1',
                     'supported_by': 'community'}
 
 
-from ansible.module_utils.basic import get_exception, AnsibleModule
+from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.network.panos.panos import get_connection
+from ansible.module_utils.network.panos.policy import nat_rule_argument_spec
+from ansible.module_utils.network.panos.policy import nat_rule_spec
 
 
 try:
@@ -221,97 +223,25 @@ except ImportError:
     pass
 
 
-def create_nat_rule(**kwargs):
-    nat_rule = NatRule(
-        name=kwargs['rule_name'],
-        description=kwargs['description'],
-        fromzone=kwargs['source_zone'],
-        source=kwargs['source_ip'],
-        tozone=kwargs['destination_zone'],
-        destination=kwargs['destination_ip'],
-        service=kwargs['service'],
-        to_interface=kwargs['to_interface'],
-        nat_type=kwargs['nat_type']
-    )
-
-    # Source translation: Static IP
-    if kwargs['snat_type'] in ['static-ip'] and kwargs['snat_static_address']:
-        nat_rule.source_translation_type = kwargs['snat_type']
-        nat_rule.source_translation_static_translated_address = kwargs['snat_static_address']
-        # Bi-directional flag set?
-        if kwargs['snat_bidirectional']:
-            nat_rule.source_translation_static_bi_directional = kwargs['snat_bidirectional']
-
-    # Source translation: Dynamic IP and port
-    elif kwargs['snat_type'] in ['dynamic-ip-and-port']:
-        nat_rule.source_translation_type = kwargs['snat_type']
-        nat_rule.source_translation_address_type = kwargs['snat_address_type']
-        # Interface address?
-        if kwargs['snat_interface']:
-            nat_rule.source_translation_interface = kwargs['snat_interface']
-            # Interface IP?
-            if kwargs['snat_interface_address']:
-                nat_rule.source_translation_ip_address = kwargs['snat_interface_address']
-        else:
-            nat_rule.source_translation_translated_addresses = kwargs['snat_dynamic_address']
-
-    # Source translation: Dynamic IP
-    elif kwargs['snat_type'] in ['dynamic-ip']:
-        if kwargs['snat_dynamic_address']:
-            nat_rule.source_translation_type = kwargs['snat_type']
-            nat_rule.source_translation_translated_addresses = kwargs['snat_dynamic_address']
-        else:
-            return False
-
-    # Destination translation
-    if kwargs['dnat_address']:
-        nat_rule.destination_translated_address = kwargs['dnat_address']
-        if kwargs['dnat_port']:
-            nat_rule.destination_translated_port = kwargs['dnat_port']
-
-    # Any tags?
-    if 'tag_val' in kwargs:
-        nat_rule.tag = kwargs['tag_val']
-
-    return nat_rule
-
-
 def main():
+    argument_spec = nat_rule_argument_spec()
+    argument_spec.update(
+        state=dict(default='present', choices=['present', 'absent', 'enable', 'disable']),
+        location=dict(choices=['top', 'bottom', 'before', 'after']),
+        existing_rule=dict(),
+        commit=dict(type='bool', default=True),
+
+        # TODO(gfreeman) - remove later.
+        tag_name=dict(),
+        devicegroup=dict(),
+        operation=dict(),
+    )
     helper = get_connection(
         vsys=True,
         device_group=True,
         rulebase=True,
         error_on_shared=True,
-        argument_spec=dict(
-            rule_name=dict(required=True),
-            description=dict(),
-            nat_type=dict(default='ipv4', choices=['ipv4', 'nat64', 'nptv6']),
-            source_zone=dict(type='list'),
-            source_ip=dict(type='list', default=['any']),
-            destination_zone=dict(),
-            destination_ip=dict(type='list', default=['any']),
-            to_interface=dict(default='any'),
-            service=dict(default='any'),
-            snat_type=dict(choices=['static-ip', 'dynamic-ip-and-port', 'dynamic-ip']),
-            snat_address_type=dict(choices=['interface-address', 'translated-address'], default='interface-address'),
-            snat_static_address=dict(),
-            snat_dynamic_address=dict(type='list'),
-            snat_interface=dict(),
-            snat_interface_address=dict(),
-            snat_bidirectional=dict(type='bool'),
-            dnat_address=dict(),
-            dnat_port=dict(),
-            tag=dict(type='list'),
-            state=dict(default='present', choices=['present', 'absent', 'enable', 'disable']),
-            location=dict(choices=['top', 'bottom', 'before', 'after']),
-            existing_rule=dict(),
-            commit=dict(type='bool', default=True),
-
-            # TODO(gfreeman) - remove later.
-            tag_name=dict(),
-            devicegroup=dict(),
-            operation=dict(),
-        ),
+        argument_spec=argument_spec,
     )
 
     module = AnsibleModule(
@@ -336,26 +266,6 @@ def main():
 
     parent = helper.get_pandevice_parent(module)
 
-    # Get object params.
-    rule_name = module.params['rule_name']
-    description = module.params['description']
-    source_zone = module.params['source_zone']
-    source_ip = module.params['source_ip']
-    destination_zone = module.params['destination_zone']
-    destination_ip = module.params['destination_ip']
-    service = module.params['service']
-    to_interface = module.params['to_interface']
-    nat_type = module.params['nat_type']
-    snat_type = module.params['snat_type']
-    snat_address_type = module.params['snat_address_type']
-    snat_static_address = module.params['snat_static_address']
-    snat_dynamic_address = module.params['snat_dynamic_address']
-    snat_interface = module.params['snat_interface']
-    snat_interface_address = module.params['snat_interface_address']
-    snat_bidirectional = module.params['snat_bidirectional']
-    dnat_address = module.params['dnat_address']
-    dnat_port = module.params['dnat_port']
-
     # Get other info.
     state = module.params['state']
     location = module.params['location']
@@ -365,46 +275,21 @@ def main():
     if location in ('before', 'after') and not existing_rule:
         module.fail_json(msg="'existing_rule' must be specified if location is 'before' or 'after'.")
 
-    # Get the current NAT rules.
-    try:
-        rules = NatRule.refreshall(parent)
-    except PanDeviceError as e:
-        module.fail_json(msg='Failed NAT refreshall: {0}'.format(e))
-
     # Create the desired rule.
-    new_rule = create_nat_rule(
-        rule_name=rule_name,
-        description=description,
-        tag_val=tag_val,
-        source_zone=source_zone,
-        destination_zone=destination_zone,
-        source_ip=source_ip,
-        destination_ip=destination_ip,
-        service=service,
-        to_interface=to_interface,
-        nat_type=nat_type,
-        snat_type=snat_type,
-        snat_address_type=snat_address_type,
-        snat_static_address=snat_static_address,
-        snat_dynamic_address=snat_dynamic_address,
-        snat_interface=snat_interface,
-        snat_interface_address=snat_interface_address,
-        snat_bidirectional=snat_bidirectional,
-        dnat_address=dnat_address,
-        dnat_port=dnat_port
-    )
-
-    if not new_rule:
+    params = dict(module.params, tag=tag_val)
+    rule_spec = nat_rule_spec(params)
+    if rule_spec is None:
         module.fail_json(msg='Incorrect NAT rule params specified; quitting')
+    new_rule = NatRule(**rule_spec)
+    parent.add(new_rule)
 
     # Perform the desired operation.
     changed = False
     if state in ('enable', 'disable'):
-        for rule in rules:
-            if rule.name == new_rule.name:
-                break
-        else:
+        rules = helper.fetch_one(new_rule, module)
+        if not rules:
             module.fail_json(msg='Rule "{0}" not present'.format(new_rule.name))
+        rule = rules[0]
         if state == 'enable' and rule.disabled:
             changed = True
         elif state == 'disable' and not rule.disabled:
@@ -417,8 +302,7 @@ def main():
                 except PanDeviceError as e:
                     module.fail_json(msg='Failed enable: {0}'.format(e))
     else:
-        parent.add(new_rule)
-        changed = helper.apply_state(new_rule, rules, module)
+        changed = helper.apply_state(new_rule, None, module)
         if state == 'present':
             changed |= helper.apply_position(new_rule, location, existing_rule, module)
 
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#  Copyright 2020 Palo Alto Networks, Inc
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+ANSIBLE_METADATA = {'metadata_version': '1.1',
+                    'status': ['preview'],
+                    'supported_by': 'community'}
+
+
+DOCUMENTATION = '''
+---
+module: panos_nat_rule_bulk
+short_description: Declaratively manage many NAT rules at once.
+description:
+    - Makes the NAT rules in a rulebase match the given list of rules.
+    - The rulebase is read once, the creates, updates, deletes, and moves
+      needed are worked out locally, and then sent as batched
+      (multi-config) requests.
+    - Each rule takes the same options as M(panos_nat_rule).
+author:
+    - Garfield Lee Freeman (@shinmog)
+version_added: "2.9"
+requirements:
+    - pan-python can be obtained from PyPI U(https://pypi.python.org/pypi/pan-python)
+    - pandevice can be obtained from PyPI U(https://pypi.python.org/pypi/pandevice)
+notes:
+    - Checkmode is supported, and returns the changes that would be made.
+    - Diff mode is supported.
+    - Panorama is supported.
+extends_documentation_fragment:
+    - panos.transitional_provider
+    - panos.device_group
+    - panos.vsys
+    - panos.rulebase
+options:
+    rules:
+        description:
+            - The desired NAT rules, in order.
+            - Each rule has the same options as M(panos_nat_rule), with
+              the same defaults; I(rule_name) is required.
+        type: list
+        required: true
+    purge:
+        description:
+            - Delete the NAT rules in the rulebase that are not in I(rules).
+        type: bool
+        default: false
+    enforce_order:
+        description:
+            - Move rules so that they are in the same relative order as in
+              I(rules).
+            - Rules not in I(rules) are not moved, but rules in I(rules) may be
+              moved around them.
+            - Only the rules that are out of place are moved.
+        type: bool
+        default: true
+    commit:
+        description:
+            - Commit configuration if changed.
+        type: bool
+        default: true
+'''
+
+EXAMPLES = '''
+- name: Manage the NAT rules of the onboarded tenants
+  panos_nat_rule_bulk:
+    provider: '{{ provider }}'
+    rules:
+      - rule_name: 'tenant-a-web'
+        source_zone: ['untrust']
+        destination_zone: 'untrust'
+        destination_ip: ['203.0.113.10']
+        service: 'service-http'
+        dnat_address: '10.1.0.10'
+      - rule_name: 'outbound'
+        source_zone: ['trust']
+        destination_zone: 'untrust'
+        snat_type: 'dynamic-ip-and-port'
+        snat_interface: 'ethernet1/1'
+
+- name: Show what would change
+  panos_nat_rule_bulk:
+    provider: '{{ provider }}'
+    rules: '{{ nat_rules }}'
+    purge: true
+  check_mode: true
+  register: result
+'''
+
+RETURN = '''
+changes:
+    description: The changes that were (or in check mode, would be) made.
+    returned: success
+    type: complex
+    contains:
+        create:
+            description: Names of the rules created.
+            type: list
+        update:
+            description: The rules updated, with the before / after value of each param that changed.
+            type: list
+        delete:
+            description: Names of the rules deleted.
+            type: list
+        move:
+            description: The moves, each with name, location, and existing_rule.
+            type: list
+diff_summary:
+    description: The number of creates, updates, deletes, and moves.
+    returned: success
+    type: dict
+order_stats:
+    description: The number of rules ordered, moves needed, and moves saved (see M(panos_rule_order)).
+    returned: when I(enforce_order) is true
+    type: dict
+batch_stats:
+    description: The number of requests and bytes used to make the changes.
+    returned: when changes were made
+    type: dict
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.network.panos.panos import get_connection
+from ansible.module_utils.network.panos.policy import nat_rule_argument_spec
+from ansible.module_utils.network.panos.policy import nat_rule_spec
+
+
+try:
+    from pandevice.policies import NatRule
+except ImportError:
+    pass
+
+
+def main():
+    helper = get_connection(
+        vsys=True,
+        device_group=True,
+        rulebase=True,
+        with_classic_provider_spec=True,
+        error_on_shared=True,
+        argument_spec=dict(
+            rules=dict(type='list', elements='dict', required=True,
+                       options=nat_rule_argument_spec()),
+            purge=dict(type='bool', default=False),
+            enforce_order=dict(type='bool', default=True),
+            commit=dict(type='bool', default=True),
+        ),
+    )
+    module = AnsibleModule(
+        argument_spec=helper.argument_spec,
+        supports_check_mode=True,
+        required_one_of=helper.required_one_of,
+    )
+
+    def rule_spec(params):
+        spec = nat_rule_spec(params)
+        if spec is None:
+            module.fail_json(msg='Rule "{0}": dynamic-ip needs snat_dynamic_address'.format(
+                params['rule_name']))
+        return spec
+
+    helper.apply_bulk_rules(module, NatRule, rule_spec)
+
+
+if __name__ == '__main__':
+    main()
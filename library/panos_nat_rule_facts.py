@@ -30,6 +30,8 @@ short_description: Get information about a NAT rule.
 description:
     - NOTE: The modules in this role are deprecated in favour of the modules in the collection U(https://paloaltonetworks.github.io/pan-os-ansible)
     - Get information about one or more NAT rules.
+    - The filters are applied by the device, so only the matching rules are
+      sent back and parsed.
 author: "Garfield Lee Freeman (@shinmog)"
 version_added: "2.9"
 requirements:
@@ -46,21 +48,79 @@ extends_documentation_fragment:
 options:
     listing:
         description:
-            - Return all rules.
-            - Mutually exclusive with rule_name, rule_regex, and uuid.
+            - Return all rules (that pass the filters).
+            - Mutually exclusive with rule_name and uuid.
         type: bool
     rule_name:
         description:
-            - Name of the rule.
-            - Mutually exclusive with rule_regex, listing, and uuid.
+            - Name of the rule; the filters are ignored.
+            - Mutually exclusive with listing and uuid.
     rule_regex:
         description:
-            - A regex to match against the rule name.
-            - Mutually exclusive with rule_name, listing, and uuid.
+            - Only include rules whose name matches this regex.
     uuid:
         description:
-            - Match the given rule UUID (PAN-OS 9.0+).
-            - Mutually exclusive with rule_name, listing, and rule_regex.
+            - Match the given rule UUID (PAN-OS 9.0+); the filters are ignored.
+            - Mutually exclusive with rule_name and listing.
+    tag:
+        description:
+            - Only include rules with any of these tags.
+        type: list
+    zone:
+        description:
+            - Only include rules with any of these as a source or destination
+              zone.
+        type: list
+    address:
+        description:
+            - Only include rules with any of these as a source or destination
+              address.
+            - This is matched against the rule's address members as is; address
+              groups are not expanded and IP addresses are not matched against
+              ranges or subnets.
+        type: list
+    snat_type:
+        description:
+            - Only include rules with any of these source translation types,
+              where C(none) is no source translation.
+        type: list
+        choices:
+            - static-ip
+            - dynamic-ip-and-port
+            - dynamic-ip
+            - none
+    dnat:
+        description:
+            - Only include rules with (true) or without (false) destination
+              translation.
+        type: bool
+    disabled:
+        description:
+            - Only include rules that are disabled (true) or enabled (false).
+        type: bool
+    fields:
+        description:
+            - Only include these params in the I(object) or I(listing)
+              returned, such as C(rule_name) and C(snat_type).
+            - The default is to include all params.
+        type: list
+    output_file:
+        description:
+            - Write the rules to this file as JSON lines (one per line)
+              instead of returning them; only I(path), I(count), I(sha256), and
+              I(total) are returned.
+            - The file is written on the host the module runs on, which is the
+              controller with C(connection: local).
+        type: path
+    offset:
+        description:
+            - Skip this many of the rules.
+        type: int
+        default: 0
+    limit:
+        description:
+            - Return at most this many of the rules.
+        type: int
 '''
 
 EXAMPLES = '''
@@ -81,6 +141,19 @@ EXAMPLES = '''
 
 - debug:
     msg: '{{ res2.object }}'
+
+- name: Get the names and translations of the NAT rules for the dmz zone
+  panos_nat_rule_facts:
+    provider: '{{ provider }}'
+    zone: ['dmz']
+    snat_type: ['static-ip', 'dynamic-ip-and-port']
+    fields: ['rule_name', 'snat_type', 'snat_static_address', 'snat_interface']
+
+- name: Write all NAT rules to a file
+  panos_nat_rule_facts:
+    provider: '{{ provider }}'
+    listing: true
+    output_file: '/tmp/nat-rules.jsonl'
 '''
 
 RETURN = '''
@@ -153,6 +226,22 @@ listing:
     description: List of rules
     returned: When I(listing) or I(rule_regex) is set
     type: list
+total:
+    description: The number of rules found, before I(offset) and I(limit).
+    returned: When I(listing) or I(rule_regex) is set
+    type: int
+path:
+    description: The I(output_file) written.
+    returned: When I(output_file) is specified
+    type: str
+count:
+    description: The number of rules written to I(output_file).
+    returned: When I(output_file) is specified
+    type: int
+sha256:
+    description: The sha256 of I(output_file).
+    returned: When I(output_file) is specified
+    type: str
 '''
 
 
@@ -160,6 +249,10 @@ import re
 
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.network.panos.panos import get_connection
+from ansible.module_utils.network.panos.policy import nat_rule_filter_argument_spec
+from ansible.module_utils.network.panos.policy import nat_rule_filter_matches
+from ansible.module_utils.network.panos.policy import nat_rule_filter_predicate
+from ansible.module_utils.network.panos.policy import xpath_literal
 
 
 try:
@@ -170,21 +263,26 @@ except ImportError:
 
 
 def main():
+    argument_spec = dict(
+        listing=dict(type='bool'),
+        rule_name=dict(),
+        uuid=dict(),
+        fields=dict(type='list'),
+    )
+    argument_spec.update(nat_rule_filter_argument_spec())
+    filters = sorted(nat_rule_filter_argument_spec())
+
     helper = get_connection(
         vsys=True,
         device_group=True,
         rulebase=True,
         with_classic_provider_spec=True,
+        with_output=True,
         error_on_shared=True,
         required_one_of=[
-            ['listing', 'rule_name', 'rule_regex', 'uuid'],
+            ['listing', 'rule_name', 'uuid'] + filters,
         ],
-        argument_spec=dict(
-            listing=dict(type='bool'),
-            rule_name=dict(),
-            rule_regex=dict(),
-            uuid=dict(),
-        ),
+        argument_spec=argument_spec,
     )
 
     module = AnsibleModule(
@@ -213,6 +311,13 @@ def main():
         ('tag', 'tag_val'),
     )
 
+    fields = module.params['fields']
+    if fields is not None:
+        known = helper.to_module_dict(NatRule(), renames)
+        unknown = [x for x in fields if x not in known]
+        if unknown:
+            module.fail_json(msg='Unknown fields: {0}'.format(', '.join(unknown)))
+
     if module.params['rule_name']:
         obj = NatRule(module.params['rule_name'])
         parent.add(obj)
@@ -223,38 +328,37 @@ def main():
 
         module.exit_json(
             changed=False,
-            object=helper.to_module_dict(obj, renames),
+            object=helper.to_module_dict(obj, renames, fields),
         )
 
-    try:
-        listing = NatRule.refreshall(parent)
-    except PanDeviceError as e:
-        module.fail_json(msg='Failed refreshall: {0}'.format(e))
-
     if module.params['uuid']:
-        for x in listing:
-            if x.uuid == module.params['uuid']:
-                module.exit_json(
-                    changed=False,
-                    object=helper.to_module_dict(x, renames),
-                )
-        module.fail_json(msg='No rule with uuid "{0}"'.format(module.params['uuid']))
-
-    ans = []
-    matcher = None
-    if module.params['rule_regex']:
+        listing = helper.fetch_matching(
+            NatRule, parent, module,
+            predicate='@uuid={0}'.format(xpath_literal(module.params['uuid'])))
+        if not listing:
+            module.fail_json(msg='No rule with uuid "{0}"'.format(module.params['uuid']))
+        module.exit_json(
+            changed=False,
+            object=helper.to_module_dict(listing[0], renames, fields),
+        )
+
+    # The name regex is applied to the <entry> elements, so the rules that
+    # don't match are never parsed.
+    name_filter = None
+    if module.params['rule_regex'] is not None:
         try:
-            matcher = re.compile(module.params['rule_regex'])
-        except Exception as e:
-            module.fail_json(msg='Invalid regex: {0}'.format(e))
+            name_filter = re.compile(module.params['rule_regex']).search
+        except re.error as e:
+            module.fail_json(msg='Invalid rule_regex: {0}'.format(e))
 
-    ans = [
-        helper.to_module_dict(x, renames)
-        for x in listing
-        if module.params['listing'] or matcher.search(x.uid) is not None
-    ]
+    listing = helper.fetch_matching(
+        NatRule, parent, module,
+        predicate=nat_rule_filter_predicate(module.params),
+        name_filter=name_filter)
+    listing = [x for x in listing if nat_rule_filter_matches(module.params, x)]
 
-    module.exit_json(changed=False, listing=ans)
+    helper.exit_listing(
+        module, 'listing', listing, lambda x: helper.to_module_dict(x, renames, fields))
 
 
 if __name__ == '__main__':
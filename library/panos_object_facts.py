@@ -71,6 +71,23 @@ options:
             - Type of object to retrieve.
         choices: ['address', 'address-group', 'service', 'service-group', 'tag']
         default: 'address'
+    output_file:
+        description:
+            - Write the objects to this file as JSON lines (one per line)
+              instead of returning them; only I(path), I(count), I(sha256), and
+              I(total) are returned.
+            - The file is written on the host the module runs on, which is the
+              controller with C(connection: local).
+        type: path
+    offset:
+        description:
+            - Skip this many of the objects.
+        type: int
+        default: 0
+    limit:
+        description:
+            - Return at most this many of the objects.
+        type: int
 '''
 
 EXAMPLES = '''
@@ -103,17 +120,42 @@ EXAMPLES = '''
     field_search_type: 'exact'
     field_search_value: 'addy1'
   register: result
+
+- name: Write the second page of 500 address objects to a file
+  panos_object_facts:
+    provider: '{{ provider }}'
+    name_regex: '.*'
+    object_type: 'address'
+    output_file: '/tmp/addresses-2.jsonl'
+    offset: 500
+    limit: 500
 '''
 
 RETURN = '''
 ansible_module_results:
     description: Dict containing object attributes.  Empty if object is not found.
-    returned: when "name" is specified
+    returned: when "name" is specified and I(output_file) is not
     type: dict
 objects:
     description: List of object dicts.
-    returned: always
+    returned: When I(output_file) is not specified
     type: list
+total:
+    description: The number of objects found, before I(offset) and I(limit).
+    returned: always
+    type: int
+path:
+    description: The I(output_file) written.
+    returned: When I(output_file) is specified
+    type: str
+count:
+    description: The number of objects written to I(output_file).
+    returned: When I(output_file) is specified
+    type: int
+sha256:
+    description: The sha256 of I(output_file).
+    returned: When I(output_file) is specified
+    type: str
 '''
 
 import re
@@ -197,6 +239,7 @@ def main():
         vsys=True,
         device_group=True,
         with_classic_provider_spec=True,
+        with_output=True,
         required_one_of=[name_params, ],
         argument_spec=dict(
             name=dict(),
@@ -226,21 +269,20 @@ def main():
         module.fail_json(msg='Failed {0} refresh: {1}'.format(object_type, e))
 
     results = {}
-    ans_objects = []
+    matching = []
     if module.params['name'] is not None:
         obj = parent.find(module.params['name'], obj_type)
         if obj:
             results = colorize(obj, object_type)
-            ans_objects.append(results)
+            matching.append(obj)
     elif module.params['name_regex']:
         try:
             matcher = re.compile(module.params['name_regex'])
         except Exception as e:
             module.fail_json(msg='Invalid regex: {0}'.format(e))
 
-        ans_objects = [
-            colorize(x, object_type)
-            for x in obj_listing
+        matching = [
+            x for x in obj_listing
             if matcher.search(x.uid) is not None
         ]
     else:
@@ -252,9 +294,8 @@ def main():
 
         # Perform requested search type.
         if module.params['field_search_type'] == 'exact':
-            ans_objects = [
-                colorize(x, object_type)
-                for x in obj_listing
+            matching = [
+                x for x in obj_listing
                 if matches(x, module.params['field'], exact=module.params['field_search_value'])
             ]
         elif module.params['field_search_type'] == 'regex':
@@ -263,14 +304,15 @@ def main():
             except Exception as e:
                 module.fail_json(msg='Invalid field regex: {0}'.format(e))
 
-            ans_objects = [
-                colorize(x, object_type)
-                for x in obj_listing
+            matching = [
+                x for x in obj_listing
                 if matches(x, module.params['field'], regex=regex)
             ]
 
     # Done.
-    module.exit_json(changed=False, ansible_module_results=results, objects=ans_objects)
+    helper.exit_listing(
+        module, 'objects', matching, lambda x: colorize(x, object_type),
+        ansible_module_results=results)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#  Copyright 2020 Palo Alto Networks, Inc
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+ANSIBLE_METADATA = {'metadata_version': '1.1',
+                    'status': ['preview'],
+                    'supported_by': 'community'}
+
+
+DOCUMENTATION = '''
+---
+module: panos_object_group_bulk
+short_description: Declaratively manage many address groups and service groups at once.
+description:
+    - Makes the address groups and / or service groups of a vsys or device
+      group match the given lists of groups.
+    - The groups can be given in any order.  They are sorted so that nested
+      groups are created or updated before the groups that contain them,
+      and purged groups are deleted before the groups they contain.
+    - The existing groups are read once, the creates, updates, and deletes
+      needed are worked out locally, and then all of them are sent in as
+      few batched (multi-config) requests as I(batch_size) allows.
+    - Each group takes the same options as M(panos_address_group) or
+      M(panos_service_group).
+author:
+    - Garfield Lee Freeman (@shinmog)
+version_added: "2.9"
+requirements:
+    - pan-python can be obtained from PyPI U(https://pypi.python.org/pypi/pan-python)
+    - pandevice can be obtained from PyPI U(https://pypi.python.org/pypi/pandevice)
+notes:
+    - Checkmode is supported, and returns the changes that would be made.
+    - Diff mode is supported.
+    - Panorama is supported.
+    - The address objects and services that the groups contain must already
+      exist (see M(panos_address_object_bulk)).
+extends_documentation_fragment:
+    - panos.transitional_provider
+    - panos.vsys
+    - panos.device_group
+options:
+    address_groups:
+        description:
+            - The desired address groups.
+            - Each group has the same options as M(panos_address_group); one
+              of I(static_value) or I(dynamic_value) is required.
+            - If not given, address groups are left alone.
+        type: list
+    service_groups:
+        description:
+            - The desired service groups.
+            - Each group has the same options as M(panos_service_group).
+            - If not given, service groups are left alone.
+        type: list
+    purge:
+        description:
+            - Delete the groups that are not in I(address_groups) or
+              I(service_groups).
+            - Only the types of group that are given are purged.
+        type: bool
+        default: false
+    batch_size:
+        description:
+            - The max number of creates, updates, and deletes sent in each
+              request.
+        type: int
+        default: 1000
+    commit:
+        description:
+            - Commit configuration if changed.
+        type: bool
+        default: true
+'''
+
+EXAMPLES = '''
+- name: Manage the address and service groups from a vars file
+  panos_object_group_bulk:
+    provider: '{{ provider }}'
+    address_groups:
+      - name: 'all-web'
+        static_value: ['web-dmz', 'web-internal']
+      - name: 'web-dmz'
+        static_value: ['web-1', 'web-2']
+      - name: 'web-internal'
+        static_value: ['web-3']
+    service_groups:
+      - name: 'web-ports'
+        value: ['service-http', 'service-https']
+
+- name: Make the address groups match the IPAM, deleting the rest
+  panos_object_group_bulk:
+    provider: '{{ provider }}'
+    address_groups: '{{ ipam_groups }}'
+    purge: true
+  check_mode: true
+  register: result
+'''
+
+RETURN = '''
+changes:
+    description:
+        - The changes that were (or in check mode, would be) made, for
+          I(address_groups) and I(service_groups).
+        - Creates and updates are listed in the order they were made
+          (members first), deletes likewise (containing groups first).
+    returned: success
+    type: complex
+    contains:
+        create:
+            description: Names of the groups created.
+            type: list
+        update:
+            description: The groups updated, with the before / after value of each param that changed.
+            type: list
+        delete:
+            description: Names of the groups deleted.
+            type: list
+    sample: {"address_groups": {"create": ["web-dmz", "all-web"], "update": [], "delete": []}}
+diff_summary:
+    description: The number of creates, updates, and deletes, for I(address_groups) and I(service_groups).
+    returned: success
+    type: dict
+batch_stats:
+    description: The number of requests and bytes used to make the changes.
+    returned: when changes were made
+    type: dict
+cycle:
+    description: The groups that contain themselves, from the first to the repeated one.
+    returned: when the groups contain a cycle
+    type: list
+    sample: ["a", "b", "c", "a"]
+'''
+
+from collections import OrderedDict
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.network.panos.match import GroupCycleError
+from ansible.module_utils.network.panos.objects import address_group_argument_spec
+from ansible.module_utils.network.panos.objects import address_group_spec
+from ansible.module_utils.network.panos.objects import dependency_order
+from ansible.module_utils.network.panos.objects import service_group_argument_spec
+from ansible.module_utils.network.panos.objects import service_group_spec
+from ansible.module_utils.network.panos.panos import bulk_diff
+from ansible.module_utils.network.panos.panos import get_connection
+
+
+try:
+    from pandevice.errors import PanDeviceError
+    from pandevice.objects import AddressGroup
+    from pandevice.objects import ServiceGroup
+except ImportError:
+    pass
+
+
+def ordered_groups(groups, attr, kind):
+    """Returns `groups` (a list of pandevice groups) with members first.
+
+    Raises:
+        GroupCycleError
+    """
+    members = OrderedDict((x.uid, getattr(x, attr)) for x in groups)
+    lookup = dict((x.uid, x) for x in groups)
+    return [lookup[x] for x in dependency_order(members, kind)]
+
+
+def main():
+    helper = get_connection(
+        vsys=True,
+        device_group=True,
+        with_classic_provider_spec=True,
+        required_one_of=[
+            ['address_groups', 'service_groups'],
+        ],
+        argument_spec=dict(
+            address_groups=dict(type='list', elements='dict',
+                                options=address_group_argument_spec()),
+            service_groups=dict(type='list', elements='dict',
+                                options=service_group_argument_spec()),
+            purge=dict(type='bool', default=False),
+            batch_size=dict(type='int', default=1000),
+            commit=dict(type='bool', default=True),
+        ),
+    )
+    module = AnsibleModule(
+        argument_spec=helper.argument_spec,
+        supports_check_mode=True,
+        required_one_of=helper.required_one_of,
+    )
+
+    if module.params['batch_size'] < 1:
+        module.fail_json(msg='batch_size must be at least 1')
+
+    # Verify imports, build pandevice object tree.
+    parent = helper.get_pandevice_parent(module)
+    purge = module.params['purge']
+
+    # (param, pandevice class, spec function, members attribute, group kind)
+    group_types = (
+        ('address_groups', AddressGroup, address_group_spec, 'static_value', 'address-group'),
+        ('service_groups', ServiceGroup, service_group_spec, 'value', 'service-group'),
+    )
+
+    # Build the desired groups, members first, and the current groups,
+    # containing groups first.
+    plans = []
+    for param, cls, spec_func, attr, kind in group_types:
+        if module.params[param] is None:
+            continue
+
+        groups = []
+        seen = set()
+        for params in module.params[param]:
+            if param == 'address_groups' and (
+                    (params['static_value'] is None) == (params['dynamic_value'] is None)):
+                module.fail_json(msg='Address group "{0}" needs one of static_value or dynamic_value'.format(
+                    params['name']))
+            obj = cls(**spec_func(params))
+            if obj.uid in seen:
+                module.fail_json(msg='Group "{0}" is specified more than once'.format(obj.uid))
+            seen.add(obj.uid)
+            groups.append(obj)
+
+        try:
+            groups = ordered_groups(groups, attr, kind)
+        except GroupCycleError as e:
+            module.fail_json(msg='{0}'.format(e), cycle=list(e.path))
+        for obj in groups:
+            parent.add(obj)
+
+        try:
+            listing = cls.refreshall(parent, add=False)
+        except PanDeviceError as e:
+            module.fail_json(msg='Failed refresh: {0}'.format(e))
+
+        try:
+            listing = ordered_groups(listing, attr, kind)[::-1]
+        except GroupCycleError:
+            # PAN-OS doesn't allow this, so just keep the config's order.
+            pass
+
+        if purge:
+            current = set(x.uid for x in listing)
+            for obj in groups:
+                for name in getattr(obj, attr) or ():
+                    if name in current and name not in seen:
+                        module.fail_json(msg='Group "{0}" is a member of "{1}", but would be purged'.format(
+                            name, obj.uid))
+
+        plans.append((param, groups, listing))
+
+    # Apply all of the changes as one batch.
+    if not module.check_mode:
+        helper.start_batch(max_ops=module.params['batch_size'])
+
+    changed = False
+    changes = {}
+    summary = {}
+    for param, groups, listing in plans:
+        needed, changes[param] = helper.apply_bulk_state(
+            groups, listing, module, purge=purge)
+        summary[param] = dict((k, len(v)) for k, v in changes[param].items())
+        changed = changed or needed
+
+    helper.flush_batch(module)
+    helper.result_info['diff_summary'] = summary
+
+    # Optional commit.
+    if changed and module.params['commit']:
+        helper.commit(module)
+
+    # Done.
+    result = dict(changed=changed, changes=changes)
+    if module._diff:
+        result['diff'] = {'prepared': ''.join(
+            '# {0}\n{1}'.format(param, bulk_diff(changes[param]))
+            for param, _, _ in plans if any(changes[param].values()))}
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
@@ -92,7 +92,6 @@ from ansible.module_utils.network.panos.panos import get_connection
 
 
 try:
-    from pandevice.errors import PanDeviceError
     from pandevice.objects import SecurityProfileGroup
 except ImportError:
     pass
@@ -129,12 +128,6 @@ def main():
     # Other info.
     commit = module.params['commit']
 
-    # Retrieve current profiles.
-    try:
-        listing = SecurityProfileGroup.refreshall(parent, add=False)
-    except PanDeviceError as e:
-        module.fail_json(msg='Failed refresh: {0}'.format(e))
-
     spec = {
         'name': module.params['pg_name'],
         'virus': module.params['virus'],
@@ -149,7 +142,7 @@ def main():
     parent.add(obj)
 
     # Apply the state.
-    changed = helper.apply_state(obj, listing, module)
+    changed = helper.apply_state(obj, None, module)
 
     # Optional commit.
     if changed and commit:
@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#  Copyright 2020 Palo Alto Networks, Inc
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+ANSIBLE_METADATA = {'metadata_version': '1.1',
+                    'status': ['preview'],
+                    'supported_by': 'community'}
+
+
+DOCUMENTATION = '''
+---
+module: panos_policy_match
+short_description: Find the security or NAT rule that each of many flows matches, offline.
+description:
+    - Reads the security (or NAT) rules and the address, service, and
+      application objects they use from the device once, then finds the
+      first rule each flow matches locally, without a
+      C(test security-policy-match) (or C(test nat-policy-match)) per flow.
+    - On a firewall, the rules and objects pushed from Panorama are included;
+      on Panorama, the pre and post rules of I(device_group) are used, with
+      the shared pre rules before them and the shared post rules after them.
+    - Security rules are matched on zones, addresses (including negation),
+      source user, application, URL category, and service.
+    - NAT rules are matched on zones, egress interface, addresses, and
+      service, and the source and destination translation of each flow is
+      returned.  The translated address is worked out when it is a single
+      address, or an offset into a translated subnet or range the same size
+      as the original one; otherwise only the translated pool is returned.
+    - C(application-default) is treated as C(any) service, users are not
+      expanded into their groups, and rules that refer to things that can't
+      be resolved offline (FQDN or wildcard address objects, dynamic address
+      groups, EDLs, regions, and application filters) are matched without
+      those members.  Results that these rules may affect, and matches of
+      flows with a I(destination_port) on an C(application-default) rule,
+      are flagged as I(uncertain); use I(cross_check) to compare a sample of
+      the flows with the device.
+author:
+    - Garfield Lee Freeman (@shinmog)
+version_added: "2.9"
+requirements:
+    - pan-python can be obtained from PyPI U(https://pypi.python.org/pypi/pan-python)
+    - pandevice can be obtained from PyPI U(https://pypi.python.org/pypi/pandevice)
+    - ipaddress
+notes:
+    - Checkmode is not supported.
+    - Panorama is supported, but not with I(cross_check).
+extends_documentation_fragment:
+    - panos.transitional_provider
+    - panos.vsys
+    - panos.device_group
+options:
+    rule_type:
+        description:
+            - The type of rules to match.
+        choices:
+            - security
+            - nat
+        default: 'security'
+    flows:
+        description:
+            - The flows to match.
+            - Leaving out a key matches any value for it.
+        type: list
+        required: true
+        suboptions:
+            source_zone:
+                description:
+                    - The source zone.
+            destination_zone:
+                description:
+                    - The destination zone.
+            source_ip:
+                description:
+                    - The source IP address.
+                required: true
+            destination_ip:
+                description:
+                    - The destination IP address.
+                required: true
+            source_port:
+                description:
+                    - The source port.
+                type: int
+            destination_port:
+                description:
+                    - The destination port.
+                type: int
+            protocol:
+                description:
+                    - The IP protocol number.
+                type: int
+            application:
+                description:
+                    - The application.
+            source_user:
+                description:
+                    - The source user.
+            category:
+                description:
+                    - The URL category.
+            to_interface:
+                description:
+                    - The egress interface (NAT only).
+    cross_check:
+        description:
+            - Also run C(test security-policy-match) (or C(test nat-policy-match))
+              on the device for this many of the flows, evenly spaced through
+              I(flows), and report any whose rule differs.
+        type: int
+        default: 0
+'''
+
+EXAMPLES = '''
+- name: Check the flows of the migration spreadsheet
+  panos_policy_match:
+    provider: '{{ provider }}'
+    flows: '{{ lookup("file", "flows.json") | from_json }}'
+    cross_check: 50
+  register: result
+
+- name: Show the flows that are denied
+  debug:
+    msg: '{{ result.results | selectattr("action", "ne", "allow") | list }}'
+
+- name: Check where the migrated hosts are translated to
+  panos_policy_match:
+    provider: '{{ provider }}'
+    rule_type: 'nat'
+    flows:
+      - source_zone: 'trust'
+        destination_zone: 'untrust'
+        source_ip: '10.1.0.77'
+        destination_ip: '8.8.8.8'
+        protocol: 17
+        destination_port: 53
+'''
+
+RETURN = '''
+results:
+    description:
+        - The match for each flow, in the same order as I(flows).
+        - I(rule), I(rulebase), and I(action) are null if no rule matched.
+        - For NAT, there is I(source_translation) and
+          I(destination_translation) instead of I(action); each is null if
+          the rule does not translate it, or has the I(type), the translated
+          I(address) (null if it can't be worked out), and the translated
+          I(pool).  The destination translation also has the translated
+          I(port).
+        - I(uncertain) is true if a rule with unresolved members comes
+          before (or is) the match, or if the flow has a I(destination_port)
+          and the match uses the C(application-default) service.
+    returned: success
+    type: list
+    sample: [{"rule": "Allow web", "rulebase": "firewall-rulebase", "action": "allow", "index": 3, "uncertain": false}]
+stats:
+    description:
+        - The number of rules, objects, and flows, the time to compile the
+          rules and to match the flows, and the unresolved members of each
+          rule.
+    returned: success
+    type: dict
+cross_check:
+    description: The number of flows checked against the device, and the mismatches.
+    returned: When I(cross_check) is set
+    type: complex
+    contains:
+        checked:
+            description: The number of flows checked.
+            type: int
+        mismatches:
+            description: The flows whose rule differs, with the flow index, the offline rule, and the device rule.
+            type: list
+'''
+
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.network.panos.panos import get_connection
+from ansible.module_utils.network.panos.match import HAS_IPADDRESS
+from ansible.module_utils.network.panos.match import NatMatcher
+from ansible.module_utils.network.panos.match import PolicyMatcher
+from ansible.module_utils.network.panos.match import load_policy
+from ansible.module_utils.network.panos.match import policy_match_cmd
+from ansible.module_utils.network.panos.match import policy_match_rule
+
+
+try:
+    from pandevice.errors import PanDeviceError
+except ImportError:
+    pass
+
+
+def main():
+    helper = get_connection(
+        vsys=True,
+        device_group=True,
+        with_classic_provider_spec=True,
+        argument_spec=dict(
+            flows=dict(type='list', elements='dict', required=True, options=dict(
+                source_zone=dict(),
+                destination_zone=dict(),
+                source_ip=dict(required=True),
+                destination_ip=dict(required=True),
+                source_port=dict(type='int'),
+                destination_port=dict(type='int'),
+                protocol=dict(type='int'),
+                application=dict(),
+                source_user=dict(),
+                category=dict(),
+                to_interface=dict(),
+            )),
+            rule_type=dict(default='security', choices=['security', 'nat']),
+            cross_check=dict(type='int', default=0),
+        ),
+    )
+
+    module = AnsibleModule(
+        argument_spec=helper.argument_spec,
+        supports_check_mode=False,
+        required_one_of=helper.required_one_of,
+    )
+
+    if not HAS_IPADDRESS:
+        module.fail_json(msg='Missing ipaddress library')
+
+    parent = helper.get_pandevice_parent(module)
+    device = helper.device
+    is_panorama = hasattr(device, 'refresh_devices')
+    if is_panorama and module.params['cross_check']:
+        module.fail_json(msg='cross_check is not supported on Panorama')
+
+    try:
+        rules, objects = load_policy(device, parent, module.params['rule_type'])
+    except PanDeviceError as e:
+        module.fail_json(msg='Failed to load the policy: {0}'.format(e))
+
+    if module.params['rule_type'] == 'nat':
+        matcher = NatMatcher(rules, objects)
+    else:
+        matcher = PolicyMatcher(rules, objects)
+
+    flows = module.params['flows']
+    start = time.time()
+    try:
+        results = [matcher.result(x) for x in flows]
+    except ValueError as e:
+        module.fail_json(msg='Invalid flow: {0}'.format(e))
+    match_time = round(time.time() - start, 4)
+
+    ans = dict(
+        changed=False,
+        results=results,
+        stats=dict(
+            rules=len(rules),
+            objects=len(objects),
+            flows=len(flows),
+            compile_time=matcher.compile_time,
+            match_time=match_time,
+            unresolved=dict(
+                (rules[idx][1].name, sorted(names))
+                for idx, names in matcher.unresolved.items()),
+        ),
+    )
+
+    count = min(module.params['cross_check'], len(flows))
+    if count > 0:
+        mismatches = []
+        for num in range(count):
+            idx = num * len(flows) // count
+            cmd = policy_match_cmd(flows[idx], module.params['rule_type'])
+            try:
+                response = device.op(cmd=cmd, vsys=parent.vsys)
+            except PanDeviceError as e:
+                module.fail_json(msg='Failed "{0}": {1}'.format(cmd, e))
+            rule = policy_match_rule(response)
+            if rule != results[idx]['rule']:
+                mismatches.append(dict(
+                    flow=idx, offline=results[idx]['rule'], device=rule))
+        ans['cross_check'] = dict(checked=count, mismatches=mismatches)
+
+    module.exit_json(**ans)
+
+
+if __name__ == '__main__':
+    main()
@@ -142,6 +142,10 @@ RETURN = '''
 '''
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.network.panos.match import GroupCycleError
+from ansible.module_utils.network.panos.match import HAS_IPADDRESS
+from ansible.module_utils.network.panos.match import ObjectIndex
+from ansible.module_utils.network.panos.match import address_key
 
 try:
     import pandevice
@@ -150,7 +154,6 @@ try:
     from pandevice import panorama
     from pandevice import objects
     from pandevice import policies
-    import ipaddress
     import xmltodict
     import json
     HAS_LIB = True
@@ -183,118 +186,44 @@ def get_rulebase(device, devicegroup):
     return rulebase
 
 
-def get_object(device, dev_group, obj_name):
-    # Search global address objects
-    match = device.find(obj_name, objects.AddressObject)
-    if match:
-        return match
-
-    # Search global address groups
-    match = device.find(obj_name, objects.AddressGroup)
-    if match:
-        return match
-
-    # Search Panorama device group
-    if isinstance(device, pandevice.panorama.Panorama):
-        # Search device group address objects
-        match = dev_group.find(obj_name, objects.AddressObject)
-        if match:
-            return match
-
-        # Search device group address groups
-        match = dev_group.find(obj_name, objects.AddressGroup)
-        if match:
-            return match
+def build_index(device, dev_group):
+    """Indexes the objects of the device group (if any), then the device."""
+    classes = (
+        ('address', objects.AddressObject),
+        ('address-group', objects.AddressGroup),
+        ('service', objects.ServiceObject),
+        ('service-group', objects.ServiceGroup),
+        ('tag', objects.Tag),
+    )
+    index = ObjectIndex()
+    for parent in (dev_group, device):
+        if parent is not None:
+            index.add_scope(dict(
+                (kind, cls.refreshall(parent, add=False)) for kind, cls in classes))
+    return index
+
+
+def addr_in_members(index, addr, members):
+    key = address_key(addr)
+    for member in members:
+        if key in index.addresses(member)[0]:
+            return True
     return False
 
 
-def addr_in_obj(addr, obj):
-    ip = ipaddress.ip_address(addr)
-    # Process address objects
-    if isinstance(obj, objects.AddressObject):
-        if obj.type == 'ip-netmask':
-            net = ipaddress.ip_network(obj.value)
-            if ip in net:
-                return True
-        if obj.type == 'ip-range':
-            ip_range = obj.value.split('-')
-            lower = ipaddress.ip_address(ip_range[0])
-            upper = ipaddress.ip_address(ip_range[1])
-            if lower < ip < upper:
+def port_in_services(index, orientation, port, protocol, members):
+    port = int(port)
+    for member in members:
+        for svc_protocol, dports, sports in index.services(member)[0]:
+            if protocol and svc_protocol != protocol:
+                continue
+            ports = dports if orientation == 'destination' else sports
+            # No source port means any source port.
+            if ports is None or port in ports:
                 return True
     return False
 
 
-def get_services(device, dev_group, svc_list, obj_list):
-    for svc in svc_list:
-
-        # Search global address objects
-        global_obj_match = device.find(svc, objects.ServiceObject)
-        if global_obj_match:
-            obj_list.append(global_obj_match)
-
-        # Search global address groups
-        global_grp_match = device.find(svc, objects.ServiceGroup)
-        if global_grp_match:
-            get_services(device, dev_group, global_grp_match.value, obj_list)
-
-        # Search Panorama device group
-        if isinstance(device, pandevice.panorama.Panorama):
-
-            # Search device group address objects
-            dg_obj_match = dev_group.find(svc, objects.ServiceObject)
-            if dg_obj_match:
-                obj_list.append(dg_obj_match)
-
-            # Search device group address groups
-            dg_grp_match = dev_group.find(svc, objects.ServiceGroup)
-            if dg_grp_match:
-                get_services(device, dev_group, dg_grp_match.value, obj_list)
-
-    return obj_list
-
-
-def port_in_svc(orientation, port, protocol, obj):
-    # Process address objects
-    if orientation is 'source':
-        for x in obj.source_port.split(','):
-            if '-' in x:
-                port_range = x.split('-')
-                lower = int(port_range[0])
-                upper = int(port_range[1])
-                if (lower <= int(port) <= upper) and (obj.protocol == protocol):
-                    return True
-            else:
-                if port == x and obj.protocol == protocol:
-                    return True
-    elif orientation is 'destination':
-        for x in obj.destination_port.split(','):
-            if '-' in x:
-                port_range = x.split('-')
-                lower = int(port_range[0])
-                upper = int(port_range[1])
-                if (lower <= int(port) <= upper) and (obj.protocol == protocol):
-                    return True
-            else:
-                if port == x and obj.protocol == protocol:
-                    return True
-    return False
-
-
-def get_tag(device, dev_group, tag_name):
-    # Search global address objects
-    match = device.find(tag_name, objects.Tag)
-    if match:
-        return match
-    # Search Panorama device group
-    if isinstance(device, panorama.Panorama):
-        # Search device group address objects
-        match = dev_group.find(tag_name, objects.Tag)
-        if match:
-            return match
-    return False
-
-
 def main():
     argument_spec = dict(
         ip_address=dict(required=True),
@@ -318,7 +247,7 @@ def main():
 
     module.deprecate('This module has been deprecated; use panos_match_rule', '2.12')
 
-    if not HAS_LIB:
+    if not HAS_LIB or not HAS_IPADDRESS:
         module.fail_json(msg='Missing required libraries.')
 
     ip_address = module.params["ip_address"]
@@ -339,30 +268,21 @@ def main():
     # Create the device with the appropriate pandevice type
     device = base.PanDevice.create_from_device(ip_address, username, password, api_key=api_key)
 
-    # Grab the global objects
-    objects.AddressObject.refreshall(device)
-    objects.AddressGroup.refreshall(device)
-    objects.ServiceObject.refreshall(device)
-    objects.ServiceGroup.refreshall(device)
-    objects.Tag.refreshall(device)
-
-    # If Panorama, validate the devicegroup and grab the devicegroup objects
+    # If Panorama, validate the devicegroup
     dev_group = None
     if devicegroup and isinstance(device, panorama.Panorama):
         dev_group = get_devicegroup(device, devicegroup)
         if dev_group:
             device.add(dev_group)
-            objects.AddressObject.refreshall(dev_group)
-            objects.AddressGroup.refreshall(dev_group)
-            objects.ServiceObject.refreshall(dev_group)
-            objects.ServiceGroup.refreshall(dev_group)
-            objects.Tag.refreshall(dev_group)
         else:
             module.fail_json(
                 failed=1,
                 msg='\'%s\' device group not found in Panorama. Is the name correct?' % devicegroup
             )
 
+    # Index the objects once; groups are flattened as they are used.
+    index = build_index(device, dev_group)
+
     # Build the rulebase and produce list
     rulebase = get_rulebase(device, dev_group)
     rulelist = rulebase.children
@@ -370,131 +290,50 @@ def main():
     loose_match = True
 
     # Process each rule
-    for rule in rulelist:
-        hitlist = []
-
-        if source_zone:
-            source_zone_match = False
-            if loose_match and 'any' in rule.fromzone:
-                source_zone_match = True
-            else:
-                for object_string in rule.fromzone:
-                    if object_string == source_zone:
-                        source_zone_match = True
-            hitlist.append(source_zone_match)
-
-        if destination_zone:
-            destination_zone_match = False
-            if loose_match and 'any' in rule.tozone:
-                destination_zone_match = True
-            else:
-                for object_string in rule.tozone:
-                    if object_string == destination_zone:
-                        destination_zone_match = True
-            hitlist.append(destination_zone_match)
-
-        if source_ip:
-            source_ip_match = False
-            if loose_match and 'any' in rule.source:
-                source_ip_match = True
-            else:
-                for object_string in rule.source:
-                    # Get a valid AddressObject or AddressGroup
-                    obj = get_object(device, dev_group, object_string)
-                    # Otherwise the object_string is not an object and should be handled differently
-                    if obj is False:
-                        if '-' in object_string:
-                            obj = ipaddress.ip_address(source_ip)
-                            source_range = object_string.split('-')
-                            source_lower = ipaddress.ip_address(source_range[0])
-                            source_upper = ipaddress.ip_address(source_range[1])
-                            if source_lower <= obj <= source_upper:
-                                source_ip_match = True
-                        else:
-                            if source_ip == object_string:
-                                source_ip_match = True
-                    if isinstance(obj, objects.AddressObject) and addr_in_obj(source_ip, obj):
-                        source_ip_match = True
-                    elif isinstance(obj, objects.AddressGroup) and obj.static_value:
-                        for member_string in obj.static_value:
-                            member = get_object(device, dev_group, member_string)
-                            if addr_in_obj(source_ip, member):
-                                source_ip_match = True
-            hitlist.append(source_ip_match)
-
-        if destination_ip:
-            destination_ip_match = False
-            if loose_match and 'any' in rule.destination:
-                destination_ip_match = True
-            else:
-                for object_string in rule.destination:
-                    # Get a valid AddressObject or AddressGroup
-                    obj = get_object(device, dev_group, object_string)
-                    # Otherwise the object_string is not an object and should be handled differently
-                    if obj is False:
-                        if '-' in object_string:
-                            obj = ipaddress.ip_address(destination_ip)
-                            destination_range = object_string.split('-')
-                            destination_lower = ipaddress.ip_address(destination_range[0])
-                            destination_upper = ipaddress.ip_address(destination_range[1])
-                            if destination_lower <= obj <= destination_upper:
-                                destination_ip_match = True
-                        else:
-                            if destination_ip == object_string:
-                                destination_ip_match = True
-                    if isinstance(obj, objects.AddressObject) and addr_in_obj(destination_ip, obj):
-                        destination_ip_match = True
-                    elif isinstance(obj, objects.AddressGroup) and obj.static_value:
-                        for member_string in obj.static_value:
-                            member = get_object(device, dev_group, member_string)
-                            if addr_in_obj(destination_ip, member):
-                                destination_ip_match = True
-            hitlist.append(destination_ip_match)
-
-        if source_port:
-            source_port_match = False
-            orientation = 'source'
-            if loose_match and (rule.service[0] == 'any'):
-                source_port_match = True
-            elif rule.service[0] == 'application-default':
-                source_port_match = False  # Fix this once apps are supported
-            else:
-                service_list = []
-                service_list = get_services(device, dev_group, rule.service, service_list)
-                for obj in service_list:
-                    if port_in_svc(orientation, source_port, protocol, obj):
-                        source_port_match = True
-                        break
-            hitlist.append(source_port_match)
-
-        if destination_port:
-            destination_port_match = False
-            orientation = 'destination'
-            if loose_match and (rule.service[0] == 'any'):
-                destination_port_match = True
-            elif rule.service[0] == 'application-default':
-                destination_port_match = False  # Fix this once apps are supported
-            else:
-                service_list = []
-                service_list = get_services(device, dev_group, rule.service, service_list)
-                for obj in service_list:
-                    if port_in_svc(orientation, destination_port, protocol, obj):
-                        destination_port_match = True
-                        break
-            hitlist.append(destination_port_match)
-
-        if tag_name:
-            tag_match = False
-            if rule.tag:
-                for object_string in rule.tag:
-                    obj = get_tag(device, dev_group, object_string)
-                    if obj and (obj.name == tag_name):
-                        tag_match = True
-            hitlist.append(tag_match)
-
-        # Add to hit rulebase
-        if False not in hitlist:
-            hitbase.add(rule)
+    try:
+        for rule in rulelist:
+            hitlist = []
+
+            if source_zone:
+                hitlist.append(
+                    (loose_match and 'any' in rule.fromzone) or source_zone in rule.fromzone)
+
+            if destination_zone:
+                hitlist.append(
+                    (loose_match and 'any' in rule.tozone) or destination_zone in rule.tozone)
+
+            if source_ip:
+                hitlist.append(
+                    (loose_match and 'any' in rule.source) or
+                    addr_in_members(index, source_ip, rule.source))
+
+            if destination_ip:
+                hitlist.append(
+                    (loose_match and 'any' in rule.destination) or
+                    addr_in_members(index, destination_ip, rule.destination))
+
+            for orientation, port in (('source', source_port), ('destination', destination_port)):
+                if not port:
+                    continue
+                if loose_match and (rule.service[0] == 'any'):
+                    port_match = True
+                elif rule.service[0] == 'application-default':
+                    port_match = False  # Fix this once apps are supported
+                else:
+                    port_match = port_in_services(
+                        index, orientation, port, protocol, rule.service)
+                hitlist.append(port_match)
+
+            if tag_name:
+                hitlist.append(
+                    tag_name in (rule.tag or []) and
+                    index.find(tag_name, 'tag')[1] is not None)
+
+            # Add to hit rulebase
+            if False not in hitlist:
+                hitbase.add(rule)
+    except GroupCycleError as e:
+        module.fail_json(msg='Failed to resolve the rule objects: {0}'.format(e))
 
     # Dump the hit rulebase
     if hitbase.children:
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#  Copyright 2020 Palo Alto Networks, Inc
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+ANSIBLE_METADATA = {'metadata_version': '1.1',
+                    'status': ['preview'],
+                    'supported_by': 'community'}
+
+
+DOCUMENTATION = '''
+---
+module: panos_rule_hit_count_facts
+short_description: Retrieve rule hit counts and usage timestamps.
+description:
+    - Retrieves the hit count and the first hit, last hit, last reset,
+      creation, and modification timestamps of the rules in a rulebase,
+      joined with the rule names in rulebase order.
+    - The whole rulebase is retrieved with one C(show rule-hit-count) op
+      command; a list of rules is retrieved in batches of 500 rules, several
+      batches at a time.
+author:
+    - Garfield Lee Freeman (@shinmog)
+version_added: "2.9"
+requirements:
+    - pan-python can be obtained from PyPI U(https://pypi.python.org/pypi/pan-python)
+    - pandevice can be obtained from PyPI U(https://pypi.python.org/pypi/pandevice)
+notes:
+    - Checkmode is not supported.
+    - Panorama is not supported.
+    - Requires PAN-OS 8.1 or later.
+extends_documentation_fragment:
+    - panos.transitional_provider
+    - panos.vsys
+options:
+    rule_type:
+        description:
+            - The type of rules.
+        choices:
+            - security
+            - nat
+            - pbf
+        default: 'security'
+    rules:
+        description:
+            - The rules to retrieve.
+            - If not specified, every rule in the rulebase is retrieved.
+        type: list
+    unused_days:
+        description:
+            - Only return the rules that were created over this many days ago
+              and have not been hit in the last this many days (or at all).
+        type: int
+    output_file:
+        description:
+            - Write the rules to this file as JSON lines (one per line)
+              instead of returning them; only I(path), I(count), I(sha256), and
+              I(total) are returned.
+            - The file is written on the host the module runs on, which is the
+              controller with C(connection: local).
+        type: path
+    offset:
+        description:
+            - Skip this many of the rules.
+        type: int
+        default: 0
+    limit:
+        description:
+            - Return at most this many of the rules.
+        type: int
+'''
+
+EXAMPLES = '''
+- name: Get the usage of every security rule
+  panos_rule_hit_count_facts:
+    provider: '{{ provider }}'
+  register: result
+
+- name: Find the NAT rules unused for 90 days
+  panos_rule_hit_count_facts:
+    provider: '{{ provider }}'
+    rule_type: 'nat'
+    unused_days: 90
+'''
+
+RETURN = '''
+rules:
+    description:
+        - The usage of each rule, in rulebase order.
+        - Timestamps are seconds since the epoch, or null if never.
+    returned: When I(output_file) is not set
+    type: list
+    sample:
+        - {"rule_name": "Allow web", "hit_count": 1042, "first_hit": 1590000000, "last_hit": 1600000000,
+           "last_reset": null, "created": 1580000000, "modified": 1580000000}
+missing:
+    description: The rules in I(rules) that are not in the rulebase, or have no hit count.
+    returned: When I(output_file) is not set
+    type: list
+total:
+    description: The number of rules that matched, before I(offset) and I(limit).
+    returned: success
+    type: int
+path:
+    description: The I(output_file) written.
+    returned: When I(output_file) is specified
+    type: str
+count:
+    description: The number of rules written to I(output_file).
+    returned: When I(output_file) is specified
+    type: int
+sha256:
+    description: The sha256 of I(output_file).
+    returned: When I(output_file) is specified
+    type: str
+'''
+
+import time
+import xml.etree.ElementTree as ET
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.network.panos.panos import get_connection
+
+
+try:
+    from pandevice.policies import NatRule, PolicyBasedForwarding, Rulebase, SecurityRule
+except ImportError:
+    pass
+
+
+# The max number of rules per "show rule-hit-count" command.
+BATCH_SIZE = 500
+
+# (response field, result key) of the rule usage.
+HIT_COUNT_FIELDS = (
+    ('hit-count', 'hit_count'),
+    ('first-hit-timestamp', 'first_hit'),
+    ('last-hit-timestamp', 'last_hit'),
+    ('last-reset-timestamp', 'last_reset'),
+    ('rule-creation-timestamp', 'created'),
+    ('rule-modification-timestamp', 'modified'),
+)
+
+
+def hit_count_cmd(vsys, rule_type, names=None):
+    """Returns the "show rule-hit-count" op command XML for `names` (or all)."""
+    root = ET.Element('show')
+    elm = ET.SubElement(root, 'rule-hit-count')
+    elm = ET.SubElement(elm, 'vsys')
+    elm = ET.SubElement(elm, 'vsys-name')
+    elm = ET.SubElement(elm, 'entry', {'name': vsys})
+    elm = ET.SubElement(elm, 'rule-base')
+    elm = ET.SubElement(elm, 'entry', {'name': rule_type})
+    elm = ET.SubElement(elm, 'rules')
+    if names is None:
+        ET.SubElement(elm, 'all')
+    else:
+        elm = ET.SubElement(elm, 'list')
+        for name in names:
+            ET.SubElement(elm, 'member').text = name
+    return ET.tostring(root, encoding='utf-8').decode('utf-8')
+
+
+def parse_hit_counts(response):
+    """Returns a dict of rule name to usage from a "show rule-hit-count" response."""
+    ans = {}
+    for elm in response.findall('./result/rule-hit-count/vsys/entry/rule-base/entry/rules/entry'):
+        info = {}
+        for field, key in HIT_COUNT_FIELDS:
+            text = elm.findtext(field)
+            value = int(text) if text and text.strip().isdigit() else None
+            # A zero timestamp means never.
+            if value == 0 and key != 'hit_count':
+                value = None
+            info[key] = value
+        ans[elm.attrib['name']] = info
+    return ans
+
+
+def main():
+    helper = get_connection(
+        vsys=True,
+        with_classic_provider_spec=True,
+        with_output=True,
+        panorama_error='Panorama is not supported for this module.',
+        min_panos_version=(8, 1, 0),
+        argument_spec=dict(
+            rule_type=dict(default='security', choices=['security', 'nat', 'pbf']),
+            rules=dict(type='list'),
+            unused_days=dict(type='int'),
+        ),
+    )
+
+    module = AnsibleModule(
+        argument_spec=helper.argument_spec,
+        supports_check_mode=False,
+        required_one_of=helper.required_one_of,
+    )
+
+    parent = helper.get_pandevice_parent(module)
+    vsys = parent.vsys or 'vsys1'
+    rule_type = module.params['rule_type']
+    obj_class = {
+        'security': SecurityRule,
+        'nat': NatRule,
+        'pbf': PolicyBasedForwarding,
+    }[rule_type]
+
+    # The rule names, in rulebase order.
+    rulebase = Rulebase()
+    parent.add(rulebase)
+    names = [x.uid for x in helper.fetch_matching(obj_class, rulebase, module, name_only=True)]
+
+    # The hit counts, all at once or in batches.
+    wanted = module.params['rules']
+    if wanted is None:
+        cmds = [hit_count_cmd(vsys, rule_type)]
+    else:
+        present = set(names)
+        todo = [x for x in wanted if x in present]
+        cmds = [
+            hit_count_cmd(vsys, rule_type, todo[x:x + BATCH_SIZE])
+            for x in range(0, len(todo), BATCH_SIZE)]
+
+    counts = {}
+    for cmd, (response, error, _) in zip(cmds, helper.run_ops(cmds, cmd_xml=False)):
+        if error is not None:
+            module.fail_json(msg='Failed "show rule-hit-count": {0}'.format(error))
+        counts.update(parse_hit_counts(response))
+
+    if wanted is not None:
+        wanted = set(wanted)
+        names = [x for x in names if x in wanted]
+    missing = sorted((wanted or set()).difference(counts))
+
+    items = []
+    for name in names:
+        if name in counts:
+            info = {'rule_name': name}
+            info.update(counts[name])
+            items.append(info)
+
+    # Unused since.
+    days = module.params['unused_days']
+    if days is not None:
+        cutoff = time.time() - days * 86400
+        items = [
+            x for x in items
+            if (x['created'] is None or x['created'] < cutoff) and
+            (not x['hit_count'] or x['last_hit'] is None or x['last_hit'] < cutoff)]
+
+    helper.exit_listing(module, 'rules', items, lambda x: x, missing=missing)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#  Copyright 2020 Palo Alto Networks, Inc
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+ANSIBLE_METADATA = {'metadata_version': '1.1',
+                    'status': ['preview'],
+                    'supported_by': 'community'}
+
+
+DOCUMENTATION = '''
+---
+module: panos_rule_order
+short_description: Enforce the order of rules in a rulebase.
+description:
+    - Moves security, NAT, or policy based forwarding rules so that they are
+      in the given relative order.
+    - Only the rules that are out of place are moved; the rules that are
+      already in the longest run of correctly ordered rules stay put.
+    - Rules not listed in I(rules) are not moved.
+author:
+    - Garfield Lee Freeman (@shinmog)
+version_added: "2.9"
+requirements:
+    - pan-python can be obtained from PyPI U(https://pypi.python.org/pypi/pan-python)
+    - pandevice can be obtained from PyPI U(https://pypi.python.org/pypi/pandevice)
+notes:
+    - Checkmode is supported.
+    - Panorama is supported.
+extends_documentation_fragment:
+    - panos.transitional_provider
+    - panos.device_group
+    - panos.vsys
+    - panos.rulebase
+options:
+    rule_type:
+        description:
+            - The type of rules to order.
+        choices:
+            - security
+            - nat
+            - pbf
+        default: 'security'
+    rules:
+        description:
+            - The rule names, in the desired order.
+        type: list
+        required: true
+    commit:
+        description:
+            - Commit configuration if changed.
+        type: bool
+        default: true
+'''
+
+EXAMPLES = '''
+- name: Put the NAT rules in order
+  panos_rule_order:
+    provider: '{{ provider }}'
+    rule_type: 'nat'
+    rules: ['no-nat-vpn', 'inbound-web', 'outbound-pat']
+
+- name: Order Panorama post-rules
+  panos_rule_order:
+    provider: '{{ provider }}'
+    device_group: 'branches'
+    rulebase: 'post-rulebase'
+    rules: '{{ post_rule_names }}'
+'''
+
+RETURN = '''
+moves:
+    description: The moves that were (or in check mode, would be) made, in order.
+    returned: success
+    type: list
+    sample: [{"name": "rule3", "location": "before", "existing_rule": "rule1"}]
+order_stats:
+    description:
+        - The number of rules ordered and moves made.
+        - C(moves_saved) is how many fewer moves were made than fixing the
+          order one adjacent pair at a time would have taken.
+    returned: success
+    type: dict
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.network.panos.panos import get_connection
+
+
+try:
+    from pandevice.policies import NatRule, PolicyBasedForwarding, SecurityRule
+except ImportError:
+    pass
+
+
+def main():
+    helper = get_connection(
+        vsys=True,
+        device_group=True,
+        rulebase=True,
+        with_classic_provider_spec=True,
+        error_on_shared=True,
+        argument_spec=dict(
+            rule_type=dict(default='security', choices=['security', 'nat', 'pbf']),
+            rules=dict(type='list', required=True),
+            commit=dict(type='bool', default=True),
+        ),
+    )
+    module = AnsibleModule(
+        argument_spec=helper.argument_spec,
+        supports_check_mode=True,
+        required_one_of=helper.required_one_of,
+    )
+
+    # Verify imports, build pandevice object tree.
+    parent = helper.get_pandevice_parent(module)
+
+    obj_class = {
+        'security': SecurityRule,
+        'nat': NatRule,
+        'pbf': PolicyBasedForwarding,
+    }[module.params['rule_type']]
+
+    moves = helper.apply_order(obj_class, parent, module.params['rules'], module)
+    changed = bool(moves)
+
+    # Optional commit.
+    if changed and module.params['commit']:
+        helper.commit(module)
+
+    # Done.
+    module.exit_json(changed=changed, moves=moves)
+
+
+if __name__ == '__main__':
+    main()
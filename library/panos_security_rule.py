@@ -315,11 +315,12 @@ RETURN = '''
 
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.network.panos.panos import get_connection
+from ansible.module_utils.network.panos.policy import security_rule_argument_spec
+from ansible.module_utils.network.panos.policy import security_rule_spec
 
 
 try:
     from pandevice.policies import SecurityRule
-    from pandevice.errors import PanDeviceError
 except ImportError:
     pass
 
@@ -331,6 +332,18 @@ ACCEPTABLE_MOVE_ERRORS = (
 
 
 def main():
+    argument_spec = security_rule_argument_spec()
+    argument_spec.update(
+        location=dict(choices=['top', 'bottom', 'before', 'after']),
+        existing_rule=dict(),
+        commit=dict(type='bool', default=True),
+
+        # TODO(gfreeman) - remove this in the next role release.
+        operation=dict(),
+
+        # TODO(gfreeman) - remove this in the next role release.
+        devicegroup=dict(),
+    )
     helper = get_connection(
         vsys=True,
         device_group=True,
@@ -338,53 +351,7 @@ def main():
         with_state=True,
         with_classic_provider_spec=True,
         error_on_shared=True,
-        argument_spec=dict(
-            rule_name=dict(required=True),
-            source_zone=dict(type='list', default=['any']),
-            source_ip=dict(type='list', default=["any"]),
-            source_user=dict(type='list', default=['any']),
-            hip_profiles=dict(type='list', default=['any']),
-            destination_zone=dict(type='list', default=['any']),
-            destination_ip=dict(type='list', default=["any"]),
-            application=dict(type='list', default=['any']),
-            service=dict(type='list', default=['application-default']),
-            category=dict(type='list', default=['any']),
-            action=dict(
-                default='allow',
-                choices=['allow', 'deny', 'drop', 'reset-client', 'reset-server', 'reset-both'],
-            ),
-            log_setting=dict(),
-            log_start=dict(type='bool', default=False),
-            log_end=dict(type='bool', default=True),
-            description=dict(),
-            rule_type=dict(default='universal', choices=['universal', 'intrazone', 'interzone']),
-            tag_name=dict(type='list'),
-            negate_source=dict(type='bool', default=False),
-            negate_destination=dict(type='bool', default=False),
-            disabled=dict(type='bool', default=False),
-            schedule=dict(),
-            icmp_unreachable=dict(type='bool'),
-            disable_server_response_inspection=dict(type='bool', default=False),
-            group_profile=dict(),
-            antivirus=dict(),
-            spyware=dict(),
-            vulnerability=dict(),
-            url_filtering=dict(),
-            file_blocking=dict(),
-            wildfire_analysis=dict(),
-            data_filtering=dict(),
-            target=dict(type='list'),
-            negate_target=dict(type='bool'),
-            location=dict(choices=['top', 'bottom', 'before', 'after']),
-            existing_rule=dict(),
-            commit=dict(type='bool', default=True),
-
-            # TODO(gfreeman) - remove this in the next role release.
-            operation=dict(),
-
-            # TODO(gfreeman) - remove this in the next role release.
-            devicegroup=dict(),
-        ),
+        argument_spec=argument_spec,
     )
     module = AnsibleModule(
         argument_spec=helper.argument_spec,
@@ -411,59 +378,19 @@ def main():
     parent = helper.get_pandevice_parent(module)
 
     # Set the SecurityRule object params.
-    rule_spec = {
-        'name': module.params['rule_name'],
-        'fromzone': module.params['source_zone'],
-        'tozone': module.params['destination_zone'],
-        'source': module.params['source_ip'],
-        'source_user': module.params['source_user'],
-        'hip_profiles': module.params['hip_profiles'],
-        'destination': module.params['destination_ip'],
-        'application': module.params['application'],
-        'service': module.params['service'],
-        'category': module.params['category'],
-        'action': module.params['action'],
-        'log_setting': module.params['log_setting'],
-        'log_start': module.params['log_start'],
-        'log_end': module.params['log_end'],
-        'description': module.params['description'],
-        'type': module.params['rule_type'],
-        'tag': module.params['tag_name'],
-        'negate_source': module.params['negate_source'],
-        'negate_destination': module.params['negate_destination'],
-        'disabled': module.params['disabled'],
-        'schedule': module.params['schedule'],
-        'icmp_unreachable': module.params['icmp_unreachable'],
-        'disable_server_response_inspection': module.params['disable_server_response_inspection'],
-        'group': module.params['group_profile'],
-        'virus': module.params['antivirus'],
-        'spyware': module.params['spyware'],
-        'vulnerability': module.params['vulnerability'],
-        'url_filtering': module.params['url_filtering'],
-        'file_blocking': module.params['file_blocking'],
-        'wildfire_analysis': module.params['wildfire_analysis'],
-        'data_filtering': module.params['data_filtering'],
-        'target': module.params['target'],
-        'negate_target': module.params['negate_target'],
-    }
+    rule_spec = security_rule_spec(module.params)
 
     # Other module info.
     location = module.params['location']
     existing_rule = module.params['existing_rule']
     commit = module.params['commit']
 
-    # Retrieve the current rules.
-    try:
-        rules = SecurityRule.refreshall(parent, add=False)
-    except PanDeviceError as e:
-        module.fail_json(msg='Failed refresh: {0}'.format(e))
-
     # Create new rule object from the params.
     new_rule = SecurityRule(**rule_spec)
     parent.add(new_rule)
 
     # Which action shall we take on the rule object?
-    changed = helper.apply_state(new_rule, rules, module)
+    changed = helper.apply_state(new_rule, None, module)
 
     # Move the rule to the correct spot, if applicable.
     if module.params['state'] == 'present':
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#  Copyright 2020 Palo Alto Networks, Inc
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+ANSIBLE_METADATA = {'metadata_version': '1.1',
+                    'status': ['preview'],
+                    'supported_by': 'community'}
+
+
+DOCUMENTATION = '''
+---
+module: panos_security_rule_analysis
+short_description: Find shadowed, redundant, and mergeable security rules.
+description:
+    - Reads the security rules and the objects they use from the device once,
+      and reports the rules that can be cleaned up.
+    - A rule is C(shadowed) if an earlier rule with a different action matches
+      every flow it does, C(redundant) if the earlier rule has the same
+      action, and C(duplicate) if both rules match exactly the same flows with
+      the same action.
+    - Two neighboring rules in the same rulebase are C(mergeable) if they only
+      differ in one match field, such as the source addresses.
+    - Address groups and service groups are flattened and compared as address
+      and port ranges, so a rule for C(10.1.1.0/24) is shadowed by one for
+      C(10.0.0.0/8) however the addresses are spelled.
+    - On a firewall, the rules and objects pushed from Panorama are included;
+      on Panorama, the pre and post rules of I(device_group) are used.
+    - Rules that refer to things that can't be resolved offline (FQDN or
+      wildcard address objects, dynamic address groups, EDLs, regions, and
+      application filters), disabled rules, and rules with a schedule are
+      never reported as shadowing another rule.
+author:
+    - Garfield Lee Freeman (@shinmog)
+version_added: "2.9"
+requirements:
+    - pan-python can be obtained from PyPI U(https://pypi.python.org/pypi/pan-python)
+    - pandevice can be obtained from PyPI U(https://pypi.python.org/pypi/pandevice)
+    - ipaddress
+notes:
+    - Checkmode is not supported.
+    - Panorama is supported.
+extends_documentation_fragment:
+    - panos.transitional_provider
+    - panos.vsys
+    - panos.device_group
+options:
+    statuses:
+        description:
+            - The kinds of findings to report.
+        type: list
+        choices:
+            - duplicate
+            - redundant
+            - shadowed
+            - mergeable
+        default: ['duplicate', 'redundant', 'shadowed', 'mergeable']
+'''
+
+EXAMPLES = '''
+- name: Find the rules that never match
+  panos_security_rule_analysis:
+    provider: '{{ provider }}'
+    statuses: ['duplicate', 'redundant', 'shadowed']
+  register: result
+
+- name: Show them
+  debug:
+    msg: '{{ item.rule }} is {{ item.status }} by {{ item.by }}'
+  loop: '{{ result.findings }}'
+'''
+
+RETURN = '''
+findings:
+    description:
+        - The findings, in rule order.
+        - I(by) is the earlier rule that covers I(rule), or for C(mergeable),
+          the neighbor it can be merged into.
+        - I(field) is the match field the mergeable rules differ in.
+    returned: success
+    type: list
+    sample:
+        - {"rule": "Allow web 2", "rulebase": "firewall-rulebase", "status": "redundant",
+           "by": "Allow web", "by_rulebase": "firewall-rulebase"}
+stats:
+    description:
+        - The number of rules, rules with unresolved members, and findings of
+          each kind, and the time taken to compile and analyze the rules.
+    returned: success
+    type: dict
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.network.panos.panos import get_connection
+from ansible.module_utils.network.panos.analysis import RuleAnalyzer
+from ansible.module_utils.network.panos.match import HAS_IPADDRESS
+from ansible.module_utils.network.panos.match import load_policy
+
+
+try:
+    from pandevice.errors import PanDeviceError
+except ImportError:
+    pass
+
+
+STATUSES = ['duplicate', 'redundant', 'shadowed', 'mergeable']
+
+
+def main():
+    helper = get_connection(
+        vsys=True,
+        device_group=True,
+        with_classic_provider_spec=True,
+        argument_spec=dict(
+            statuses=dict(type='list', choices=STATUSES, default=STATUSES),
+        ),
+    )
+
+    module = AnsibleModule(
+        argument_spec=helper.argument_spec,
+        supports_check_mode=False,
+        required_one_of=helper.required_one_of,
+    )
+
+    if not HAS_IPADDRESS:
+        module.fail_json(msg='Missing ipaddress library')
+
+    parent = helper.get_pandevice_parent(module)
+
+    try:
+        rules, objects = load_policy(helper.device, parent)
+    except PanDeviceError as e:
+        module.fail_json(msg='Failed to load the policy: {0}'.format(e))
+
+    findings, stats = RuleAnalyzer(rules, objects).analyze()
+    statuses = module.params['statuses']
+
+    module.exit_json(
+        changed=False,
+        findings=[x for x in findings if x['status'] in statuses],
+        stats=stats,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -30,6 +30,10 @@ short_description: Get information about a security rule.
 description:
     - NOTE: The modules in this role are deprecated in favour of the modules in the collection U(https://paloaltonetworks.github.io/pan-os-ansible)
     - Get information about a single security rule or the names of all security rules.
+    - The rules can be filtered by tag, zone, address, application, disabled
+      state, and name.  All filters except the name are sent to the device as
+      an xpath predicate, so only the matching rules are retrieved; the rules
+      are then also checked locally.
 author: "Garfield Lee Freeman (@shinmog)"
 version_added: "2.8"
 requirements:
@@ -51,6 +55,57 @@ options:
         description:
             - Get full-policy details when name is not set.
         type: bool
+    tag_name:
+        description:
+            - Only include rules with any of these tags.
+        type: list
+    zone:
+        description:
+            - Only include rules with any of these as a source or destination
+              zone.
+        type: list
+    address:
+        description:
+            - Only include rules with any of these as a source or destination
+              address.
+            - This is matched against the rule's address members as is; address
+              groups are not expanded and IP addresses are not matched against
+              ranges or subnets.
+        type: list
+    application:
+        description:
+            - Only include rules with any of these applications.
+        type: list
+    disabled:
+        description:
+            - Only include rules that are disabled (true) or enabled (false).
+        type: bool
+    rule_regex:
+        description:
+            - Only include rules whose name matches this regex.
+    fields:
+        description:
+            - Only include these params in the I(policy) or I(spec) returned,
+              such as C(rule_name) and C(action).
+            - The default is to include all params.
+        type: list
+    output_file:
+        description:
+            - Write the rules to this file as JSON lines (one per line)
+              instead of returning them; only I(path), I(count), I(sha256), and
+              I(total) are returned.
+            - The file is written on the host the module runs on, which is the
+              controller with C(connection: local).
+        type: path
+    offset:
+        description:
+            - Skip this many of the rules.
+        type: int
+        default: 0
+    limit:
+        description:
+            - Return at most this many of the rules.
+        type: int
 '''
 
 EXAMPLES = '''
@@ -70,6 +125,24 @@ EXAMPLES = '''
 
 - debug:
     msg: '{{ rule1.spec }}'
+
+- name: Get the zones and action of the enabled rules tagged 'web'
+  panos_security_rule_facts:
+    provider: '{{ provider }}'
+    all_details: true
+    tag_name: ['web']
+    disabled: false
+    fields: ['rule_name', 'source_zone', 'destination_zone', 'action']
+  register: web_rules
+
+- name: Write the whole rulebase to a file, 1000 rules at a time
+  panos_security_rule_facts:
+    provider: '{{ provider }}'
+    all_details: true
+    output_file: '/tmp/rules-{{ item }}.jsonl'
+    offset: '{{ item * 1000 }}'
+    limit: 1000
+  loop: '{{ range(0, 10) | list }}'
 '''
 
 RETURN = '''
@@ -176,6 +249,22 @@ policy:
         wildfire_analysis:
             description: Name of the already defined wildfire_analysis profile.
             type: str
+total:
+    description: The number of rules found, before I(offset) and I(limit).
+    returned: When I(rule_name) is not specified
+    type: int
+path:
+    description: The I(output_file) written.
+    returned: When I(output_file) is specified
+    type: str
+count:
+    description: The number of rules written to I(output_file).
+    returned: When I(output_file) is specified
+    type: int
+sha256:
+    description: The sha256 of I(output_file).
+    returned: When I(output_file) is specified
+    type: str
 spec:
     description: The security rule definition
     returned: When I(rule_name) is specified
@@ -277,8 +366,14 @@ spec:
 '''
 
 
+import re
+
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.network.panos.panos import get_connection
+from ansible.module_utils.network.panos.policy import SECURITY_RULE_FILTERS
+from ansible.module_utils.network.panos.policy import filter_matches
+from ansible.module_utils.network.panos.policy import filter_predicate
+from ansible.module_utils.network.panos.policy import security_rule_filter_argument_spec
 
 
 try:
@@ -289,16 +384,21 @@ except ImportError:
 
 
 def main():
+    argument_spec = dict(
+        rule_name=dict(),
+        all_details=dict(default=False, type='bool'),
+        fields=dict(type='list'),
+    )
+    argument_spec.update(security_rule_filter_argument_spec())
+
     helper = get_connection(
         vsys=True,
         device_group=True,
         rulebase=True,
         with_classic_provider_spec=True,
+        with_output=True,
         error_on_shared=True,
-        argument_spec=dict(
-            rule_name=dict(),
-            all_details=dict(default=False, type='bool'),
-        ),
+        argument_spec=argument_spec,
     )
 
     module = AnsibleModule(
@@ -321,29 +421,37 @@ def main():
         ('virus', 'antivirus'),
     )
 
+    fields = module.params['fields']
+    if fields is not None:
+        known = helper.to_module_dict(SecurityRule(), renames)
+        unknown = [x for x in fields if x not in known]
+        if unknown:
+            module.fail_json(msg='Unknown fields: {0}'.format(', '.join(unknown)))
+
     name = module.params['rule_name']
     all_details = module.params['all_details']
-    if all_details and name is None:
-        try:
-            listing = SecurityRule.refreshall(parent)
-        except PanDeviceError as e:
-            module.fail_json(msg='Failed refreshall: {0}'.format(e))
-        rules = [rule.about() for rule in listing]
-        for rule in rules:
-            for pandevice_param, ansible_param in renames:
-                rule[ansible_param] = rule[pandevice_param]
-                del rule[pandevice_param]
+    if name is None:
+        if module.params['rule_regex'] is not None:
+            try:
+                re.compile(module.params['rule_regex'])
+            except re.error as e:
+                module.fail_json(msg='Invalid rule_regex: {0}'.format(e))
 
-        module.exit_json(
-            changed=False,
-            policy=rules,
+        listing = helper.fetch_matching(
+            SecurityRule, parent, module,
+            predicate=filter_predicate(SECURITY_RULE_FILTERS, module.params),
+            name_only=not all_details,
         )
-    elif name is None:
-        try:
-            listing = SecurityRule.refreshall(parent, name_only=True)
-        except PanDeviceError as e:
-            module.fail_json(msg='Failed refreshall: {0}'.format(e))
-        module.exit_json(changed=False, rules=[x.name for x in listing])
+        listing = [
+            x for x in listing
+            if filter_matches(SECURITY_RULE_FILTERS, module.params, x, name_only=not all_details)
+        ]
+
+        if all_details:
+            helper.exit_listing(
+                module, 'policy', listing,
+                lambda x: helper.to_module_dict(x, renames, fields))
+        helper.exit_listing(module, 'rules', listing, lambda x: x.name)
 
     rule = SecurityRule(name)
     parent.add(rule)
@@ -352,13 +460,7 @@ def main():
     except PanDeviceError as e:
         module.fail_json(msg='Failed refresh for "{0}": {1}'.format(name, e))
 
-    spec = rule.about()
-
-    for pandevice_param, ansible_param in renames:
-        spec[ansible_param] = spec[pandevice_param]
-        del(spec[pandevice_param])
-
-    module.exit_json(changed=False, spec=spec)
+    module.exit_json(changed=False, spec=helper.to_module_dict(rule, renames, fields))
 
 
 if __name__ == '__main__':
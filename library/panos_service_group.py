@@ -85,27 +85,27 @@ RETURN = '''
 '''
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.network.panos.objects import service_group_argument_spec
+from ansible.module_utils.network.panos.objects import service_group_spec
 from ansible.module_utils.network.panos.panos import get_connection
 
 try:
     from pandevice.objects import ServiceGroup
-    from pandevice.errors import PanDeviceError
 except ImportError:
     pass
 
 
 def main():
+    argument_spec = service_group_argument_spec()
+    argument_spec.update(
+        commit=dict(type='bool', default=True),
+    )
     helper = get_connection(
         vsys=True,
         device_group=True,
         with_classic_provider_spec=True,
         with_state=True,
-        argument_spec=dict(
-            name=dict(type='str', required=True),
-            value=dict(type='list'),
-            tag=dict(type='list'),
-            commit=dict(type='bool', default=True)
-        )
+        argument_spec=argument_spec,
     )
 
     module = AnsibleModule(
@@ -118,27 +118,17 @@ def main():
     parent = helper.get_pandevice_parent(module)
 
     # Object params.
-    spec = {
-        'name': module.params['name'],
-        'value': module.params['value'],
-        'tag': module.params['tag']
-    }
+    spec = service_group_spec(module.params)
 
     # Other info.
     commit = module.params['commit']
 
-    # Retrieve current info.
-    try:
-        listing = ServiceGroup.refreshall(parent, add=False)
-    except PanDeviceError as e:
-        module.fail_json(msg='Failed refresh: {0}'.format(e))
-
     # Build the object based on the user spec.
     obj = ServiceGroup(**spec)
     parent.add(obj)
 
     # Apply the state.
-    changed = helper.apply_state(obj, listing, module)
+    changed = helper.apply_state(obj, None, module)
 
     # Commit.
     if commit and changed:
@@ -105,7 +105,6 @@ from ansible.module_utils.network.panos.panos import get_connection
 
 try:
     from pandevice.objects import ServiceObject
-    from pandevice.errors import PanDeviceError
 except ImportError:
     pass
 
@@ -149,18 +148,12 @@ def main():
     # Other info.
     commit = module.params['commit']
 
-    # Retrieve current info.
-    try:
-        listing = ServiceObject.refreshall(parent, add=False)
-    except PanDeviceError as e:
-        module.fail_json(msg='Failed refresh: {0}'.format(e))
-
     # Build the object based on the user spec.
     obj = ServiceObject(**spec)
     parent.add(obj)
 
     # Apply the state.
-    changed = helper.apply_state(obj, listing, module)
+    changed = helper.apply_state(obj, None, module)
 
     # Commit.
     if commit and changed:
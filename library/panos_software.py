@@ -124,7 +124,7 @@ def main():
     )
 
     # Verify libs are present, get parent object.
-    device = helper.get_pandevice_parent(module)
+    device = helper.get_pandevice_parent(module, device_cache=False)
 
     # Module params.
     version = module.params['version']
@@ -146,6 +146,7 @@ def main():
 
                 if install:
                     device.software.install(version, sync=True)
+                    helper.invalidate_device_cache()
 
                 if restart:
                     device.restart()
@@ -89,7 +89,6 @@ from ansible.module_utils.network.panos.panos import get_connection
 
 try:
     from pandevice.objects import Tag
-    from pandevice.errors import PanDeviceError
 except ImportError:
     pass
 
@@ -129,15 +128,10 @@ def main():
 
     commit = module.params['commit']
 
-    try:
-        listing = Tag.refreshall(parent, add=False)
-    except PanDeviceError as e:
-        module.fail_json(msg='Failed refresh: {0}'.format(e))
-
     obj = Tag(**spec)
     parent.add(obj)
 
-    changed = helper.apply_state(obj, listing, module)
+    changed = helper.apply_state(obj, None, module)
 
     if commit and changed:
         helper.commit(module)
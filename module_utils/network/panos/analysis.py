@@ -0,0 +1,282 @@
+# This code is part of Ansible, but is an independent component.
+# This particular file snippet, and this file snippet only, is BSD licensed.
+# Modules you write using this snippet, which is embedded dynamically by Ansible
+# still belong to the author of the module, and may assign their own license
+# to the complete work.
+#
+# Copyright (c) 2020 Palo Alto Networks techbizdev, <techbizdev@paloaltonetworks.com>
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright notice,
+#      this list of conditions and the following disclaimer in the documentation
+#      and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+# USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Shadowed, redundant, and mergeable security rule analysis.
+
+The rules are compiled with a PolicyMatcher, so addresses and ports are
+interval sets and groups are flattened with the same ObjectIndex that
+panos_query_rules uses.  For each rule, the matcher's indexes are probed
+with one point of the rule (its lowest address, port, and so on) to find
+the earlier rules that could possibly cover it, and only those get the full
+interval set comparison.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import time
+
+from ansible.module_utils.network.panos.match import IntervalSet
+from ansible.module_utils.network.panos.match import PolicyMatcher
+
+
+# A value no rule refers to, so looking it up returns the "any" rules.
+NO_VALUE = u'\x00'
+
+# The match fields that two neighboring rules may differ in to be merged.
+MERGE_FIELDS = (
+    'fromzone', 'tozone', 'source', 'destination', 'source_user',
+    'application', 'service', 'category',
+)
+
+# The fields that don't affect the merge.
+MERGE_IGNORE = ('name', 'uuid', 'description', 'tag', 'group_tag')
+
+
+def _values(value):
+    """Returns the members of a list field, or None for any."""
+    if not value or 'any' in value:
+        return None
+    return frozenset(value)
+
+
+def _subset(small, big):
+    """Subset test for _values(), where None is any."""
+    return big is None or (small is not None and small <= big)
+
+
+class RuleAnalyzer(object):
+    """Finds the security rules that never match, or could be combined.
+
+    A rule is covered by an earlier rule when every flow it matches is also
+    matched by the earlier rule.  It is then a "duplicate" if both rules
+    match the same flows and have the same action, "redundant" if the
+    action is the same, and "shadowed" if the action differs.  Two neighbors
+    in the same rulebase are "mergeable" if they only differ in one match
+    field.
+
+    Rules that refer to things that can't be resolved offline, disabled
+    rules, and rules with a schedule or a different target can't be proven
+    to cover anything, so they are left out.
+
+    Args:
+        rules: List of (rulebase, SecurityRule), in evaluation order.
+        objects(ObjectIndex): The objects the rules refer to.
+    """
+    def __init__(self, rules, objects):
+        self.rules = rules
+        self.matcher = PolicyMatcher(rules, objects)
+        self.zones = {}
+        self.users = {}
+        self.categories = {}
+        for idx, (_, rule) in enumerate(rules):
+            self.zones[idx] = (rule.type or 'universal', _values(rule.fromzone), _values(rule.tozone))
+            self.users[idx] = _values([x.lower() for x in rule.source_user or []])
+            self.categories[idx] = _values(rule.category)
+
+    def analyze(self):
+        """Returns the findings, in rule order, and stats."""
+        start = time.time()
+        findings = []
+        for idx in range(len(self.rules)):
+            ans = self._covered(idx)
+            if ans is None and idx > 0:
+                # A covered rule is better deleted than merged.
+                ans = self._mergeable(idx - 1, idx)
+            if ans is not None:
+                findings.append(ans)
+
+        stats = dict(
+            rules=len(self.rules),
+            unresolved=len(self.matcher.unresolved),
+            compile_time=self.matcher.compile_time,
+            analysis_time=round(time.time() - start, 4),
+        )
+        for status in ('duplicate', 'redundant', 'shadowed', 'mergeable'):
+            stats[status] = sum(1 for x in findings if x['status'] == status)
+        return findings, stats
+
+    def _finding(self, status, idx, other, **kwargs):
+        rulebase, rule = self.rules[idx]
+        ans = dict(
+            rule=rule.name, rulebase=rulebase, status=status,
+            by=self.rules[other][1].name, by_rulebase=self.rules[other][0])
+        ans.update(kwargs)
+        return ans
+
+    def _usable(self, idx):
+        return idx in self.matcher.compiled and idx not in self.matcher.unresolved
+
+    def _covered(self, idx):
+        """Returns the finding for the first earlier rule covering `idx`."""
+        if not self._usable(idx):
+            return None
+
+        mask = self._probe(idx) & ((1 << idx) - 1)
+        while mask:
+            low = mask & -mask
+            other = low.bit_length() - 1
+            mask ^= low
+            if not self._usable(other) or not self._covers(other, idx):
+                continue
+            same_action = self.rules[other][1].action == self.rules[idx][1].action
+            if same_action and self._covers(idx, other):
+                return self._finding('duplicate', idx, other)
+            return self._finding('redundant' if same_action else 'shadowed', idx, other)
+
+        return None
+
+    def _probe(self, idx):
+        """Returns the bitmask of the rules that match one flow of `idx`."""
+        m = self.matcher
+        compiled = m.compiled[idx]
+        if not compiled['source'] or not compiled['destination']:
+            return 0
+
+        rtype, fromzone, tozone = self.zones[idx]
+        fromzone = min(fromzone) if fromzone else NO_VALUE
+        if rtype == 'intrazone':
+            tozone = fromzone
+        else:
+            tozone = min(tozone) if tozone else NO_VALUE
+        mask = m.enabled & m.fromzone.lookup(fromzone) & m.tozone.lookup(tozone)
+        if rtype == 'intrazone':
+            mask &= ~m.interzone
+        elif rtype == 'interzone':
+            mask &= ~m.intrazone
+
+        mask &= m.source.lookup(compiled['source'].intervals[0][0])
+        mask &= m.destination.lookup(compiled['destination'].intervals[0][0])
+
+        users = self.users[idx]
+        mask &= m.source_user.lookup(min(users) if users else NO_VALUE) | m.known_user
+        applications = compiled['application']
+        mask &= m.application.lookup(min(applications) if applications else NO_VALUE)
+        categories = self.categories[idx]
+        mask &= m.category.lookup(min(categories) if categories else NO_VALUE)
+
+        services = compiled['service']
+        if services is None:
+            mask &= m.any_service
+        elif services:
+            proto, dports, _ = services[0]
+            if proto in m.ports and dports:
+                mask &= m.ports[proto].lookup(dports.intervals[0][0])
+            else:
+                mask &= m.any_service
+        return mask
+
+    def _covers(self, big, small):
+        """Returns True if rule `big` matches every flow rule `small` does."""
+        a = self.rules[big][1]
+        b = self.rules[small][1]
+        if a.schedule and a.schedule != b.schedule:
+            return False
+        if a.target and (a.target != b.target or a.negate_target != b.negate_target):
+            return False
+        if not _subset(_values(b.hip_profiles), _values(a.hip_profiles)):
+            return False
+        if not _subset(self.categories[small], self.categories[big]):
+            return False
+        if not self._users_cover(self.users[big], self.users[small]):
+            return False
+        if not self._zones_cover(self.zones[big], self.zones[small]):
+            return False
+
+        ca = self.matcher.compiled[big]
+        cb = self.matcher.compiled[small]
+        if not cb['source'].issubset(ca['source']):
+            return False
+        if not cb['destination'].issubset(ca['destination']):
+            return False
+        if not _subset(cb['application'], ca['application']):
+            return False
+        return self._services_cover(a, b, ca['service'], cb['service'])
+
+    @staticmethod
+    def _users_cover(big, small):
+        if _subset(small, big):
+            return True
+        # known-user is every user except unknown.
+        return (big == frozenset(['known-user']) and small is not None and
+                'unknown' not in small and 'pre-logon' not in small)
+
+    @staticmethod
+    def _zones_cover(big, small):
+        atype, afrom, ato = big
+        btype, bfrom, bto = small
+        if not _subset(bfrom, afrom):
+            return False
+        if atype == 'intrazone':
+            return btype == 'intrazone'
+        if atype == 'interzone' and btype != 'interzone':
+            return False
+        # An intrazone rule's destination zones are its source zones.
+        return _subset(bfrom if btype == 'intrazone' else bto, ato)
+
+    @staticmethod
+    def _services_cover(a, b, big, small):
+        if big is None:
+            # Any service, or application-default which needs the same
+            # (or a smaller set of) applications.
+            return 'application-default' not in (a.service or []) or (
+                small is None and 'application-default' in (b.service or []))
+        if small is None:
+            return False
+        for proto, dports, sports in small:
+            if sports is None:
+                # The ports of every service without source ports.
+                merged = [y for p, x, s in big if p == proto and s is None for y in x.intervals]
+                if merged and dports.issubset(IntervalSet(merged)):
+                    continue
+                return False
+            if not any(p == proto and dports.issubset(x) and (s is None or sports.issubset(s))
+                       for p, x, s in big):
+                return False
+        return True
+
+    def _mergeable(self, first, second):
+        """Returns the finding if neighbors `first` and `second` can be merged."""
+        if self.rules[first][0] != self.rules[second][0]:
+            return None
+        a = self.rules[first][1].about()
+        b = self.rules[second][1].about()
+        if a['disabled'] or b['disabled']:
+            return None
+
+        differ = [x for x in a if x not in MERGE_IGNORE and a[x] != b.get(x)]
+        if len(differ) != 1 or differ[0] not in MERGE_FIELDS:
+            return None
+        field = differ[0]
+        if field in ('source', 'destination') and a['negate_' + field]:
+            return None
+        # "any" in either rule makes the merge the rule with "any", and
+        # application-default can't be listed with other services.
+        for values in (a[field] or ['any'], b[field] or ['any']):
+            if 'any' in values or 'application-default' in values:
+                return None
+        return self._finding('mergeable', second, first, field=field)
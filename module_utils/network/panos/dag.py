@@ -0,0 +1,225 @@
+# This code is part of Ansible, but is an independent component.
+# This particular file snippet, and this file snippet only, is BSD licensed.
+# Modules you write using this snippet, which is embedded dynamically by Ansible
+# still belong to the author of the module, and may assign their own license
+# to the complete work.
+#
+# Copyright (c) 2020 Palo Alto Networks techbizdev, <techbizdev@paloaltonetworks.com>
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright notice,
+#      this list of conditions and the following disclaimer in the documentation
+#      and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+# USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Offline dynamic address group membership.
+
+A dynamic address group's filter ("'web' and ('prod' or 'staging')") is
+parsed once into a DagFilter, which can then be evaluated against a single
+IP's tags, or against a TagIndex of every registered IP.  The TagIndex maps
+each tag to the set of IPs that have it, so evaluating a filter is a few
+set unions and intersections instead of a scan of every IP.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import re
+
+
+# Quoted tags, parentheses, and bare words.
+TOKEN = re.compile(r"""\s*(?:'([^']*)'|"([^"]*)"|(\()|(\))|([^\s()'"]+))""")
+
+OPERATORS = ('and', 'or', 'not')
+
+
+class DagFilterError(ValueError):
+    """A dynamic address group filter could not be parsed."""
+    pass
+
+
+class DagFilter(object):
+    """A parsed dynamic address group filter.
+
+    Tags are quoted with single (or double) quotes, or are bare words, and
+    are combined with "and", "or", "not", and parentheses.  "not" binds
+    tightest, then "and", then "or".
+
+    Args:
+        expression(str): The filter, as in AddressGroup.dynamic_value.
+
+    Raises:
+        DagFilterError
+    """
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = self._tokenize(expression)
+        self.pos = 0
+        self.tree = self._or()
+        if self.pos != len(self.tokens):
+            self._error('Unexpected "{0}"'.format(self.tokens[self.pos][1]))
+        del self.tokens
+
+    def _tokenize(self, expression):
+        tokens = []
+        pos = 0
+        expression = expression or ''
+        while pos < len(expression):
+            if not expression[pos:].strip():
+                break
+            m = TOKEN.match(expression, pos)
+            if m is None:
+                raise DagFilterError('Unterminated quote in "{0}"'.format(expression))
+            pos = m.end()
+            if m.group(1) is not None or m.group(2) is not None:
+                tokens.append(('tag', m.group(1) if m.group(1) is not None else m.group(2)))
+            elif m.group(3):
+                tokens.append(('(', '('))
+            elif m.group(4):
+                tokens.append((')', ')'))
+            elif m.group(5).lower() in OPERATORS:
+                tokens.append((m.group(5).lower(), m.group(5)))
+            else:
+                tokens.append(('tag', m.group(5)))
+        return tokens
+
+    def _error(self, msg):
+        raise DagFilterError('{0} in "{1}"'.format(msg, self.expression))
+
+    def _peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos][0]
+
+    def _or(self):
+        items = [self._and()]
+        while self._peek() == 'or':
+            self.pos += 1
+            items.append(self._and())
+        return items[0] if len(items) == 1 else ('or', items)
+
+    def _and(self):
+        items = [self._not()]
+        while self._peek() == 'and':
+            self.pos += 1
+            items.append(self._not())
+        return items[0] if len(items) == 1 else ('and', items)
+
+    def _not(self):
+        if self._peek() == 'not':
+            self.pos += 1
+            return ('not', self._not())
+        return self._atom()
+
+    def _atom(self):
+        kind = self._peek()
+        if kind == 'tag':
+            self.pos += 1
+            return ('tag', self.tokens[self.pos - 1][1])
+        if kind == '(':
+            self.pos += 1
+            ans = self._or()
+            if self._peek() != ')':
+                self._error('Missing ")"')
+            self.pos += 1
+            return ans
+        if kind is None:
+            self._error('Unexpected end')
+        self._error('Unexpected "{0}"'.format(self.tokens[self.pos][1]))
+
+    @property
+    def tags(self):
+        """The set of tags the filter refers to."""
+        ans = set()
+        stack = [self.tree]
+        while stack:
+            node = stack.pop()
+            if node[0] == 'tag':
+                ans.add(node[1])
+            elif node[0] == 'not':
+                stack.append(node[1])
+            else:
+                stack.extend(node[1])
+        return ans
+
+    def matches(self, tags):
+        """Returns True if an IP with `tags` (a set) is in the group."""
+        return self._matches(self.tree, tags)
+
+    def _matches(self, node, tags):
+        kind = node[0]
+        if kind == 'tag':
+            return node[1] in tags
+        if kind == 'not':
+            return not self._matches(node[1], tags)
+        if kind == 'and':
+            return all(self._matches(x, tags) for x in node[1])
+        return any(self._matches(x, tags) for x in node[1])
+
+    def members(self, index):
+        """Returns the set of IPs in `index` (a TagIndex) that are in the group."""
+        if self.tree[0] == 'tag':
+            # Don't hand out the index's own set for a single tag filter.
+            return frozenset(index.tags.get(self.tree[1], ()))
+        return self._members(self.tree, index)
+
+    def _members(self, node, index):
+        kind = node[0]
+        if kind == 'tag':
+            return index.tags.get(node[1], frozenset())
+        if kind == 'not':
+            return index.ips - self._members(node[1], index)
+        if kind == 'or':
+            ans = set()
+            for x in node[1]:
+                ans |= self._members(x, index)
+            return ans
+
+        # Intersect the smallest sets first, and subtract the negations last.
+        positive = [x for x in node[1] if x[0] != 'not']
+        negative = [x[1] for x in node[1] if x[0] == 'not']
+        if positive:
+            sets = sorted((self._members(x, index) for x in positive), key=len)
+            ans = set(sets[0])
+            for x in sets[1:]:
+                if not ans:
+                    break
+                ans &= x
+        else:
+            ans = set(index.ips)
+        for x in negative:
+            if not ans:
+                break
+            ans -= self._members(x, index)
+        return ans
+
+
+class TagIndex(object):
+    """The registered IPs, indexed by tag.
+
+    Args:
+        registered: Dict of IP to list of tags, as returned by
+            UserId.get_registered_ip().
+    """
+    def __init__(self, registered):
+        self.ips = frozenset(registered)
+        tags = {}
+        for ip, values in registered.items():
+            for tag in values or ():
+                if tag in tags:
+                    tags[tag].add(ip)
+                else:
+                    tags[tag] = set([ip])
+        self.tags = tags
@@ -0,0 +1,922 @@
+# This code is part of Ansible, but is an independent component.
+# This particular file snippet, and this file snippet only, is BSD licensed.
+# Modules you write using this snippet, which is embedded dynamically by Ansible
+# still belong to the author of the module, and may assign their own license
+# to the complete work.
+#
+# Copyright (c) 2020 Palo Alto Networks techbizdev, <techbizdev@paloaltonetworks.com>
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright notice,
+#      this list of conditions and the following disclaimer in the documentation
+#      and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+# USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Offline security and NAT policy matching.
+
+The rulebase and the objects it uses are read from the device once and
+compiled into a PolicyMatcher (or a NatMatcher), which can then answer
+"which rule does this flow hit" for any number of flows without further
+API calls.
+
+Each match field is compiled into an index that maps a flow value to the
+set of rules that accept it, with the sets kept as int bitmasks (bit N is
+rule N).  Zones, users, applications, and categories use a dict of value to
+bitmask.  Addresses and ports use a RangeIndex:  the endpoints of every
+rule's intervals split the number line into segments, and a sweep over the
+endpoints records the bitmask of each segment, so a lookup is a bisect.  A
+flow's candidates are the AND of its field bitmasks, and the first match is
+the lowest bit set.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import bisect
+import time
+
+HAS_IPADDRESS = True
+try:
+    import ipaddress
+except ImportError:
+    HAS_IPADDRESS = False
+
+try:
+    from pandevice import objects
+    from pandevice.errors import PanDeviceError
+    from pandevice.policies import NatRule, SecurityRule
+except ImportError:
+    pass
+
+
+# IPv6 addresses are placed after all IPv4 addresses on one number line.
+IPV6_OFFSET = 1 << 32
+ADDRESS_MAX = IPV6_OFFSET + (1 << 128) - 1
+PORT_MAX = 65535
+
+PROTOCOLS = {6: 'tcp', 17: 'udp', 132: 'sctp'}
+
+# The services that are predefined on PAN-OS.
+PREDEFINED_SERVICES = {
+    'service-http': [('tcp', '80,8080', None)],
+    'service-https': [('tcp', '443', None)],
+}
+
+# (flow key, op command arg, rule types) for the policy match op commands.
+POLICY_MATCH_ARGS = (
+    ('application', 'application', ('security', )),
+    ('category', 'category', ('security', )),
+    ('destination_ip', 'destination', ('security', 'nat')),
+    ('destination_port', 'destination-port', ('security', 'nat')),
+    ('source_zone', 'from', ('security', 'nat')),
+    ('protocol', 'protocol', ('security', 'nat')),
+    ('source_ip', 'source', ('security', 'nat')),
+    ('source_user', 'source-user', ('security', )),
+    ('destination_zone', 'to', ('security', 'nat')),
+    ('to_interface', 'to-interface', ('nat', )),
+)
+
+
+class IntervalSet(object):
+    """A set of ints, stored as sorted, non-overlapping, inclusive intervals.
+
+    Args:
+        intervals: Iterable of (lo, hi) tuples; they may overlap.
+    """
+    def __init__(self, intervals=()):
+        merged = []
+        for lo, hi in sorted(intervals):
+            if merged and lo <= merged[-1][1] + 1:
+                if hi > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], hi)
+            else:
+                merged.append((lo, hi))
+        self.intervals = merged
+        self._los = [x[0] for x in merged]
+
+    def __contains__(self, value):
+        idx = bisect.bisect_right(self._los, value) - 1
+        return idx >= 0 and value <= self.intervals[idx][1]
+
+    def __bool__(self):
+        return bool(self.intervals)
+
+    __nonzero__ = __bool__
+
+    def issubset(self, other):
+        """Returns True if every value in this set is also in `other`."""
+        for lo, hi in self.intervals:
+            idx = bisect.bisect_right(other._los, lo) - 1
+            if idx < 0 or hi > other.intervals[idx][1]:
+                return False
+        return True
+
+    def complement(self, lo, hi):
+        """Returns the values in [lo, hi] that are not in this set."""
+        ans = []
+        start = lo
+        for a, b in self.intervals:
+            if a > start:
+                ans.append((start, min(a - 1, hi)))
+            start = max(start, b + 1)
+        if start <= hi:
+            ans.append((start, hi))
+        return IntervalSet(ans)
+
+
+class RangeIndex(object):
+    """Maps a number to the bitmask of the rules whose intervals contain it.
+
+    Args:
+        sets: List of (rule index, IntervalSet).
+    """
+    def __init__(self, sets):
+        toggles = {}
+        for idx, values in sets:
+            bit = 1 << idx
+            for lo, hi in values.intervals:
+                toggles[lo] = toggles.get(lo, 0) ^ bit
+                toggles[hi + 1] = toggles.get(hi + 1, 0) ^ bit
+
+        self.bounds = sorted(toggles)
+        self.masks = []
+        mask = 0
+        for bound in self.bounds:
+            mask ^= toggles[bound]
+            self.masks.append(mask)
+
+    def lookup(self, value):
+        idx = bisect.bisect_right(self.bounds, value) - 1
+        return self.masks[idx] if idx >= 0 else 0
+
+
+class ValueIndex(object):
+    """Maps a value to the bitmask of the rules that accept it."""
+    def __init__(self):
+        self.any = 0
+        self.values = {}
+
+    def add(self, idx, values):
+        bit = 1 << idx
+        if values is None or 'any' in values:
+            self.any |= bit
+            return
+        for value in values:
+            self.values[value] = self.values.get(value, 0) | bit
+
+    def lookup(self, value):
+        return self.any | self.values.get(value, 0)
+
+
+def address_key(value):
+    """Returns the number line position of an IP address."""
+    ip = ipaddress.ip_address(u'{0}'.format(value))
+    if ip.version == 6:
+        return IPV6_OFFSET + int(ip)
+    return int(ip)
+
+
+def address_text(key):
+    """Returns the IP address at a number line position (see address_key())."""
+    if key >= IPV6_OFFSET:
+        return str(ipaddress.IPv6Address(key - IPV6_OFFSET))
+    return str(ipaddress.IPv4Address(key))
+
+
+def address_interval(value):
+    """Returns the (lo, hi) of a literal address, or None if it isn't one.
+
+    The address can be an IP, a CIDR, or a range ("10.0.0.1-10.0.0.9").
+    """
+    try:
+        if '-' in value:
+            lo, hi = value.split('-', 1)
+            return (address_key(lo.strip()), address_key(hi.strip()))
+        net = ipaddress.ip_network(u'{0}'.format(value), strict=False)
+    except ValueError:
+        return None
+
+    offset = IPV6_OFFSET if net.version == 6 else 0
+    return (offset + int(net.network_address), offset + int(net.broadcast_address))
+
+
+def port_intervals(value):
+    """Returns the intervals for a service port spec ("80,443,8000-8080")."""
+    ans = []
+    for part in (value or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            lo, hi = part.split('-', 1)
+            ans.append((int(lo), int(hi)))
+        else:
+            ans.append((int(part), int(part)))
+    return IntervalSet(ans)
+
+
+class GroupCycleError(ValueError):
+    """A group contains itself, directly or through other groups.
+
+    Attributes:
+        kind(str): The group kind, such as "address-group".
+        path(tuple): The group names, from the first to the repeated one.
+    """
+    def __init__(self, kind, path):
+        super(GroupCycleError, self).__init__('{0} cycle: {1}'.format(
+            kind, ' -> '.join(path)))
+        self.kind = kind
+        self.path = path
+
+
+class ObjectIndex(object):
+    """Name lookups for the objects that rules refer to.
+
+    Scopes are searched in the order they were added, so add the most
+    specific one (vsys or device group) first.  The members of a group are
+    looked up starting from the group's own scope, so a shared group never
+    resolves to device group objects.
+
+    Groups are flattened on first use and the result is memoized, so each
+    group is only walked once per run no matter how many rules use it.
+    """
+    KINDS = (
+        'address', 'address-group', 'service', 'service-group',
+        'application-group', 'application-filter', 'tag',
+    )
+
+    def __init__(self):
+        self.scopes = []
+        self._memo = {}
+
+    def add_scope(self, listing):
+        """Adds a scope, given as a dict of kind to list of objects."""
+        self.scopes.append(dict(
+            (kind, dict((x.uid, x) for x in listing.get(kind, [])))
+            for kind in self.KINDS))
+        self._memo = {}
+
+    def _lookup(self, name, kinds, start):
+        for num in range(start, len(self.scopes)):
+            for kind in kinds:
+                obj = self.scopes[num].get(kind, {}).get(name)
+                if obj is not None:
+                    return kind, obj, num
+        return None, None, None
+
+    def find(self, name, *kinds):
+        """Returns (kind, obj) for the first object named `name`."""
+        kind, obj, _ = self._lookup(name, kinds, 0)
+        return kind, obj
+
+    def addresses(self, name):
+        """Flattens an address, address group, or literal address.
+
+        Returns:
+            tuple: The IntervalSet of the addresses (see address_key()), and
+            the names that couldn't be resolved (FQDN and wildcard
+            addresses, dynamic groups, and anything unknown).
+
+        Raises:
+            GroupCycleError
+        """
+        return self._flatten('address', name, 0, ())
+
+    def services(self, name):
+        """Flattens a service or service group.
+
+        Returns:
+            tuple: A tuple of (protocol, destination port IntervalSet, source
+            port IntervalSet or None), and the names that couldn't be resolved.
+
+        Raises:
+            GroupCycleError
+        """
+        return self._flatten('service', name, 0, ())
+
+    def applications(self, name):
+        """Flattens an application group; other names are taken as applications.
+
+        Returns:
+            tuple: The application names, and the names that couldn't be
+            resolved (application filters).
+
+        Raises:
+            GroupCycleError
+        """
+        return self._flatten('application', name, 0, ())
+
+    def _flatten(self, family, name, start, path):
+        key = (family, name, start)
+        if key in self._memo:
+            return self._memo[key]
+
+        group = family + '-group'
+        if name in path:
+            raise GroupCycleError(group, path[path.index(name):] + (name, ))
+
+        kinds = (family, group)
+        if family == 'application':
+            kinds += ('application-filter', )
+        kind, obj, num = self._lookup(name, kinds, start)
+        if kind == group:
+            members = obj.value if family != 'address' else obj.static_value
+            if members is None:
+                # Dynamic address group.
+                ans = (self._empty(family), frozenset([name]))
+            else:
+                values, unresolved = [], set()
+                for member in members:
+                    sub = self._flatten(family, member, num, path + (name, ))
+                    values.append(sub[0])
+                    unresolved.update(sub[1])
+                ans = (self._merge(family, values), frozenset(unresolved))
+        else:
+            ans = getattr(self, '_' + family)(name, obj)
+
+        self._memo[key] = ans
+        return ans
+
+    @staticmethod
+    def _empty(family):
+        return IntervalSet() if family == 'address' else ()
+
+    @staticmethod
+    def _merge(family, values):
+        if family == 'address':
+            return IntervalSet(y for x in values for y in x.intervals)
+        if family == 'application':
+            return frozenset(y for x in values for y in x)
+        return tuple(y for x in values for y in x)
+
+    @staticmethod
+    def _address(name, obj):
+        value = None
+        if obj is None:
+            value = address_interval(name)
+        elif obj.type in ('ip-netmask', 'ip-range'):
+            value = address_interval(obj.value)
+        if value is None:
+            return IntervalSet(), frozenset([name])
+        return IntervalSet([value]), frozenset()
+
+    @staticmethod
+    def _service(name, obj):
+        if obj is None:
+            if name not in PREDEFINED_SERVICES:
+                return (), frozenset([name])
+            return tuple(
+                (proto, port_intervals(dports), sports)
+                for proto, dports, sports in PREDEFINED_SERVICES[name]), frozenset()
+        if obj.protocol is None:
+            return (), frozenset([name])
+        sports = port_intervals(obj.source_port) if obj.source_port else None
+        return ((obj.protocol, port_intervals(obj.destination_port), sports), ), frozenset()
+
+    @staticmethod
+    def _application(name, obj):
+        if obj is not None:
+            # Application filter; its applications aren't known offline.
+            return frozenset(), frozenset([name])
+        return frozenset([name]), frozenset()
+
+    def __len__(self):
+        return sum(len(x) for scope in self.scopes for x in scope.values())
+
+
+class RuleMatcher(object):
+    """The compiled fields shared by the security and NAT rule matchers.
+
+    Rules with members that can't be resolved offline (FQDN and wildcard
+    address objects, dynamic address groups, EDLs, regions, application
+    filters) are compiled without those members, and are listed in
+    `unresolved`.
+
+    The resolved source, destination, applications (None for any), and
+    services (None for any) of each enabled rule are kept in `compiled`.
+    Rules with the C(application-default) service are matched as if it
+    were C(any), and are flagged in `app_default`.
+
+    Args:
+        rules: List of (rulebase, rule), in evaluation order.
+        objects(ObjectIndex): The objects the rules refer to.
+    """
+    def __init__(self, rules, objects):
+        self._start = time.time()
+        self.rules = rules
+        self.objects = objects
+        self.unresolved = {}
+        self.compiled = {}
+
+        self.enabled = 0
+        self.any_service = 0
+        self.app_default = 0
+        self.source_ports = 0
+        self.services = {}
+        self.fromzone = ValueIndex()
+        self.tozone = ValueIndex()
+
+        self._sources = []
+        self._destinations = []
+        self._ports = dict((x, []) for x in PROTOCOLS.values())
+
+    def _add_rule(self, idx, rule, services, applications=None):
+        """Compiles the addresses and services of an enabled rule."""
+        self.enabled |= 1 << idx
+        source = self._addresses(idx, rule.source, getattr(rule, 'negate_source', False))
+        destination = self._addresses(
+            idx, rule.destination, getattr(rule, 'negate_destination', False))
+        self._sources.append((idx, source))
+        self._destinations.append((idx, destination))
+
+        services = self._services(idx, services)
+        self.compiled[idx] = dict(
+            source=source, destination=destination,
+            application=applications, service=services)
+
+        bit = 1 << idx
+        if services is None:
+            self.any_service |= bit
+            for proto in self._ports:
+                self._ports[proto].append((idx, IntervalSet([(0, PORT_MAX)])))
+            return
+        self.services[idx] = services
+        for proto in self._ports:
+            values = [y for p, x, _ in services if p == proto for y in x.intervals]
+            if values:
+                self._ports[proto].append((idx, IntervalSet(values)))
+        if any(x[2] is not None for x in services):
+            self.source_ports |= bit
+
+    def _finish(self):
+        """Builds the address and port indexes once every rule is added."""
+        self.source = RangeIndex(self._sources)
+        self.destination = RangeIndex(self._destinations)
+        self.ports = dict((x, RangeIndex(y)) for x, y in self._ports.items())
+        self.proto_masks = dict(
+            (x, self.any_service | sum(1 << y for y, _ in self._ports[x]))
+            for x in self._ports)
+        del self._sources, self._destinations, self._ports
+        self.first_unresolved = min(self.unresolved) if self.unresolved else None
+        self.compile_time = round(time.time() - self._start, 4)
+
+    def _unresolved(self, idx, name):
+        self.unresolved.setdefault(idx, set()).add(name)
+
+    def _resolve(self, idx, func, name):
+        """Flattens `name` with `func`, recording what can't be resolved."""
+        try:
+            value, unresolved = func(name)
+        except GroupCycleError:
+            value, unresolved = None, [name]
+        for x in unresolved:
+            self._unresolved(idx, x)
+        return value
+
+    def _addresses(self, idx, members, negate):
+        """Returns the IntervalSet of a rule's source or destination."""
+        values = []
+        for member in members or ['any']:
+            if member == 'any':
+                values.append((0, ADDRESS_MAX))
+                continue
+            ans = self._resolve(idx, self.objects.addresses, member)
+            if ans is not None:
+                values.extend(ans.intervals)
+        ans = IntervalSet(values)
+        if negate:
+            ans = ans.complement(0, ADDRESS_MAX)
+        return ans
+
+    def _services(self, idx, members):
+        """Returns a rule's (proto, dports, sports) list, or None for any."""
+        ans = []
+        for member in members or ['any']:
+            if member == 'application-default':
+                self.app_default |= 1 << idx
+                return None
+            if member == 'any':
+                return None
+            ans.extend(self._resolve(idx, self.objects.services, member) or ())
+        return ans
+
+    def _zones(self, flow, mask):
+        """ANDs the zone bitmasks of `flow` into `mask`."""
+        if flow.get('source_zone') is not None:
+            mask &= self.fromzone.lookup(flow['source_zone'])
+        if flow.get('destination_zone') is not None:
+            mask &= self.tozone.lookup(flow['destination_zone'])
+        return mask
+
+    def _addresses_and_ports(self, flow, mask):
+        """ANDs the address and port bitmasks of `flow` into `mask`."""
+        if flow.get('source_ip') is not None:
+            mask &= self.source.lookup(address_key(flow['source_ip']))
+        if flow.get('destination_ip') is not None:
+            mask &= self.destination.lookup(address_key(flow['destination_ip']))
+
+        proto = PROTOCOLS.get(flow.get('protocol'))
+        if flow.get('protocol') is not None:
+            if proto is None:
+                mask &= self.any_service
+            elif flow.get('destination_port') is None:
+                mask &= self.proto_masks[proto]
+            else:
+                mask &= self.ports[proto].lookup(flow['destination_port'])
+        return mask
+
+    def _first(self, mask, flow):
+        """Returns the index of the first rule in `mask` that `flow` matches."""
+        while mask:
+            low = mask & -mask
+            idx = low.bit_length() - 1
+            if not low & self.source_ports or self._source_port_ok(idx, flow):
+                return idx
+            mask ^= low
+        return None
+
+    def _source_port_ok(self, idx, flow):
+        proto = PROTOCOLS.get(flow.get('protocol'))
+        dport = flow.get('destination_port')
+        sport = flow.get('source_port')
+        for p, dports, sports in self.services[idx]:
+            if proto is not None and p != proto:
+                continue
+            if dport is not None and dport not in dports:
+                continue
+            if sport is None or sports is None or sport in sports:
+                return True
+        return False
+
+    def result(self, flow):
+        """Returns the match result for `flow` as a dict."""
+        idx = self.match(flow)
+        ans = {'rule': None, 'rulebase': None, 'index': idx}
+        if idx is not None:
+            rulebase, rule = self.rules[idx]
+            ans.update(rule=rule.name, rulebase=rulebase)
+        ans.update(self._details(idx, flow))
+        # A rule with unresolved members before (or at) the match may have
+        # been the real match, and an application-default match may not
+        # allow the flow's port.
+        ans['uncertain'] = (self.first_unresolved is not None and (
+            idx is None or self.first_unresolved <= idx)) or (
+            idx is not None and flow.get('destination_port') is not None and
+            bool((self.app_default >> idx) & 1))
+        return ans
+
+    def _details(self, idx, flow):
+        """Returns the rule type specific results for a match (or None)."""
+        return {}
+
+
+class PolicyMatcher(RuleMatcher):
+    """A compiled security rulebase.
+
+    Args:
+        rules: List of (rulebase, SecurityRule), in evaluation order.
+        objects(ObjectIndex): The objects the rules refer to.
+    """
+    def __init__(self, rules, objects):
+        super(PolicyMatcher, self).__init__(rules, objects)
+        self.intrazone = 0
+        self.interzone = 0
+        self.source_user = ValueIndex()
+        self.known_user = 0
+        self.application = ValueIndex()
+        self.category = ValueIndex()
+
+        for idx, (_, rule) in enumerate(rules):
+            bit = 1 << idx
+            if rule.disabled:
+                continue
+
+            if rule.type == 'intrazone':
+                self.intrazone |= bit
+                self.tozone.add(idx, None)
+            else:
+                if rule.type == 'interzone':
+                    self.interzone |= bit
+                self.tozone.add(idx, rule.tozone or None)
+            self.fromzone.add(idx, rule.fromzone or None)
+
+            users = set(x.lower() for x in rule.source_user or ['any'])
+            if 'known-user' in users:
+                self.known_user |= bit
+                users.discard('known-user')
+            self.source_user.add(idx, users)
+
+            applications = self._applications(idx, rule.application)
+            self.application.add(idx, applications)
+            self.category.add(idx, rule.category or None)
+
+            self._add_rule(idx, rule, rule.service, applications)
+
+        self._finish()
+
+    def _applications(self, idx, members):
+        if not members or 'any' in members:
+            return None
+        ans = set()
+        for member in members:
+            ans.update(self._resolve(idx, self.objects.applications, member) or ())
+        return ans
+
+    def candidates(self, flow):
+        """Returns the bitmask of the rules that `flow` matches.
+
+        Flow keys that are missing or None match every rule.
+        """
+        mask = self._zones(flow, self.enabled)
+
+        fromzone = flow.get('source_zone')
+        tozone = flow.get('destination_zone')
+        if fromzone is not None and tozone is not None:
+            if fromzone == tozone:
+                mask &= ~self.interzone
+            else:
+                mask &= ~self.intrazone
+
+        user = flow.get('source_user')
+        if user is not None:
+            user_mask = self.source_user.lookup(user.lower())
+            if user.lower() != 'unknown':
+                user_mask |= self.known_user
+            mask &= user_mask
+
+        if flow.get('application') is not None:
+            mask &= self.application.lookup(flow['application'])
+        if flow.get('category') is not None:
+            mask &= self.category.lookup(flow['category'])
+
+        return self._addresses_and_ports(flow, mask)
+
+    def match(self, flow):
+        """Returns the index of the first rule `flow` matches, or None."""
+        return self._first(self.candidates(flow), flow)
+
+    def _details(self, idx, flow):
+        return {'action': self.rules[idx][1].action if idx is not None else None}
+
+
+class NatMatcher(RuleMatcher):
+    """A compiled NAT rulebase.
+
+    Flows can also have a `to_interface` key, the egress interface.
+
+    Translated addresses are worked out when the translation maps one
+    address to one address:  a single translated address, or a translated
+    subnet or range the same size as the original one (the address is then
+    offset into it).  Otherwise, only the translated pool is returned.
+
+    Args:
+        rules: List of (rulebase, NatRule), in evaluation order.
+        objects(ObjectIndex): The objects the rules refer to.
+    """
+    def __init__(self, rules, objects):
+        super(NatMatcher, self).__init__(rules, objects)
+        self.to_interface = ValueIndex()
+
+        for idx, (_, rule) in enumerate(rules):
+            if rule.disabled:
+                continue
+            self.fromzone.add(idx, rule.fromzone or None)
+            tozone = rule.tozone
+            if tozone and not isinstance(tozone, list):
+                tozone = [tozone]
+            self.tozone.add(idx, tozone or None)
+            self.to_interface.add(idx, [rule.to_interface or 'any'])
+            service = rule.service
+            if service and not isinstance(service, list):
+                service = [service]
+            self._add_rule(idx, rule, service)
+
+        self._finish()
+
+    def candidates(self, flow):
+        """Returns the bitmask of the rules that `flow` matches.
+
+        Flow keys that are missing or None match every rule.
+        """
+        mask = self._zones(flow, self.enabled)
+        if flow.get('to_interface') is not None:
+            mask &= self.to_interface.lookup(flow['to_interface'])
+        return self._addresses_and_ports(flow, mask)
+
+    def match(self, flow):
+        """Returns the index of the first rule `flow` matches, or None."""
+        return self._first(self.candidates(flow), flow)
+
+    def _details(self, idx, flow):
+        ans = {'source_translation': None, 'destination_translation': None}
+        if idx is None:
+            return ans
+        rule = self.rules[idx][1]
+        compiled = self.compiled[idx]
+
+        if rule.source_translation_type:
+            info = {'type': rule.source_translation_type, 'address': None}
+            if rule.source_translation_type == 'static-ip':
+                info['address'] = self._translate(
+                    flow.get('source_ip'), compiled['source'],
+                    [rule.source_translation_static_translated_address])
+                info['bi_directional'] = bool(rule.source_translation_static_bi_directional)
+                info['pool'] = [rule.source_translation_static_translated_address]
+            elif rule.source_translation_address_type == 'interface-address' and (
+                    rule.source_translation_type == 'dynamic-ip-and-port'):
+                info['interface'] = rule.source_translation_interface
+                address = rule.source_translation_ip_address
+                if address:
+                    info['address'] = address.split('/')[0]
+            else:
+                pool = rule.source_translation_translated_addresses or []
+                info['pool'] = pool
+                info['address'] = self._translate(None, None, pool)
+            ans['source_translation'] = info
+
+        port = rule.destination_translated_port or rule.destination_dynamic_translated_port
+        if rule.destination_translated_address:
+            ans['destination_translation'] = {
+                'type': 'static',
+                'address': self._translate(
+                    flow.get('destination_ip'), compiled['destination'],
+                    [rule.destination_translated_address]),
+                'pool': [rule.destination_translated_address],
+            }
+        elif rule.destination_dynamic_translated_address:
+            ans['destination_translation'] = {
+                'type': 'dynamic',
+                'address': None,
+                'pool': [rule.destination_dynamic_translated_address],
+                'distribution': rule.destination_dynamic_translated_distribution,
+            }
+        if ans['destination_translation'] is not None:
+            ans['destination_translation']['port'] = (
+                int(port) if port else flow.get('destination_port'))
+
+        return ans
+
+    def _translate(self, address, original, pool):
+        """Returns the translated address, if there is only one possibility.
+
+        Args:
+            address(str): The original address, or None if it doesn't
+                affect the translation.
+            original(IntervalSet): The rule's addresses `address` is in.
+            pool(list): The translated address names or values.
+        """
+        values = []
+        for name in pool:
+            try:
+                ans, unresolved = self.objects.addresses(name)
+            except GroupCycleError:
+                return None
+            if unresolved:
+                return None
+            values.extend(ans.intervals)
+        translated = IntervalSet(values).intervals
+        if len(translated) != 1:
+            return None
+        lo, hi = translated[0]
+        if lo == hi:
+            return address_text(lo)
+        if address is None or original is None:
+            return None
+
+        # Offset into a translated subnet or range of the same size.
+        key = address_key(address)
+        for a, b in original.intervals:
+            if a <= key <= b:
+                if b - a == hi - lo:
+                    return address_text(lo + key - a)
+                break
+        return None
+
+
+def policy_locations(device, parent):
+    """Returns the object scopes and rulebases for the policy of `parent`.
+
+    On a firewall, the rules and objects pushed from Panorama are included.
+    On Panorama, the shared pre and post rules are included around the
+    device group's (but not those of its parent device groups).
+
+    Returns:
+        tuple: (list of scope xpaths, list of (rulebase, xpath)), each in
+        the order they are evaluated.
+    """
+    base = parent.xpath_vsys()
+    if hasattr(device, 'refresh_devices'):
+        shared = '/config/shared'
+        if base == shared:
+            return [shared], [
+                ('shared-pre-rulebase', shared + '/pre-rulebase'),
+                ('shared-post-rulebase', shared + '/post-rulebase'),
+            ]
+        return [base, shared], [
+            ('shared-pre-rulebase', shared + '/pre-rulebase'),
+            ('pre-rulebase', base + '/pre-rulebase'),
+            ('post-rulebase', base + '/post-rulebase'),
+            ('shared-post-rulebase', shared + '/post-rulebase'),
+        ]
+
+    pushed = "/config/panorama/vsys/entry[@name='{0}']".format(parent.vsys or 'vsys1')
+    scopes = [base, pushed, '/config/shared', '/config/panorama/shared']
+    rulebases = [
+        ('panorama-pre-rulebase', pushed + '/pre-rulebase'),
+        ('firewall-rulebase', base + '/rulebase'),
+        ('panorama-post-rulebase', pushed + '/post-rulebase'),
+    ]
+    return scopes, rulebases
+
+
+def _fetch(device, xpath, obj_class):
+    """Retrieves the objects at `xpath`, which ends in their container."""
+    try:
+        root = device.xapi.get(xpath)
+    except PanDeviceError as e:
+        if not str(e).startswith('No such node'):
+            raise
+        return []
+
+    container = root.find('./result/' + xpath.rsplit('/', 1)[-1])
+    probe = obj_class()
+    probe.parent = device
+    return probe.refreshall_from_xml(container)
+
+
+def load_policy(device, parent, rule_type='security'):
+    """Reads the security (or NAT) rules and the objects they use from the device.
+
+    Returns:
+        tuple: (list of (rulebase, rule), ObjectIndex)
+    """
+    scopes, rulebases = policy_locations(device, parent)
+
+    kinds = (
+        ('address', objects.AddressObject),
+        ('address-group', objects.AddressGroup),
+        ('service', objects.ServiceObject),
+        ('service-group', objects.ServiceGroup),
+        ('application-group', objects.ApplicationGroup),
+        ('application-filter', objects.ApplicationFilter),
+    )
+    index = ObjectIndex()
+    for scope in scopes:
+        index.add_scope(dict(
+            (kind, _fetch(device, '{0}/{1}'.format(scope, kind), cls))
+            for kind, cls in kinds))
+
+    obj_class = {'security': SecurityRule, 'nat': NatRule}[rule_type]
+    rules = []
+    for rulebase, xpath in rulebases:
+        path = '{0}/{1}/rules'.format(xpath, rule_type)
+        for rule in _fetch(device, path, obj_class):
+            rules.append((rulebase, rule))
+
+    return rules, index
+
+
+def policy_match_cmd(flow, rule_type='security'):
+    """Returns the "test security-policy-match" (or nat) op command for `flow`."""
+    cmd = ['test {0}-policy-match'.format(rule_type)]
+    for key, arg, rule_types in POLICY_MATCH_ARGS:
+        if rule_type in rule_types and flow.get(key) is not None:
+            cmd.append('{0} "{1}"'.format(arg, flow[key]))
+    return ' '.join(cmd)
+
+
+def policy_match_rule(response):
+    """Returns the rule name in a "test security-policy-match" (or nat) response.
+
+    Returns None if no rule matched.
+    """
+    elm = response.find('./result/rules/entry')
+    if elm is not None:
+        name = elm.attrib.get('name', elm.text)
+    else:
+        # PAN-OS 8.1+ returns the matching Panorama rules as text:
+        #   "Rule Name; index: 1" {
+        #           from L3-trust;
+        #           ...
+        elm = response.find('./result/msg/line')
+        if elm is None or not elm.text or '"' not in elm.text:
+            return None
+        name = elm.text.split(';')[0].split('"')[1].strip()
+
+    tokens = name.split(';')
+    if len(tokens) == 2 and tokens[1].startswith(' index: '):
+        name = tokens[0]
+    return name
@@ -0,0 +1,139 @@
+# This code is part of Ansible, but is an independent component.
+# This particular file snippet, and this file snippet only, is BSD licensed.
+# Modules you write using this snippet, which is embedded dynamically by Ansible
+# still belong to the author of the module, and may assign their own license
+# to the complete work.
+#
+# Copyright (c) 2020 Palo Alto Networks techbizdev, <techbizdev@paloaltonetworks.com>
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright notice,
+#      this list of conditions and the following disclaimer in the documentation
+#      and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+# USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Field mappings for the object modules.
+
+As with the policy modules (see policy.py), the mapping between module
+params and pandevice params is shared by the single object modules and the
+bulk modules.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+from ansible.module_utils.network.panos.match import GroupCycleError
+from ansible.module_utils.network.panos.policy import argument_spec
+from ansible.module_utils.network.panos.policy import object_spec
+
+
+# (module param, pandevice param, argument spec) for AddressObject.
+ADDRESS_OBJECT_FIELDS = (
+    ('name', 'name', dict(required=True)),
+    ('value', 'value', dict()),
+    ('address_type', 'type', dict(default='ip-netmask', choices=['ip-netmask', 'ip-range', 'fqdn'])),
+    ('description', 'description', dict()),
+    ('tag', 'tag', dict(type='list')),
+)
+
+
+def address_object_argument_spec():
+    return argument_spec(ADDRESS_OBJECT_FIELDS)
+
+
+def address_object_spec(params):
+    return object_spec(ADDRESS_OBJECT_FIELDS, params)
+
+
+# (module param, pandevice param, argument spec) for AddressGroup.
+ADDRESS_GROUP_FIELDS = (
+    ('name', 'name', dict(type='str', required=True)),
+    ('static_value', 'static_value', dict(type='list')),
+    ('dynamic_value', 'dynamic_value', dict()),
+    ('description', 'description', dict()),
+    ('tag', 'tag', dict(type='list')),
+)
+
+
+def address_group_argument_spec():
+    return argument_spec(ADDRESS_GROUP_FIELDS)
+
+
+def address_group_spec(params):
+    return object_spec(ADDRESS_GROUP_FIELDS, params)
+
+
+# (module param, pandevice param, argument spec) for ServiceGroup.
+SERVICE_GROUP_FIELDS = (
+    ('name', 'name', dict(type='str', required=True)),
+    ('value', 'value', dict(type='list')),
+    ('tag', 'tag', dict(type='list')),
+)
+
+
+def service_group_argument_spec():
+    return argument_spec(SERVICE_GROUP_FIELDS)
+
+
+def service_group_spec(params):
+    return object_spec(SERVICE_GROUP_FIELDS, params)
+
+
+def dependency_order(members, kind):
+    """Orders groups so that each group comes after the groups it contains.
+
+    Groups that don't depend on each other keep the order of `members`, and
+    member names that aren't keys of `members` (objects, or groups that
+    aren't being ordered) are ignored.
+
+    Args:
+        members(OrderedDict): Group name to its list of member names.
+        kind(str): The group kind, for the error, such as "address-group".
+
+    Returns:
+        list: The group names, members first.
+
+    Raises:
+        GroupCycleError
+    """
+    ans = []
+    state = {}
+    for root in members:
+        if root in state:
+            continue
+        # Iterative depth first search, so deep nesting can't hit the
+        # recursion limit; `path` is the chain of groups being visited.
+        state[root] = False
+        path = [root]
+        stack = [iter(members[root] or ())]
+        while stack:
+            for name in stack[-1]:
+                if name not in members:
+                    continue
+                if name not in state:
+                    state[name] = False
+                    path.append(name)
+                    stack.append(iter(members[name] or ()))
+                    break
+                if not state[name]:
+                    raise GroupCycleError(kind, tuple(path[path.index(name):]) + (name, ))
+            else:
+                stack.pop()
+                name = path.pop()
+                state[name] = True
+                ans.append(name)
+
+    return ans
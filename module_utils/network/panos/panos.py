@@ -29,20 +29,34 @@ from __future__ import absolute_import, division, print_function
 __metaclass__ = type
 
 
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import tempfile
+import threading
 import time
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import quoteattr
+
+from ansible.module_utils.connection import Connection, ConnectionError
+from ansible.module_utils.six.moves import queue
 
 
 _MIN_VERSION_ERROR = '{0} version ({1}) < minimum version ({2})'
 HAS_PANDEVICE = True
 try:
     import pandevice
-    from pandevice.base import PanDevice
+    from pandevice.base import PanDevice, VsysOperations, ENTRY
     from pandevice.firewall import Firewall
-    from pandevice.panorama import DeviceGroup, Template, TemplateStack
+    from pandevice.panorama import Panorama, DeviceGroup, Template, TemplateStack
     from pandevice.policies import PreRulebase, PostRulebase, Rulebase
     from pandevice.device import Vsys
     from pandevice.errors import PanDeviceError
     from pandevice.errors import PanCommitNotNeeded
+    from pandevice.errors import PanConnectionTimeout, PanInvalidCredentials, PanURLError
 except ImportError:
     HAS_PANDEVICE = False
 
@@ -51,6 +65,894 @@ def _vstr(val):
     return '{0}.{1}.{2}'.format(*val)
 
 
+class _TransportResponse(object):
+    """The subset of an HTTP response that pan.xapi.PanXapi consumes."""
+    def __init__(self, body, headers):
+        self.pan_body = body
+        self._headers = headers
+
+    def getheader(self, name, default=None):
+        return self._headers.get(name.lower(), default)
+
+    def read(self):
+        return self.pan_body
+
+
+class RetryPolicy(object):
+    """Exponential backoff with jitter for opening the PAN-OS connection.
+
+    Errors are put into one of three classes:
+
+        * "auth" - Invalid credentials.  While PAN-OS boots, the XML API
+          answers this before its auth service is up, so these are retried
+          the same way as "api" errors until the deadline.
+        * "unreachable" - Connection refused / timed out.  The device (or
+          its management plane) is down, so retries start at
+          `initial_delay` and back off to `max_delay`.
+        * "api" - The device answered, but with an error.  The management
+          plane is up but not ready yet, so retries start at
+          `api_error_delay` instead.
+
+    Each delay is randomized to between half and all of its computed value
+    so that many forks waiting on the same device don't retry in lockstep.
+
+    Args:
+        initial_delay(float): The first delay, in seconds.
+        max_delay(float): The longest any one delay may be, in seconds.
+        multiplier(float): How much the delay grows with each attempt.
+        api_error_delay(float): The first delay for "api" errors.
+        connect_timeout(int): The API timeout for each attempt, in seconds.
+        jitter(bool): Randomize the delays.
+    """
+    def __init__(self, initial_delay=1, max_delay=30, multiplier=2,
+                 api_error_delay=5, connect_timeout=15, jitter=True):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.api_error_delay = api_error_delay
+        self.connect_timeout = connect_timeout
+        self.jitter = jitter
+
+    def classify(self, error):
+        """Returns the class of the given exception."""
+        if isinstance(error, PanInvalidCredentials):
+            return 'auth'
+        elif isinstance(error, (PanURLError, PanConnectionTimeout)):
+            return 'unreachable'
+        return 'api'
+
+    def delay(self, attempt, error):
+        """Returns how long to wait after the given (1 based) failed attempt."""
+        if self.classify(error) in ('api', 'auth'):
+            base = max(self.initial_delay, self.api_error_delay)
+        else:
+            base = self.initial_delay
+        val = min(self.max_delay, base * (self.multiplier ** (attempt - 1)))
+        if self.jitter:
+            val = random.uniform(val / 2.0, val)
+        return val
+
+
+class DeviceCache(object):
+    """On-disk cache of API keys and device identity.
+
+    Entries are keyed by hostname, port, and username, are stored in a
+    directory that only the current user may access, and expire after `ttl`
+    seconds.  An entry is only used if the password (or API key) given
+    matches the one that it was created with.
+
+    The cache is disabled unless the PANOS_DEVICE_CACHE_TTL environment
+    variable is set to a positive number of seconds.  PANOS_DEVICE_CACHE_DIR
+    overrides the default location of ~/.ansible/pandevice_cache.
+    """
+    def __init__(self, path=None, ttl=None):
+        if path is None:
+            path = os.environ.get('PANOS_DEVICE_CACHE_DIR') or os.path.join(
+                '~', '.ansible', 'pandevice_cache')
+        if ttl is None:
+            try:
+                ttl = int(os.environ.get('PANOS_DEVICE_CACHE_TTL', 0))
+            except ValueError:
+                ttl = 0
+        self.path = os.path.expanduser(path)
+        self.ttl = ttl
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def _filename(self, hostname, port, username):
+        key = '{0}:{1}:{2}'.format(hostname, port, username)
+        name = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, '{0}.json'.format(name))
+
+    @staticmethod
+    def _digest(salt, secret):
+        val = '{0}:{1}'.format(salt, secret or '')
+        return hashlib.sha256(val.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _is_private(path):
+        st = os.stat(path)
+        return st.st_uid == os.getuid() and not st.st_mode & 0o077
+
+    def load(self, hostname, port, username):
+        """Returns the raw cache entry, or None."""
+        fn = self._filename(hostname, port, username)
+        try:
+            if not self._is_private(self.path) or not self._is_private(fn):
+                return None
+            with open(fn) as fd:
+                return json.load(fd)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def is_valid(self, entry, secret):
+        """Returns True if `entry` is unexpired and matches `secret`."""
+        if not entry or 'api_key' not in entry:
+            return False
+        if time.time() - entry.get('created', 0) > self.ttl:
+            return False
+        return entry.get('auth') == self._digest(entry.get('salt'), secret)
+
+    def store(self, hostname, port, username, entry, secret=None):
+        """Writes `entry` to disk, re-salting the secret if one is given."""
+        if secret is not None:
+            entry['salt'] = base64.b16encode(os.urandom(16)).decode('ascii')
+            entry['auth'] = self._digest(entry['salt'], secret)
+            entry['created'] = time.time()
+
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path, 0o700)
+        if not self._is_private(self.path):
+            return
+
+        fn = self._filename(hostname, port, username)
+        tmp = '{0}.{1}.tmp'.format(fn, os.getpid())
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry, f)
+        os.rename(tmp, fn)
+
+    def invalidate(self, hostname, port, username):
+        """Removes the entry for this device / user."""
+        try:
+            os.remove(self._filename(hostname, port, username))
+        except OSError:
+            pass
+
+
+class CommitStore(object):
+    """Controller side store of pending (deferred) commits.
+
+    When the PANOS_DEFER_COMMIT environment variable is set to a true value,
+    ConnectionHelper.commit() records what should be committed here instead
+    of committing.  Each device has one record that accumulates the admins
+    to commit for, and the device groups to push to (plus whether to include
+    the template).  panos_commit then runs one commit (and one commit-all
+    per device group) for everything that was recorded.
+
+    PANOS_COMMIT_STORE_DIR overrides the default location of
+    ~/.ansible/panos_commits.
+    """
+    def __init__(self, path=None):
+        if path is None:
+            path = os.environ.get('PANOS_COMMIT_STORE_DIR') or os.path.join(
+                '~', '.ansible', 'panos_commits')
+        self.path = os.path.expanduser(path)
+
+    @property
+    def enabled(self):
+        return os.environ.get('PANOS_DEFER_COMMIT', '').lower() in ('1', 'true', 'yes', 'on')
+
+    def _filename(self, target):
+        name = hashlib.sha256(target.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, '{0}.json'.format(name))
+
+    def _locked(self, target, func):
+        import fcntl
+
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path, 0o700)
+        fn = self._filename(target)
+        fd = os.open(fn + '.lock', os.O_WRONLY | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                with open(fn) as f:
+                    record = json.load(f)
+            except (IOError, OSError, ValueError):
+                record = {}
+            ans, record = func(record)
+            if record:
+                tmp = '{0}.{1}.tmp'.format(fn, os.getpid())
+                wfd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(wfd, 'w') as f:
+                    json.dump(record, f)
+                os.rename(tmp, fn)
+            elif os.path.exists(fn):
+                os.remove(fn)
+        finally:
+            os.close(fd)
+        return ans
+
+    def record(self, target, admins=None, device_group=None, include_template=False):
+        """Records a commit request.
+
+        Args:
+            target(str): The device this commit is for.
+            admins(list): The admins to commit for, or None for all of them.
+            device_group(str): (Panorama) The device group to push to.
+            include_template(bool): (Panorama) Include the template in the push.
+
+        Returns:
+            str: "coalesced" if this merged into an already pending request for
+            the same target and device group, otherwise "deferred".
+        """
+        def _record(record):
+            status = 'deferred'
+            if record.get('commit'):
+                status = 'coalesced' if device_group is None else status
+                pending = record['commit']
+                if pending['admins'] is None or admins is None:
+                    pending['admins'] = None
+                else:
+                    pending['admins'] = sorted(set(pending['admins']) | set(admins))
+                pending['requests'] += 1
+            else:
+                record['commit'] = {
+                    'admins': sorted(set(admins)) if admins is not None else None,
+                    'requests': 1,
+                }
+
+            if device_group is not None:
+                groups = record.setdefault('device_groups', {})
+                if device_group in groups:
+                    status = 'coalesced'
+                    groups[device_group]['include_template'] |= bool(include_template)
+                    groups[device_group]['requests'] += 1
+                else:
+                    groups[device_group] = {
+                        'include_template': bool(include_template),
+                        'requests': 1,
+                    }
+
+            return status, record
+
+        return self._locked(target, _record)
+
+    def peek(self, target):
+        """Returns the pending commit requests for `target`."""
+        if not os.path.isdir(self.path):
+            # Nothing was ever deferred, so don't create the store.
+            return {}
+        return self._locked(target, lambda record: (record, record))
+
+    def clear(self, target, done):
+        """Removes the pending commit requests for `target` once committed.
+
+        `done` is what peek() returned.  Only the requests in `done` are
+        removed; any recorded since are kept, so that they are committed
+        next time.
+        """
+        def _clear(record):
+            if record.get('commit') and done.get('commit'):
+                pending = record['commit']
+                pending['requests'] -= done['commit']['requests']
+                if pending['requests'] <= 0:
+                    del record['commit']
+
+            groups = record.get('device_groups', {})
+            for name, info in done.get('device_groups', {}).items():
+                if name not in groups:
+                    continue
+                groups[name]['requests'] -= info['requests']
+                if groups[name]['requests'] <= 0:
+                    del groups[name]
+            if not groups:
+                record.pop('device_groups', None)
+
+            return None, record
+
+        self._locked(target, _clear)
+
+
+class CommitAllPush(object):
+    """Pushes Panorama config to many device groups and templates at once.
+
+    Each push is submitted as its own commit-all job, with at most
+    `max_concurrent` jobs outstanding at a time.  All outstanding jobs are
+    polled together with a single "show jobs all" per `interval`; a job's
+    per-device results are fetched once when the job finishes.
+
+    Args:
+        panorama: The pandevice.panorama.Panorama object.
+        max_concurrent(int): Max commit-all jobs outstanding at once.
+        interval(float): Seconds between polls.
+        timeout(float): Give up on unfinished jobs after this many seconds
+            (None or 0 to wait forever).
+        log: Callable that is given a message each time a push or device
+            finishes, such as AnsibleModule.log.
+    """
+    def __init__(self, panorama, max_concurrent=5, interval=5, timeout=None, log=None):
+        self.panorama = panorama
+        self.max_concurrent = max(1, max_concurrent)
+        self.interval = interval
+        self.timeout = timeout
+        self.log = log
+        self.pushes = []
+        self.polls = 0
+
+    def add_device_group(self, name, include_template=None, description=None):
+        e = ET.Element('commit-all')
+        sp = ET.SubElement(e, 'shared-policy')
+        dg = ET.SubElement(sp, 'device-group')
+        ET.SubElement(dg, 'entry', {'name': name})
+        if description is not None:
+            ET.SubElement(sp, 'description').text = description
+        if include_template is not None:
+            ET.SubElement(sp, 'include-template').text = 'yes' if include_template else 'no'
+        self._add('device-group', name, e)
+
+    def add_template(self, name, stack=False, description=None):
+        kind = 'template-stack' if stack else 'template'
+        e = ET.Element('commit-all')
+        t = ET.SubElement(e, kind)
+        ET.SubElement(t, 'name').text = name
+        if description is not None:
+            ET.SubElement(t, 'description').text = description
+        self._add(kind, name, e)
+
+    def _add(self, kind, name, cmd):
+        self.pushes.append({
+            'type': kind,
+            'name': name,
+            'cmd': ET.tostring(cmd),
+            'job': None,
+            'status': 'pending',
+            'messages': [],
+            'devices': [],
+            'queued': None,
+            'elapsed': None,
+        })
+
+    def run(self):
+        """Submits all pushes and waits for them to finish.
+
+        Returns:
+            dict: The per-push results and timings.  Times are in seconds; a
+            push's "queued" is how long it waited for a free job slot and
+            "elapsed" is from submission until the job finished.
+        """
+        self.start = time.time()
+        waiting = list(self.pushes)
+        running = []
+
+        while waiting or running:
+            while waiting and len(running) < self.max_concurrent:
+                push = waiting.pop(0)
+                if self._submit(push):
+                    running.append(push)
+
+            if not running:
+                continue
+
+            if self.timeout and time.time() - self.start > self.timeout:
+                for push in running + waiting:
+                    push['status'] = 'timeout'
+                    push['messages'].append('Timed out waiting for job completion')
+                break
+
+            time.sleep(self.interval)
+            running = self._poll(running)
+
+        for push in self.pushes:
+            push.pop('cmd', None)
+            push.pop('_submitted', None)
+            push.pop('_finishing', None)
+
+        return {
+            'pushes': self.pushes,
+            'elapsed': round(time.time() - self.start, 3),
+            'polls': self.polls,
+            'failed': len([x for x in self.pushes if x['status'] not in ('OK', 'not needed')]),
+        }
+
+    def _now(self):
+        return round(time.time() - self.start, 3)
+
+    def _submit(self, push):
+        push['queued'] = self._now()
+        push['_submitted'] = time.time()
+        try:
+            ans = self.panorama.xapi.commit(
+                cmd=push['cmd'], action='all', retry_on_peer=True)
+        except PanDeviceError as e:
+            self._finish(push, 'error', [str(e)])
+            return False
+
+        job = ans.find('./result/job')
+        if job is None:
+            self._finish(push, 'not needed', [])
+            return False
+
+        push['job'] = job.text
+        push['status'] = 'running'
+        return True
+
+    def _poll(self, running):
+        """Polls all running jobs, returning the ones still running."""
+        self.polls += 1
+        try:
+            ans = self.panorama.xapi.op('<show><jobs><all/></jobs></show>')
+        except PanDeviceError:
+            # Panorama can be briefly unresponsive while pushing; try again
+            # next interval.
+            return running
+
+        jobs = dict((x.findtext('id'), x) for x in ans.findall('./result/job'))
+        still_running = []
+        for push in running:
+            job = jobs.get(push['job'])
+            if job is not None and job.findtext('status') != 'FIN':
+                still_running.append(push)
+                continue
+
+            # Finished (or no longer listed):  get the per-device results.
+            try:
+                detail = self.panorama.xapi.op(
+                    '<show><jobs><id>{0}</id></jobs></show>'.format(push['job']))
+            except PanDeviceError as e:
+                self._finish(push, 'error', [str(e)])
+                continue
+            job = detail.find('./result/job')
+            if job is None or job.findtext('status') != 'FIN':
+                still_running.append(push)
+                continue
+
+            pending = self._update_devices(push, job)
+            if pending:
+                still_running.append(push)
+                continue
+
+            messages = [x.text for x in job.findall('./details/line') if x.text]
+            self._finish(push, job.findtext('result'), messages)
+
+        return still_running
+
+    def _update_devices(self, push, job):
+        known = dict((x['serial'], x) for x in push['devices'])
+        pending = False
+        for entry in job.findall('./devices/entry'):
+            serial = entry.findtext('serial-no')
+            result = entry.findtext('result')
+            if result == 'PEND':
+                pending = True
+                continue
+            if serial in known:
+                continue
+            dev = {
+                'serial': serial,
+                'name': entry.findtext('devicename'),
+                'result': result,
+                'status': entry.findtext('status'),
+                'elapsed': round(time.time() - push['_submitted'], 3),
+            }
+            push['devices'].append(dev)
+            if self.log is not None:
+                self.log('commit-all {0} {1}: device {2} {3}'.format(
+                    push['type'], push['name'], dev['name'] or serial, result))
+
+        return pending
+
+    def _finish(self, push, result, messages):
+        push['status'] = result or 'error'
+        push['messages'].extend(messages)
+        push['elapsed'] = round(time.time() - push['_submitted'], 3)
+        if self.log is not None:
+            self.log('commit-all {0} {1}: {2}'.format(
+                push['type'], push['name'], push['status']))
+
+
+class ConfigBatch(object):
+    """Buffer of config changes that are sent as multi-config requests.
+
+    Operations are sent in the order they were added.  Each request is
+    strict-transactional, so if any operation in a request fails, none of
+    the operations in that request are applied.  Requests are split so that
+    no request is larger than `max_size` bytes or has more than `max_ops`
+    operations.
+
+    Args:
+        device: The pandevice Firewall or Panorama to send requests to.
+        max_size(int): Max size in bytes of each request's element.
+        max_ops(int): Max operations per request.
+    """
+    def __init__(self, device, max_size=500000, max_ops=1000):
+        self.device = device
+        self.max_size = max_size
+        self.max_ops = max_ops
+        self.ops = []
+        self.stats = {
+            'operations': 0,
+            'applied': 0,
+            'requests': 0,
+            'bytes': 0,
+            'elapsed': 0,
+        }
+
+    def __len__(self):
+        return len(self.ops)
+
+    def set(self, xpath, element, label=None):
+        self._add('set', label, xpath, element)
+
+    def edit(self, xpath, element, label=None):
+        self._add('edit', label, xpath, element)
+
+    def delete(self, xpath, label=None):
+        self._add('delete', label, xpath)
+
+    def move(self, xpath, where, dst=None, label=None):
+        attrs = {'where': where}
+        if dst is not None:
+            attrs['dst'] = dst
+        self._add('move', label, xpath, attrs=attrs)
+
+    def create(self, obj):
+        """Adds the equivalent of `obj.create()`."""
+        self.set(obj.xpath_short(), obj.element_str(),
+                 'create {0} "{1}"'.format(obj.__class__.__name__, obj.uid))
+
+    def apply(self, obj):
+        """Adds the equivalent of `obj.apply()`."""
+        self.edit(obj.xpath(), obj.element_str(),
+                  'apply {0} "{1}"'.format(obj.__class__.__name__, obj.uid))
+
+    def remove(self, obj):
+        """Adds the equivalent of `obj.delete()`."""
+        self.delete(obj.xpath(),
+                    'delete {0} "{1}"'.format(obj.__class__.__name__, obj.uid))
+        if obj.parent is not None and obj in obj.parent.children:
+            obj.parent.remove(obj)
+
+    @staticmethod
+    def supports(obj):
+        """Returns if `obj`'s create / apply / delete can be batched.
+
+        Objects that are imported into a vsys, or whose children need
+        special handling, have to use the pandevice methods directly.
+        """
+        if isinstance(obj, VsysOperations):
+            return False
+        for x in obj.children:
+            if x.CHILDMETHODS or not ConfigBatch.supports(x):
+                return False
+        return True
+
+    def _add(self, op, label, xpath, element=None, attrs=None):
+        if isinstance(element, bytes):
+            element = element.decode('utf-8')
+        if element is not None and element.startswith('<?xml'):
+            element = element[element.index('?>') + 2:].lstrip()
+        extra = ''.join(' {0}={1}'.format(k, quoteattr(v)) for k, v in sorted((attrs or {}).items()))
+        # The id is put between the head and the tail when the request is
+        # built.
+        head = '<{0} id="'.format(op)
+        tail = '" xpath={0}{1}'.format(quoteattr(xpath), extra)
+        if element is None:
+            tail += '/>'
+        else:
+            tail += '>{0}</{1}>'.format(element, op)
+        self.ops.append((label or '{0} {1}'.format(op, xpath), head, tail))
+        self.stats['operations'] += 1
+
+    def flush(self):
+        """Sends all buffered operations.
+
+        Raises:
+            PanDeviceError: If a request failed.  The message names the
+                operation that failed, if PAN-OS reported it.
+        """
+        start = time.time()
+        try:
+            while self.ops:
+                chunk, size = [], 0
+                for label, head, tail in self.ops:
+                    elm = head + str(len(chunk) + 1) + tail
+                    if chunk and (len(chunk) >= self.max_ops or size + len(elm) > self.max_size):
+                        break
+                    chunk.append((label, elm))
+                    size += len(elm)
+                self._send(chunk)
+                del self.ops[:len(chunk)]
+        finally:
+            self.stats['elapsed'] = round(self.stats['elapsed'] + time.time() - start, 3)
+
+    def _send(self, chunk):
+        element = '<multi-configure-request>{0}</multi-configure-request>'.format(
+            ''.join(x[1] for x in chunk))
+        xapi = self.device.xapi
+        if not hasattr(xapi, 'multi_config'):
+            raise PanDeviceError('Batched changes require a pan-python with multi-config support')
+
+        self.stats['requests'] += 1
+        self.stats['bytes'] += len(element.encode('utf-8'))
+
+        try:
+            xapi.multi_config(element=element, strict=True)
+        except PanDeviceError as e:
+            failed = self._failed_op(xapi.element_root)
+            if failed is None or failed > len(chunk):
+                raise
+            raise PanDeviceError('Failed {0} (operation {1} of {2}): {3}'.format(
+                chunk[failed - 1][0], self.stats['applied'] + failed,
+                self.stats['operations'], e))
+
+        self.stats['applied'] += len(chunk)
+
+    @staticmethod
+    def _failed_op(root):
+        if root is None:
+            return None
+        candidates = [root] + root.findall('./response')
+        for elm in candidates:
+            if elm.attrib.get('status') == 'error' and elm.attrib.get('id'):
+                try:
+                    return int(elm.attrib['id'])
+                except ValueError:
+                    return None
+
+
+class ApiProfiler(object):
+    """Records every XML API call made during a module invocation.
+
+    Recording is turned on by setting the PANOS_PROFILE environment variable
+    to a true value (a summary is then returned as "panos_profile"), or by
+    setting PANOS_PROFILE_FILE to the path of a file that each call is
+    appended to as a line of JSON.
+
+    A call is counted as a retry of the one before it if the previous call
+    failed and was for the same type, xpath / cmd.  Calls can be recorded
+    from more than one thread (see ConnectionHelper.run_ops()).
+    """
+    SLOWEST = 5
+
+    def __init__(self):
+        self.summarize = os.environ.get('PANOS_PROFILE', '').lower() in ('1', 'true', 'yes', 'on')
+        self.path = os.environ.get('PANOS_PROFILE_FILE') or None
+        self.context = {}
+        self.records = []
+        self._last = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.summarize or self.path is not None
+
+    @staticmethod
+    def call_type(query):
+        kind = query.get('type')
+        if kind == 'config':
+            return query.get('action') or kind
+        return kind
+
+    def record(self, query, body, response, elapsed):
+        with self._lock:
+            self._record(query, body, response, elapsed)
+
+    def _record(self, query, body, response, elapsed):
+        if query.get('type') == 'keygen':
+            target = None
+        else:
+            target = query.get('xpath') or query.get('cmd')
+        if isinstance(target, bytes):
+            target = target.decode('utf-8', 'replace')
+        kind = self.call_type(query)
+
+        retry = 0
+        if self._last is not None and not self._last['ok']:
+            if (self._last['type'], self._last['target']) == (kind, target):
+                retry = self._last['retry'] + 1
+
+        size = sum(len(k) + len(str(v)) + 2 for k, v in query.items() if k != 'key')
+        rec = {
+            'type': kind,
+            'target': target,
+            'elapsed': round(elapsed, 4),
+            'request_bytes': size + len(body or ''),
+            'response_bytes': len(response.pan_body or '') if response else 0,
+            'retry': retry,
+            'ok': bool(response),
+        }
+        self.records.append(rec)
+        self._last = rec
+
+        if self.path is not None:
+            line = dict(self.context)
+            line['time'] = round(time.time(), 3)
+            line.update(rec)
+            try:
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps(line) + '\n')
+            except (IOError, OSError):
+                # Profiling must never break the module.
+                self.path = None
+
+    def summary(self):
+        """Returns the totals, per call type totals, and the slowest calls."""
+        ans = {
+            'calls': len(self.records),
+            'elapsed': 0,
+            'request_bytes': 0,
+            'response_bytes': 0,
+            'retries': 0,
+            'failed': 0,
+            'by_type': {},
+        }
+        for rec in self.records:
+            ans['elapsed'] += rec['elapsed']
+            ans['request_bytes'] += rec['request_bytes']
+            ans['response_bytes'] += rec['response_bytes']
+            ans['retries'] += 1 if rec['retry'] else 0
+            ans['failed'] += 0 if rec['ok'] else 1
+            info = ans['by_type'].setdefault(
+                rec['type'], {'calls': 0, 'elapsed': 0, 'response_bytes': 0})
+            info['calls'] += 1
+            info['elapsed'] += rec['elapsed']
+            info['response_bytes'] += rec['response_bytes']
+
+        ans['elapsed'] = round(ans['elapsed'], 3)
+        for info in ans['by_type'].values():
+            info['elapsed'] = round(info['elapsed'], 3)
+        ans['slowest'] = sorted(
+            self.records, key=lambda x: x['elapsed'], reverse=True)[:self.SLOWEST]
+
+        # The same kind of call repeated for different entries is usually an
+        # N+1 pattern.
+        patterns = {}
+        for rec in self.records:
+            target = re.sub(r"@name='[^']*'", "@name='*'", rec['target'] or '')
+            patterns[(rec['type'], target)] = patterns.get((rec['type'], target), 0) + 1
+        ans['repeated'] = [
+            {'type': k[0], 'target': k[1], 'calls': v}
+            for k, v in sorted(patterns.items(), key=lambda x: x[1], reverse=True)
+            if v > 1][:self.SLOWEST]
+
+        return ans
+
+
+def _longest_increasing_run(seq):
+    """Returns the indexes of a longest strictly increasing subsequence."""
+    tails, prev = [], [None] * len(seq)
+    for i, val in enumerate(seq):
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if seq[tails[mid]] < val:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo > 0:
+            prev[i] = tails[lo - 1]
+        if lo == len(tails):
+            tails.append(i)
+        else:
+            tails[lo] = i
+
+    ans = []
+    i = tails[-1] if tails else None
+    while i is not None:
+        ans.append(i)
+        i = prev[i]
+    return ans[::-1]
+
+
+def plan_moves(order, names):
+    """Returns the fewest moves that put `names` in order within `order`.
+
+    Only the relative order of `names` is enforced; everything else in
+    `order` stays put.  The rules in `names` that are already in a longest
+    increasing run (by their current position) are not moved, and every
+    other rule is moved right after the rule before it in `names` (or, for
+    the first rule, before the first rule that stays put).
+
+    `order` is updated in place to reflect the moves.
+
+    Args:
+        order(list): The current order of all the rules in the rulebase.
+        names(list): The desired order of the rules being managed.  Every
+            name must be present in `order`.
+
+    Returns:
+        list: (name, location, existing_rule) tuples, to be done in order.
+    """
+    positions = dict((uid, idx) for idx, uid in enumerate(order))
+    keep = set(names[i] for i in _longest_increasing_run([positions[x] for x in names]))
+
+    moves = []
+    for idx, uid in enumerate(names):
+        if uid in keep:
+            continue
+        order.remove(uid)
+        if idx == 0:
+            ref = [x for x in names if x in keep][0]
+            order.insert(order.index(ref), uid)
+            moves.append((uid, 'before', ref))
+        else:
+            ref = names[idx - 1]
+            order.insert(order.index(ref) + 1, uid)
+            moves.append((uid, 'after', ref))
+
+    return moves
+
+
+def _pairwise_move_count(order, names):
+    """The number of moves fixing one adjacent pair at a time would take."""
+    order = list(order)
+    count = 0
+    for prev, uid in zip(names, names[1:]):
+        if order.index(uid) > order.index(prev):
+            continue
+        order.remove(uid)
+        order.insert(order.index(prev) + 1, uid)
+        count += 1
+    return count
+
+
+def bulk_diff(changes):
+    """Formats the changes from apply_bulk_state() for diff mode."""
+    lines = []
+    for name in changes['create']:
+        lines.append('+ {0}'.format(name))
+    for info in changes['update']:
+        lines.append('~ {0}'.format(info['name']))
+        for key, val in info['changes'].items():
+            lines.append('    {0}: {1!r} -> {2!r}'.format(key, val['before'], val['after']))
+    for name in changes['delete']:
+        lines.append('- {0}'.format(name))
+    for info in changes['move']:
+        lines.append('> {0} {1} {2}'.format(
+            info['name'], info['location'], info['existing_rule']))
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+def write_json_lines(path, items, chunk_size=1000):
+    """Writes `items` to `path` as JSON lines.
+
+    The lines are written `chunk_size` at a time, so `items` can be a
+    generator and the whole output is never held in memory.  The file is
+    written under a temporary name and renamed into place when done.
+
+    Returns:
+        tuple: The number of items written and the sha256 of the file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix='.panos', dir=directory)
+    digest = hashlib.sha256()
+    count = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            chunk = []
+            for item in items:
+                chunk.append(json.dumps(item, sort_keys=True) + '\n')
+                count += 1
+                if len(chunk) >= chunk_size:
+                    data = ''.join(chunk).encode('utf-8')
+                    digest.update(data)
+                    f.write(data)
+                    chunk = []
+            data = ''.join(chunk).encode('utf-8')
+            digest.update(data)
+            f.write(data)
+        os.rename(tmp, path)
+    except Exception:
+        os.remove(tmp)
+        raise
+
+    return count, digest.hexdigest()
+
+
 class ConnectionHelper(object):
     def __init__(self, min_pandevice_version, min_panos_version,
                  error_on_shared, panorama_error, firewall_error):
@@ -77,7 +979,33 @@ class ConnectionHelper(object):
         # The PAN-OS device.
         self.device = None
 
-    def get_pandevice_parent(self, module, timeout=0):
+        # The persistent (httpapi) connection, if one is in use.
+        self.connection = None
+
+        # Device cache and the key of this device's entry in it.
+        self.device_cache = DeviceCache()
+        self._cache_key = None
+        self._cache_entry = None
+
+        # Extra info that is added to the module's result.
+        self.result_info = {}
+
+        # Rule order snapshots, keyed by rulebase xpath, and the rules
+        # created (or, in check mode, to be created) before there was one.
+        self._rule_orders = {}
+        self._created_rules = {}
+
+        # Pending (deferred) commits.
+        self.commit_store = CommitStore()
+
+        # Batched config changes (see start_batch()).
+        self.batch = None
+
+        # XML API call instrumentation.
+        self.profiler = ApiProfiler()
+
+    def get_pandevice_parent(self, module, timeout=0, device_cache=True,
+                             retry_policy=None):
         """Builds the pandevice object tree, returning the parent object.
 
         If pandevice is not installed, then module.fail_json() will be
@@ -86,6 +1014,11 @@ class ConnectionHelper(object):
         Arguments:
             * module(AnsibleModule): the ansible module.
             * timeout(int): Number of seconds to retry opening the connection to PAN-OS.
+            * device_cache(bool): Allow the API key and device identity to be
+              loaded from the on-disk device cache (if it is enabled).  The
+              cache is never used if a timeout is given.
+            * retry_policy(RetryPolicy): How to retry while the timeout has not
+              yet expired.  Defaults to RetryPolicy() if a timeout is given.
 
         Returns:
             * The parent pandevice object based on the spec given to
@@ -95,6 +1028,9 @@ class ConnectionHelper(object):
         if not HAS_PANDEVICE:
             module.fail_json(msg='Missing required library "pandevice".')
 
+        self._hook_results(module)
+        self.profiler.context['module'] = getattr(module, '_name', None)
+
         # Verify pandevice minimum version.
         if self.min_pandevice_version is not None:
             pdv = tuple(int(x) for x in pandevice.__version__.split('.'))
@@ -113,6 +1049,8 @@ class ConnectionHelper(object):
                 module.params['provider']['port'],
             )
             serial_number = module.params['provider']['serial_number']
+            if pan_device_auth[2] is None and pan_device_auth[3] is None:
+                module.fail_json(msg='one of the following is required: password, api_key')
         elif module.params.get('ip_address', None) is not None:
             pan_device_auth = (
                 module.params['ip_address'],
@@ -123,6 +1061,13 @@ class ConnectionHelper(object):
             )
             msg = 'Classic provider params are deprecated; use "provider" instead'
             module.deprecate(msg, '2.12')
+            if pan_device_auth[2] is None and pan_device_auth[3] is None:
+                module.fail_json(msg='one of the following is required: password, api_key')
+        elif getattr(module, '_socket_path', None) is not None:
+            # Persistent connection: ansible_connection=httpapi.
+            self.connection = Connection(module._socket_path)
+            if module.params['provider']:
+                serial_number = module.params['provider']['serial_number']
         else:
             module.fail_json(msg='Provider params are required.')
 
@@ -131,17 +1076,53 @@ class ConnectionHelper(object):
             raise ValueError('Timeout must be an int')
         elif timeout < 0:
             raise ValueError('Timeout must greater than or equal to 0')
+        if pan_device_auth is not None:
+            self._cache_key = (pan_device_auth[0], pan_device_auth[4], pan_device_auth[1])
+            self.profiler.context['host'] = pan_device_auth[0]
+        use_cache = (device_cache and timeout == 0 and
+                     pan_device_auth is not None and self.device_cache.enabled)
+        if use_cache:
+            self.device = self._device_from_cache(pan_device_auth)
+
+        if timeout and retry_policy is None:
+            retry_policy = RetryPolicy()
+
         end_time = time.time() + timeout
-        while True:
+        attempts, waited, errors = 0, 0, {}
+        while self.device is None:
+            attempts += 1
             try:
-                self.device = PanDevice.create_from_device(*pan_device_auth)
+                if self.connection is not None:
+                    self.device = self._device_from_connection()
+                elif retry_policy is not None:
+                    self.device = self._create_from_device(
+                        pan_device_auth, retry_policy.connect_timeout)
+                elif use_cache:
+                    # Also gets multi-vsys, which is cached.
+                    self.device = self._create_from_device(pan_device_auth)
+                else:
+                    self.device = PanDevice.create_from_device(*pan_device_auth)
+                    self._prepare_device(self.device)
             except PanDeviceError as e:
                 if timeout == 0:
                     module.fail_json(msg='Failed connection: {0}'.format(e))
-                elif time.time() >= end_time:
+                kind = retry_policy.classify(e)
+                errors[kind] = errors.get(kind, 0) + 1
+                self.result_info['connection'] = {
+                    'attempts': attempts, 'wait': round(waited, 2), 'errors': errors}
+                remaining = end_time - time.time()
+                if remaining <= 0:
                     module.fail_json(msg='Connection timeout: {0}'.format(e))
-            else:
-                break
+                delay = min(remaining, retry_policy.delay(attempts, e))
+                time.sleep(delay)
+                waited += delay
+
+        if retry_policy is not None:
+            self.result_info['connection'] = {
+                'attempts': attempts, 'wait': round(waited, 2), 'errors': errors}
+
+        if use_cache and not self.result_info['device_cache']['hit']:
+            self._save_device_cache(pan_device_auth)
 
         # Verify PAN-OS minimum version.
         if self.min_panos_version is not None:
@@ -154,6 +1135,7 @@ class ConnectionHelper(object):
         if hasattr(self.device, 'refresh_devices') and serial_number:
             fw = Firewall(serial=serial_number)
             self.device.add(fw)
+            self._prepare_device(fw)
             self.device = fw
 
         parent = self.device
@@ -277,6 +1259,357 @@ class ConnectionHelper(object):
         # Done.
         return parent
 
+    def _hook_results(self, module):
+        """Merges `result_info` into whatever result the module returns."""
+        if getattr(module, '_panos_result_hook', False):
+            return
+        module._panos_result_hook = True
+
+        def _wrap(func):
+            def _with_info(**kwargs):
+                for k, v in self.result_info.items():
+                    kwargs.setdefault(k, v)
+                if self.profiler.summarize:
+                    kwargs.setdefault('panos_profile', self.profiler.summary())
+                func(**kwargs)
+            return _with_info
+
+        module.exit_json = _wrap(module.exit_json)
+        module.fail_json = _wrap(module.fail_json)
+
+    def _create_from_device(self, auth, timeout=None):
+        """PanDevice.create_from_device(), but with a per request timeout.
+
+        Only the discovery requests use `timeout`; the returned device has
+        pandevice's default timeout so that long running calls still work.
+        Unlike PanDevice.create_from_device(), a firewall's multi_vsys is set.
+        """
+        hostname, username, password, api_key, port = auth
+        probe = PanDevice(hostname, username, password, api_key, port)
+        if timeout is not None:
+            probe.timeout = timeout
+        self._prepare_device(probe)
+        system_info = probe.show_system_info()
+        probe._save_system_info(system_info)
+
+        if probe.platform == 'Panorama' or probe.platform.startswith('M-'):
+            info = {'type': 'panorama'}
+        else:
+            info = {
+                'type': 'firewall',
+                'serial': probe.serial,
+                'multi_vsys': system_info['system'].get('multi-vsys') == 'on',
+            }
+        info['version'] = probe.version
+
+        return self._device_from_info(hostname, port, probe.api_key, info)
+
+    def _device_from_info(self, hostname, port, api_key, info):
+        """Builds a Firewall or Panorama from known device info.
+
+        Args:
+            hostname(str): The hostname.
+            port(int): The port.
+            api_key(str): The API key.
+            info(dict): Has keys "type" ("firewall" or "panorama"), "version",
+                "serial", and "multi_vsys".
+
+        Returns:
+            Either a Firewall or a Panorama.
+        """
+        if info['type'] == 'panorama':
+            device = Panorama(hostname, api_key=api_key, port=port)
+        else:
+            device = Firewall(hostname, api_key=api_key, serial=info['serial'], port=port)
+            device.multi_vsys = info['multi_vsys']
+        device._set_version_and_version_info(info['version'])
+        self._prepare_device(device)
+
+        return device
+
+    def _device_from_connection(self):
+        """Builds the PanDevice from the persistent connection's cached info.
+
+        No keygen or "show system info" is performed here; the httpapi plugin
+        has already done both once for the whole play.
+
+        Returns:
+            Either a Firewall or a Panorama.
+        """
+        try:
+            info = dict(self.connection.device_info())
+            api_key = self.connection.api_key()
+        except ConnectionError as e:
+            raise PanDeviceError('URLError: reason: {0}'.format(e))
+
+        model = info['model'] or ''
+        if model == 'Panorama' or model.startswith('M-'):
+            info['type'] = 'panorama'
+        else:
+            info['type'] = 'firewall'
+
+        return self._device_from_info(info['hostname'], info['port'], api_key, info)
+
+    def _device_from_cache(self, auth):
+        """Builds the PanDevice from the device cache, returning None on a miss."""
+        hostname, username, password, api_key, port = auth
+        entry = self.device_cache.load(hostname, port, username) or {}
+        hit = self.device_cache.is_valid(entry, password or api_key)
+        if hit and entry.get('type') == 'firewall' and entry.get('multi_vsys') is None:
+            # Entries cached before multi-vsys was recorded.
+            hit = False
+        if hit:
+            entry['hits'] = entry.get('hits', 0) + 1
+            try:
+                self.device_cache.store(hostname, port, username, entry)
+            except (IOError, OSError):
+                pass
+        else:
+            entry['misses'] = entry.get('misses', 0) + 1
+
+        self._cache_entry = entry
+        self.result_info['device_cache'] = {
+            'hit': hit,
+            'hits': entry.get('hits', 0),
+            'misses': entry.get('misses', 0),
+        }
+
+        if hit:
+            return self._device_from_info(hostname, port, entry['api_key'], entry)
+
+    def _save_device_cache(self, auth):
+        """Saves the API key and identity of `self.device` to the device cache."""
+        hostname, username, password, api_key, port = auth
+        entry = self._cache_entry
+        entry.update({
+            'api_key': self.device.api_key,
+            'type': 'panorama' if hasattr(self.device, 'refresh_devices') else 'firewall',
+            'version': self.device.version,
+            'serial': self.device.serial,
+            'multi_vsys': getattr(self.device, 'multi_vsys', None),
+        })
+        try:
+            self.device_cache.store(hostname, port, username, entry, password or api_key)
+        except (IOError, OSError):
+            pass
+
+    def invalidate_device_cache(self):
+        """Removes this device's entry from the device cache.
+
+        Modules that change what is cached (such as the PAN-OS version)
+        should invoke this afterwards.
+        """
+        if self._cache_key is not None:
+            self.device_cache.invalidate(*self._cache_key)
+
+    def _prepare_device(self, device):
+        """Makes any xapi that `device` creates use this helper's transport."""
+        generate_xapi = device.generate_xapi
+
+        def _generate_xapi():
+            xapi = generate_xapi()
+            self._install_transport(xapi)
+            return xapi
+
+        device.generate_xapi = _generate_xapi
+
+    def _install_transport(self, xapi):
+        """Routes a pan.xapi.PanXapi's HTTP requests through this helper.
+
+        pan-python funnels every XML API request through its private
+        `__api_request()`, so replacing that one method on the instance is
+        enough to see (or redirect) all of the device traffic.
+        """
+        if self.connection is not None:
+            send = self._connection_request(xapi)
+        else:
+            send = xapi._PanXapi__api_request
+
+        def _api_request(query, body=None, headers={}):
+            start = time.time()
+            if body is None:
+                response = send(query)
+            else:
+                response = send(query, body=body, headers=headers)
+            if self.profiler.enabled:
+                self.profiler.record(query, body, response, time.time() - start)
+            if not response and 'code: 403' in str(xapi.status_detail):
+                # A rejected API key can't be trusted in the cache anymore.
+                if self.result_info.get('device_cache', {}).get('hit'):
+                    self.invalidate_device_cache()
+            return response
+
+        xapi._PanXapi__api_request = _api_request
+
+    def _connection_request(self, xapi):
+        """Returns a pan.xapi request function using the persistent connection."""
+        connection = self.connection
+
+        def _api_request(query, body=None, headers={}):
+            if body is not None:
+                body = base64.b64encode(body).decode('ascii')
+            try:
+                ans = connection.send_request(query, body, headers)
+            except ConnectionError as e:
+                xapi.status_detail = 'URLError: reason: {0}'.format(e)
+                return False
+            return _TransportResponse(base64.b64decode(ans['body']), ans['headers'])
+
+        return _api_request
+
+    def run_ops(self, cmds, vsys=None, workers=5, cmd_xml=True):
+        """Runs op commands on the device concurrently.
+
+        Up to `workers` threads run the commands, each with its own xapi
+        (pan.xapi.PanXapi is not thread safe), but all on the same device
+        and credentials.
+
+        Args:
+            cmds(list): The op commands.
+            vsys(str): The vsys to run the commands in.
+            workers(int): The max number of threads.
+            cmd_xml(bool): The commands are text to convert to XML, instead
+                of XML.
+
+        Returns:
+            list: (response, error, elapsed) for each command, in the same
+            order as `cmds`.  Either the response or the error is None.
+        """
+        results = [None] * len(cmds)
+        todo = queue.Queue()
+        for num, cmd in enumerate(cmds):
+            todo.put((num, cmd))
+
+        def _worker():
+            xapi = self.device.generate_xapi()
+            while True:
+                try:
+                    num, cmd = todo.get_nowait()
+                except queue.Empty:
+                    return
+                start = time.time()
+                response, error = None, None
+                try:
+                    response = xapi.op(cmd, vsys, cmd_xml)
+                except Exception as e:
+                    # An exception can't leave the thread, so anything
+                    # raised is reported as this command's error.
+                    error = e
+                results[num] = (response, error, round(time.time() - start, 4))
+
+        threads = [
+            threading.Thread(target=_worker)
+            for x in range(max(1, min(workers, len(cmds))))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        return results
+
+    def fetch_one(self, obj, module, name_only=False):
+        """Retrieves only `obj` from the device using its xpath.
+
+        This is an alternative to doing a refreshall() on the whole collection
+        when only one entry is of interest.  It is not for vsys importables, as
+        the vsys imports are not checked.
+
+        Args:
+            obj: The pandevice object, already attached to its parent.
+            module: The Ansible module.
+            name_only(bool): Only check if `obj` exists, don't get its params.
+
+        Returns:
+            list: Empty if `obj` is not present, otherwise the live object.
+        """
+        if obj.SUFFIX != ENTRY:
+            try:
+                return obj.__class__.refreshall(obj.parent, add=False)
+            except PanDeviceError as e:
+                module.fail_json(msg='Failed refresh: {0}'.format(e))
+
+        device = obj.nearest_pandevice()
+        xpath = obj.xpath()
+        if name_only:
+            xpath += '/@name'
+
+        start = time.time()
+        try:
+            root = device.xapi.get(xpath, retry_on_peer=obj.HA_SYNC)
+        except PanDeviceError as e:
+            if not str(e).startswith('No such node'):
+                module.fail_json(msg='Failed refresh: {0}'.format(e))
+            root = None
+
+        info = self.result_info.setdefault('fetch', {
+            'mode': 'single', 'requests': 0, 'bytes': 0, 'elapsed': 0})
+        info['requests'] += 1
+        info['bytes'] += len(device.xapi.xml_document or '')
+        info['elapsed'] = round(info['elapsed'] + time.time() - start, 3)
+
+        if root is None:
+            return []
+
+        probe = obj.__class__()
+        probe.parent = obj.parent
+        return probe.refreshall_from_xml(root.find('./result'))
+
+    def fetch_matching(self, obj_class, parent, module, predicate=None, name_only=False,
+                       name_filter=None):
+        """Retrieves the objects that match an xpath predicate.
+
+        The predicate is applied by the device, so only the matching entries
+        are sent back.  As with fetch_one(), the vsys imports are not checked.
+
+        Args:
+            obj_class: The pandevice class.
+            parent: The parent of the objects.
+            module: The Ansible module.
+            predicate(str): The predicate for the entries (without the
+                brackets).  If this is None, all entries are retrieved.
+            name_only(bool): Only get the names of the objects.
+            name_filter: If given, only the entries whose name this returns
+                True for are parsed into objects; the rest are dropped from
+                the XML first.
+
+        Returns:
+            list: The matching objects, not attached to `parent`.
+        """
+        probe = obj_class()
+        probe.parent = parent
+
+        device = parent.nearest_pandevice()
+        xpath = probe.xpath_nosuffix() + '/entry'
+        if predicate:
+            xpath += '[{0}]'.format(predicate)
+        if name_only:
+            xpath += '/@name'
+
+        start = time.time()
+        try:
+            root = device.xapi.get(xpath, retry_on_peer=probe.HA_SYNC)
+        except PanDeviceError as e:
+            if not str(e).startswith('No such node'):
+                module.fail_json(msg='Failed refresh: {0}'.format(e))
+            root = None
+
+        info = self.result_info.setdefault('fetch', {
+            'mode': 'filtered', 'requests': 0, 'bytes': 0, 'elapsed': 0})
+        info['requests'] += 1
+        info['bytes'] += len(device.xapi.xml_document or '')
+        info['elapsed'] = round(info['elapsed'] + time.time() - start, 3)
+
+        if root is None:
+            return []
+
+        result = root.find('./result')
+        if name_filter is not None and result is not None:
+            for elm in result.findall('./entry'):
+                if not name_filter(elm.attrib.get('name', '')):
+                    result.remove(elm)
+
+        return probe.refreshall_from_xml(result)
+
     def apply_state(self, obj, listing, module, enabled_disabled_param=None,
                     invert_enabled_disabled=False):
         """Generic state handling.
@@ -286,7 +1619,9 @@ class ConnectionHelper(object):
 
         Args:
             obj: The pandevice object to be applied.
-            listing(list): List of objects currently configured.
+            listing(list): List of objects currently configured.  If this is
+                None, then only `obj` is retrieved from the device (see
+                fetch_one()), and `obj` must already have a parent.
             module: The Ansible module.
             enabled_disabled_param: If this is set, then this function also
                 supports a state of "enabled" or "disabled", and the pandevice
@@ -311,6 +1646,14 @@ class ConnectionHelper(object):
         elif enabled_disabled_param is not None and not hasattr(obj, enabled_disabled_param):
             module.fail_json(msg='enabled/disabled param {0} not present'.format(enabled_disabled_param))
 
+        # Retrieve only the object in question.
+        if listing is None:
+            listing = self.fetch_one(
+                obj, module, name_only=module.params['state'] == 'absent')
+            order = self.rule_order(obj)
+        else:
+            order = self.rule_order(obj, listing)
+
         # Apply the state.
         changed = False
         if module.params['state'] == 'present':
@@ -328,26 +1671,25 @@ class ConnectionHelper(object):
                     changed = True
                     obj.extend(other_children)
                     if not module.check_mode:
-                        try:
-                            obj.apply()
-                        except PanDeviceError as e:
-                            module.fail_json(msg='Failed apply: {0}'.format(e))
+                        self._write(module, 'apply', obj)
                 break
             else:
                 changed = True
                 if not module.check_mode:
-                    try:
-                        obj.create()
-                    except PanDeviceError as e:
-                        module.fail_json(msg='Failed create: {0}'.format(e))
+                    self._write(module, 'create', obj)
+                # New entries are appended to the end.
+                if order is not None:
+                    if obj.uid not in order:
+                        order.append(obj.uid)
+                else:
+                    self._note_created(obj)
         elif module.params['state'] == 'absent':
             if obj.uid in [x.uid for x in listing]:
                 changed = True
                 if not module.check_mode:
-                    try:
-                        obj.delete()
-                    except PanDeviceError as e:
-                        module.fail_json(msg='Failed delete: {0}'.format(e))
+                    self._write(module, 'delete', obj)
+                if order is not None and obj.uid in order:
+                    order.remove(obj.uid)
         else:
             for item in listing:
                 if item.uid != obj.uid:
@@ -375,13 +1717,324 @@ class ConnectionHelper(object):
 
         return changed
 
+    def apply_bulk_state(self, objs, listing, module, purge=False, ordered=False,
+                         batch_size=1000):
+        """Declarative state handling for many objects at once.
+
+        Each object in `objs` is created or updated to match, and if `purge`
+        is set, everything in `listing` that isn't in `objs` is deleted.  If
+        `ordered` is set, the objects (which should be rules) are also moved
+        so that they are in the same relative order as in `objs`.
+
+        The changes are sent in batches (see start_batch()), and are only
+        computed, not made, if module.check_mode is True.  If a batch was
+        already started, the changes are added to it and sending them is
+        left to the caller's flush_batch().
+
+        Args:
+            objs(list): The desired objects, already attached to their parent.
+            listing(list): The objects currently configured.
+            module: The Ansible module.
+            purge(bool): Delete objects that are not in `objs`.
+            ordered(bool): Enforce the order of `objs`.
+            batch_size(int): Max operations per batched request.
+
+        Returns:
+            tuple: If a change was needed, and a dict of the names to
+            "create", "update", "delete", and the "move"s to make.
+        """
+        diff = {'create': [], 'update': [], 'delete': [], 'move': []}
+        if not objs and not purge:
+            return False, diff
+
+        own_batch = self.batch is None
+        if not module.check_mode and own_batch:
+            self.start_batch(max_ops=batch_size)
+
+        order = None
+        if objs or listing:
+            order = self.rule_order((objs or listing)[0], listing)
+        current = dict((x.uid, x) for x in listing)
+        for obj in objs:
+            item = current.get(obj.uid)
+            if item is None:
+                diff['create'].append(obj.uid)
+                if not module.check_mode:
+                    self._write(module, 'create', obj)
+                if order is not None:
+                    order.append(obj.uid)
+                continue
+
+            obj_child_types = [x.__class__ for x in obj.children]
+            other_children = []
+            for x in item.children:
+                if x.__class__ in obj_child_types:
+                    continue
+                other_children.append(x)
+                item.remove(x)
+            if not item.equal(obj, compare_children=True):
+                diff['update'].append({
+                    'name': obj.uid, 'changes': self._changes(item, obj)})
+                obj.extend(other_children)
+                if not module.check_mode:
+                    self._write(module, 'apply', obj)
+
+        if purge:
+            wanted = set(x.uid for x in objs)
+            for item in listing:
+                if item.uid in wanted:
+                    continue
+                diff['delete'].append(item.uid)
+                if not module.check_mode:
+                    self._write(module, 'delete', item)
+                if order is not None:
+                    order.remove(item.uid)
+
+        if ordered and order is not None:
+            for uid, location, ref in self._plan_order(order, [x.uid for x in objs]):
+                diff['move'].append({'name': uid, 'location': location, 'existing_rule': ref})
+                if not module.check_mode:
+                    self._move(module, objs[0], uid, location, ref)
+
+        if own_batch:
+            self.flush_batch(module)
+        self.result_info['diff_summary'] = dict((k, len(v)) for k, v in diff.items())
+
+        return any(diff.values()), diff
+
+    def apply_bulk_rules(self, module, rule_class, spec_func):
+        """The shared main() of the bulk rule modules.
+
+        The desired rules are built from I(rules), the current rules are
+        retrieved, and then apply_bulk_state() makes the changes, honoring
+        I(purge) and I(enforce_order).  The config is committed if needed
+        and I(commit) is set.  This exits the module.
+
+        Args:
+            module: The Ansible module.
+            rule_class: The pandevice rule class.
+            spec_func: Returns the `rule_class` params for one of I(rules).
+        """
+        # Verify imports, build pandevice object tree.
+        parent = self.get_pandevice_parent(module)
+
+        # Build the desired rules.
+        rules = []
+        seen = set()
+        for params in module.params['rules']:
+            rule = rule_class(**spec_func(params))
+            if rule.uid in seen:
+                module.fail_json(msg='Rule "{0}" is specified more than once'.format(rule.uid))
+            seen.add(rule.uid)
+            parent.add(rule)
+            rules.append(rule)
+
+        # Retrieve the current rules.
+        try:
+            listing = rule_class.refreshall(parent, add=False)
+        except PanDeviceError as e:
+            module.fail_json(msg='Failed refresh: {0}'.format(e))
+
+        changed, changes = self.apply_bulk_state(
+            rules, listing, module,
+            purge=module.params['purge'],
+            ordered=module.params['enforce_order'],
+        )
+
+        # Optional commit.
+        if changed and module.params['commit']:
+            self.commit(module)
+
+        # Done.
+        result = dict(changed=changed, changes=changes)
+        if module._diff:
+            result['diff'] = {'prepared': bulk_diff(changes)}
+        module.exit_json(**result)
+
+    @staticmethod
+    def _changes(before, after):
+        """Returns the params that differ between two objects.
+
+        `after` is round tripped through its XML first, so that params are
+        compared the way they would be read back from the device.
+        """
+        container = ET.Element('entries')
+        container.append(after.element())
+        probe = after.__class__()
+        probe.parent = after.parent
+        parsed = probe.refreshall_from_xml(container)
+        if parsed:
+            after = parsed[0]
+        a, b = before.about(), after.about()
+        ans = {}
+        for key in sorted(set(a) | set(b)):
+            if a.get(key) != b.get(key):
+                ans[key] = {'before': a.get(key), 'after': b.get(key)}
+        return ans
+
+    def apply_order(self, obj_class, parent, names, module):
+        """Moves rules so that `names` are in the given relative order.
+
+        The moves are planned with plan_moves(), so only the rules that are
+        out of place are moved.  This works for any rule type in any
+        rulebase (including Panorama pre- and post-rulebases), and uses the
+        rule order snapshot if there is one (see rule_order()).
+
+        Note:  If module.check_mode is True, then the moves are planned but
+        not made.
+
+        Args:
+            obj_class: The pandevice class of the rules, such as SecurityRule.
+            parent: The rulebase.
+            names(list): The rule names, in the desired order.
+            module: The Ansible module.
+
+        Returns:
+            list: The moves, as dicts with name, location, and existing_rule.
+        """
+        probe = obj_class()
+        probe.parent = parent
+
+        order = self.rule_order(probe)
+        if order is None:
+            try:
+                rules = obj_class.refreshall(parent, add=False, name_only=True)
+            except PanDeviceError as e:
+                module.fail_json(msg='Failed move refresh: {0}'.format(e))
+            order = self.rule_order(probe, rules)
+
+        missing = [x for x in names if x not in order]
+        if missing:
+            module.fail_json(msg='Rules not present for move: {0}'.format(', '.join(missing)))
+        if len(set(names)) != len(names):
+            module.fail_json(msg='Rule names to order must be unique')
+
+        ans = []
+        for uid, location, ref in self._plan_order(order, names):
+            ans.append({'name': uid, 'location': location, 'existing_rule': ref})
+            if not module.check_mode:
+                self._move(module, probe, uid, location, ref)
+
+        return ans
+
+    def _plan_order(self, order, names):
+        """plan_moves(), recording how many moves were saved."""
+        naive = _pairwise_move_count(order, names)
+        moves = plan_moves(order, names)
+        self.result_info['order_stats'] = {
+            'rules': len(names),
+            'moves': len(moves),
+            'moves_saved': max(0, naive - len(moves)),
+        }
+        return moves
+
+    def _move(self, module, like, uid, location, ref):
+        """Moves rule `uid`, which is the same type as `like`."""
+        obj = like.__class__(uid)
+        obj.parent = like.parent
+        if self.batch is not None:
+            self.batch.move(obj.xpath(), location, ref, 'move {0} "{1}"'.format(
+                obj.__class__.__name__, uid))
+            return
+
+        device = obj.nearest_pandevice()
+        try:
+            device.xapi.move(obj.xpath(), location, ref, retry_on_peer=obj.HA_SYNC)
+        except PanDeviceError as e:
+            module.fail_json(msg='Failed move: {0}'.format(e))
+
+    def start_batch(self, max_size=500000, max_ops=1000):
+        """Starts buffering config changes.
+
+        Until flush_batch() is called, the creates, applies, deletes, and
+        moves done by apply_state() and apply_position() are buffered and
+        then sent as a few multi-config requests (see ConfigBatch) instead of
+        one request each.
+
+        Returns:
+            ConfigBatch: The batch, for modules that want to add their own
+            operations.
+        """
+        self.batch = ConfigBatch(self.device, max_size, max_ops)
+        return self.batch
+
+    def flush_batch(self, module):
+        """Sends any buffered config changes and stops buffering.
+
+        The request count and size are added to the module's result as
+        "batch_stats".
+        """
+        batch, self.batch = self.batch, None
+        if batch is None:
+            return
+
+        self.result_info['batch_stats'] = batch.stats
+        try:
+            batch.flush()
+        except PanDeviceError as e:
+            module.fail_json(msg='Failed batch: {0}'.format(e))
+
+    def _write(self, module, action, obj):
+        """Creates, applies, or deletes `obj`, or buffers it if batching."""
+        if self.batch is not None and ConfigBatch.supports(obj):
+            getattr(self.batch, 'remove' if action == 'delete' else action)(obj)
+            return
+
+        try:
+            getattr(obj, action)()
+        except PanDeviceError as e:
+            module.fail_json(msg='Failed {0}: {1}'.format(action, e))
+
+    def rule_order(self, obj, listing=None):
+        """Returns the rule order snapshot for `obj`'s rulebase.
+
+        The snapshot is a list of uids that is shared by everything in this
+        invocation that reads or changes the order of this type of rule in
+        this rulebase.  apply_state() and apply_position() keep it in sync
+        with the creates, deletes, and moves that they perform, so the
+        rulebase only has to be read once.  Rules that apply_state() created
+        before the snapshot was taken are appended to it, as they may not be
+        on the device yet (check mode or batching).
+
+        Args:
+            obj: A rule already attached to its rulebase.
+            listing(list): If given and there is no snapshot yet, the
+                snapshot is taken from this listing.
+
+        Returns:
+            list: The snapshot, or None if there is none (or if `obj` is not
+            a rule).
+        """
+        key = self._rule_order_key(obj)
+        if key is None:
+            return None
+
+        if key not in self._rule_orders and listing is not None:
+            order = [x.uid for x in listing]
+            order.extend(x for x in self._created_rules.pop(key, []) if x not in order)
+            self._rule_orders[key] = order
+
+        return self._rule_orders.get(key)
+
+    def _rule_order_key(self, obj):
+        """Returns the rule order snapshot key for `obj`, or None if not a rule."""
+        if obj.parent is None or obj.parent.__class__.__name__ not in (
+                'Rulebase', 'PreRulebase', 'PostRulebase'):
+            return None
+        return obj.xpath_nosuffix()
+
+    def _note_created(self, obj):
+        """Records a rule created while there is no rule order snapshot."""
+        key = self._rule_order_key(obj)
+        if key is not None:
+            self._created_rules.setdefault(key, []).append(obj.uid)
+
     def apply_position(self, obj, location, existing_rule, module):
         """Moves an object into the given location.
 
-        This function invokes "obj"'s refreshall() on obj.parent, which
-        removes both obj and all other obj.__class__ types from
-        obj.parent.  Since moving a rule into place is likely the last
-        step, the state of the pandevice object tree should be inconsequential.
+        The current order is taken from the rule order snapshot (see
+        rule_order()) if there is one, otherwise only the names of the rules
+        are retrieved from the device to create it.
 
         Note:  If module.check_mode is True, then this function returns
         True if a change is needed, but doesn't actually make the change.
@@ -397,7 +2050,6 @@ class ConnectionHelper(object):
         """
         # Variables.
         uid = obj.uid
-        rule = None
         changed = False
         obj_index = None
         ref_index = None
@@ -412,16 +2064,17 @@ class ConnectionHelper(object):
         elif location is None:
             return False
 
-        # Retrieve the current rules.
-        try:
-            rules = obj.__class__.refreshall(obj.parent, name_only=True)
-        except PanDeviceError as e:
-            module.fail_json(msg='Failed move refresh: {0}'.format(e))
+        # Retrieve the current rule order.
+        listing = self.rule_order(obj)
+        if listing is None:
+            try:
+                rules = obj.__class__.refreshall(obj.parent, add=False, name_only=True)
+            except PanDeviceError as e:
+                module.fail_json(msg='Failed move refresh: {0}'.format(e))
+            listing = self.rule_order(obj, rules)
 
-        listing = [x.uid for x in rules]
         try:
             obj_index = listing.index(uid)
-            rule = rules[obj_index]
         except ValueError:
             module.fail_json(msg="Object {0} isn't present for move".format(uid))
 
@@ -439,7 +2092,7 @@ class ConnectionHelper(object):
                     'Cannot do relative rule placement',
                     '"{0}" does not exist.'.format(existing_rule),
                 ]
-                module.fail_json(msg='; '.format(msg))
+                module.fail_json(msg='; '.join(msg))
             if location == 'before':
                 if obj_index + 1 != ref_index:
                     changed = True
@@ -449,15 +2102,31 @@ class ConnectionHelper(object):
 
         # Perform the move (if not check mode).
         if changed and not module.check_mode:
-            try:
-                rule.move(location, existing_rule)
-            except PanDeviceError as e:
-                module.fail_json(msg='Failed move: {0}'.format(e))
+            if self.batch is not None:
+                self.batch.move(obj.xpath(), location, existing_rule,
+                                'move {0} "{1}"'.format(obj.__class__.__name__, uid))
+            else:
+                try:
+                    obj.move(location, existing_rule)
+                except PanDeviceError as e:
+                    module.fail_json(msg='Failed move: {0}'.format(e))
+
+        # Keep the snapshot in sync.
+        if changed:
+            listing.remove(uid)
+            if location == 'top':
+                listing.insert(0, uid)
+            elif location == 'bottom':
+                listing.append(uid)
+            elif location == 'before':
+                listing.insert(listing.index(existing_rule), uid)
+            else:
+                listing.insert(listing.index(existing_rule) + 1, uid)
 
         # Done.
         return changed
 
-    def commit(self, module, include_template=False, admins=None):
+    def commit(self, module, include_template=False, admins=None, defer=None):
         """Performs a commit.
 
         In the case where the device is Panorama, then a commit-all is
@@ -466,41 +2135,175 @@ class ConnectionHelper(object):
         is specified.  Returns True if the configuration was committed,
         False if not.
 
+        If commits are deferred (see CommitStore), the commit is recorded
+        instead and False is returned.  Either way, the module's result will
+        have a "commit" key of "deferred", "coalesced", or "executed".
+
         Note:  If module.check_mode is True, then this function does not
         perform the commit.
 
         Args:
             include_template (bool): (Panorama only) Force include the template.
             admins (list): This is the list of admins whose changes will be committed to
-                the firewall/Panorama. The admins argument works with PanOS 8.0+. 
+                the firewall/Panorama. The admins argument works with PanOS 8.0+.
+            defer (bool): Defer the commit.  If this is None, then commits are
+                deferred if the commit store is enabled.
         """
-        committed = False
-
         if module.check_mode:
             return
 
-        try:
-            self.device.commit(sync=True, exception=True, admins=admins)
-            committed = True
-        except PanCommitNotNeeded:
-            pass
-        except PanDeviceError as e:
-            module.fail_json(msg='Failed commit: {0}'.format(e))
-
-        if not hasattr(self.device, 'commit_all'):
-            return committed
-
         dg_name = self.vsys_dg or self.device_group
         if dg_name is not None:
             dg_name = module.params[dg_name]
-
-        if dg_name in (None, 'shared'):
-            return committed
+        if dg_name == 'shared' or not hasattr(self.device, 'commit_all'):
+            dg_name = None
 
         if not include_template:
             if self.template:
                 include_template = True
 
+        if defer is None:
+            defer = self.commit_store.enabled
+
+        if defer:
+            try:
+                status = self.commit_store.record(
+                    self._commit_target(), admins, dg_name, include_template)
+            except (IOError, OSError) as e:
+                module.fail_json(msg='Failed to record commit: {0}'.format(e))
+            self.result_info['commit'] = status
+            return False
+
+        committed = self._commit(module, admins)
+        if dg_name is not None:
+            committed |= self._commit_all(module, dg_name, include_template)
+        self.result_info['commit'] = 'executed'
+
+        return committed
+
+    def flush_commits(self, module, include_template=False, admins=None):
+        """Performs all pending (deferred) commits for this device at once.
+
+        The pending requests are merged with this one:  the admins are
+        combined (any request for all admins means all admins), and one
+        commit-all is done for each device group, including the template if
+        any request for that device group asked for it.
+
+        Args:
+            include_template (bool): (Panorama only) Force include the template.
+            admins (list): The admins whose changes should be committed.
+
+        Returns:
+            bool: If anything was committed.
+        """
+        # The pending requests are only removed once everything is
+        # committed, so a failed commit or push can be retried.
+        target = self._commit_target()
+        try:
+            pending = self.commit_store.peek(target)
+        except (IOError, OSError) as e:
+            module.fail_json(msg='Failed to load pending commits: {0}'.format(e))
+
+        requests = 1
+        if pending.get('commit'):
+            requests += pending['commit']['requests']
+            if admins is not None and pending['commit']['admins'] is not None:
+                admins = sorted(set(admins) | set(pending['commit']['admins']))
+            else:
+                admins = None
+
+        groups = dict(
+            (k, v['include_template'])
+            for k, v in pending.get('device_groups', {}).items())
+
+        dg_name = self.vsys_dg or self.device_group
+        if dg_name is not None and module.params[dg_name] not in (None, 'shared'):
+            name = module.params[dg_name]
+            groups[name] = groups.get(name, False) or bool(include_template)
+
+        if not hasattr(self.device, 'commit_all'):
+            groups = {}
+
+        committed = self._commit(module, admins)
+        if len(groups) > 1:
+            engine = CommitAllPush(self.device, log=module.log)
+            for name in sorted(groups.keys()):
+                engine.add_device_group(name, include_template=groups[name])
+            committed |= self._run_push(module, engine)
+        else:
+            for name, template in groups.items():
+                committed |= self._commit_all(module, name, template)
+
+        if pending:
+            try:
+                self.commit_store.clear(target, pending)
+            except (IOError, OSError) as e:
+                module.fail_json(msg='Failed to clear pending commits: {0}'.format(e))
+
+        self.result_info['commit'] = 'executed'
+        self.result_info['commit_requests'] = requests
+
+        return committed
+
+    def push(self, module, device_groups=(), templates=(), template_stacks=(),
+             include_template=None, description=None,
+             max_concurrent=5, interval=5, timeout=None):
+        """(Panorama only) Pushes config to many device groups and templates.
+
+        The commit-all jobs are run in parallel (see CommitAllPush), and the
+        results and timings are added to the module's result as "push".
+
+        Returns:
+            bool: If anything was pushed.
+        """
+        if not hasattr(self.device, 'commit_all'):
+            module.fail_json(msg='Pushing config is only supported on Panorama')
+
+        engine = CommitAllPush(
+            self.device, max_concurrent=max_concurrent, interval=interval,
+            timeout=timeout, log=module.log)
+        for name in device_groups or []:
+            engine.add_device_group(name, include_template, description)
+        for name in templates or []:
+            engine.add_template(name, description=description)
+        for name in template_stacks or []:
+            engine.add_template(name, stack=True, description=description)
+
+        if module.check_mode:
+            return bool(engine.pushes)
+
+        return self._run_push(module, engine)
+
+    def _run_push(self, module, engine):
+        results = engine.run()
+        self.result_info['push'] = results
+        if results['failed']:
+            failed = ['{0} {1}: {2}'.format(
+                x['type'], x['name'], ' '.join(x['messages']) or x['status'])
+                for x in results['pushes'] if x['status'] not in ('OK', 'not needed')]
+            module.fail_json(msg='Failed commit-all: {0}'.format('; '.join(failed)))
+
+        return any(x['status'] == 'OK' for x in results['pushes'])
+
+    def _commit_target(self):
+        """Returns the commit store key for this device."""
+        dev = self.device
+        if dev.hostname is None and dev.parent is not None:
+            # Firewall via Panorama.
+            return '{0}:{1}:{2}'.format(dev.parent.hostname, dev.parent.port, dev.serial)
+        return '{0}:{1}'.format(dev.hostname, dev.port)
+
+    def _commit(self, module, admins):
+        try:
+            self.device.commit(sync=True, exception=True, admins=admins)
+        except PanCommitNotNeeded:
+            return False
+        except PanDeviceError as e:
+            module.fail_json(msg='Failed commit: {0}'.format(e))
+
+        return True
+
+    def _commit_all(self, module, dg_name, include_template):
         try:
             self.device.commit_all(
                 sync=True,
@@ -509,15 +2312,53 @@ class ConnectionHelper(object):
                 include_template=include_template,
                 exception=True,
             )
-            committed = True
         except PanCommitNotNeeded:
-            pass
+            return False
         except PanDeviceError as e:
             module.fail_json(msg='Failed commit-all: {0}'.format(e))
 
-        return committed
+        return True
 
-    def to_module_dict(self, element, renames=None):
+    def exit_listing(self, module, key, items, to_dict, **kwargs):
+        """Pages through `items` and returns them as `key`.
+
+        The page is given by the module's offset and limit params (see the
+        `with_output` param of get_connection()).  If output_file is set,
+        the page is written there as JSON lines and only the path, count,
+        and sha256 of the file are returned, otherwise the page is returned
+        as a list along with `kwargs`.
+
+        Args:
+            module: The Ansible module.
+            key(str): The result key for the list.
+            items(list): The items to return.
+            to_dict: Function that converts one item for the output.
+            **kwargs: Other results to include in the list output.
+        """
+        offset = module.params['offset']
+        limit = module.params['limit']
+        if offset < 0:
+            module.fail_json(msg='offset must be 0 or more')
+        if limit is not None and limit < 0:
+            module.fail_json(msg='limit must be 0 or more')
+
+        end = None if limit is None else offset + limit
+        page = items[offset:end]
+
+        path = module.params['output_file']
+        if path is None:
+            kwargs[key] = [to_dict(x) for x in page]
+            module.exit_json(changed=False, total=len(items), **kwargs)
+
+        try:
+            count, digest = write_json_lines(path, (to_dict(x) for x in page))
+        except (IOError, OSError) as e:
+            module.fail_json(msg='Failed to write {0}: {1}'.format(path, e))
+
+        module.exit_json(
+            changed=False, path=path, count=count, sha256=digest, total=len(items))
+
+    def to_module_dict(self, element, renames=None, fields=None):
         """Changes a pandevice object or list of objects into a dict / list of dicts.
 
         Args:
@@ -526,27 +2367,30 @@ class ConnectionHelper(object):
                 Ansible param names, this is a iterable of two element tuples where
                 the first element is the pandevice object name, and the second is
                 the Ansible name.
+            fields: If given, only these params (by their Ansible names) are
+                included.
 
         Returns:
             A dict if "element" was a single pandevice object, or a list of dicts
             if "element" was a list of pandevice objects.
 
         """
-        if isinstance(element, list):
-            ans = []
-            for elm in element:
-                spec = elm.about()
-                if renames is not None:
-                    for pandevice_param, ansible_param in renames:
-                        spec[ansible_param] = spec.pop(pandevice_param)
-                ans.append(spec)
-        else:
-            ans = element.about()
+        pandevice_names = dict((y, x) for x, y in renames or ())
+
+        def _to_dict(elm):
+            if fields is not None:
+                return dict(
+                    (x, getattr(elm, pandevice_names.get(x, x))) for x in fields)
+            spec = elm.about()
             if renames is not None:
                 for pandevice_param, ansible_param in renames:
-                    ans[ansible_param] = ans.pop(pandevice_param)
+                    spec[ansible_param] = spec.pop(pandevice_param)
+            return spec
 
-        return ans
+        if isinstance(element, list):
+            return [_to_dict(x) for x in element]
+
+        return _to_dict(element)
 
 
 def get_connection(vsys=None, vsys_shared=None, device_group=None,
@@ -554,7 +2398,7 @@ def get_connection(vsys=None, vsys_shared=None, device_group=None,
                    rulebase=None, template=None, template_stack=None,
                    with_classic_provider_spec=False,
                    with_state=False, with_enabled_state=False,
-                   argument_spec=None, required_one_of=None,
+                   with_output=False, argument_spec=None, required_one_of=None,
                    min_pandevice_version=None, min_panos_version=None,
                    error_on_shared=False,
                    panorama_error=None, firewall_error=None):
@@ -567,6 +2411,11 @@ def get_connection(vsys=None, vsys_shared=None, device_group=None,
         * True - use the default param name
         * string - use this string for the param name
 
+    The "provider" param is optional in the spec so that modules can be run
+    over a persistent connection (`ansible_connection=httpapi` with
+    `ansible_network_os=panos`); get_pandevice_parent() enforces that some
+    form of connectivity was given.
+
     The `min_pandevice_version` and `min_panos_version` args expect a 3 element
     tuple of ints.  For example, `(0, 6, 0)` or `(8, 1, 0)`.
 
@@ -589,11 +2438,12 @@ def get_connection(vsys=None, vsys_shared=None, device_group=None,
         template: Panorama - The template name.
         template_stack: Panorama - The template stack name.
         with_classic_provider_spec(bool): Include the ip_address, username,
-            password, api_key, and port params in the base spec, and make the
-            "provider" param optional.
+            password, api_key, and port params in the base spec.
         with_state(bool): Include the standard 'state' param.
         with_enabled_state(bool): Include 'state', but also support "enabled"
             and "disabled" as valid states.
+        with_output(bool): Include the 'output_file', 'offset', and 'limit'
+            params used by exit_listing().
         argument_spec(dict): The argument spec to mixin with the
             generated spec based on the given parameters.
         required_one_of(list): List of lists to extend into required_one_of.
@@ -612,11 +2462,10 @@ def get_connection(vsys=None, vsys_shared=None, device_group=None,
     req = []
     spec = {
         'provider': {
-            'required': True,
+            'required': False,
             'type': 'dict',
-            'required_one_of': [['password', 'api_key'], ],
             'options': {
-                'ip_address': {'required': True},
+                'ip_address': {'required': False},
                 'username': {'default': 'admin'},
                 'password': {'no_log': True},
                 'api_key': {'no_log': True},
@@ -627,9 +2476,6 @@ def get_connection(vsys=None, vsys_shared=None, device_group=None,
     }
 
     if with_classic_provider_spec:
-        spec['provider']['required'] = False
-        spec['provider']['options']['ip_address']['required'] = False
-        del(spec['provider']['required_one_of'])
         spec.update({
             'ip_address': {'required': False},
             'username': {'default': 'admin'},
@@ -637,10 +2483,6 @@ def get_connection(vsys=None, vsys_shared=None, device_group=None,
             'api_key': {'no_log': True},
             'port': {'default': 443, 'type': 'int'},
         })
-        req.extend([
-            ['provider', 'ip_address'],
-            ['provider', 'password', 'api_key'],
-        ])
 
     if with_state:
         spec['state'] = {
@@ -654,6 +2496,13 @@ def get_connection(vsys=None, vsys_shared=None, device_group=None,
             'choices': ['present', 'absent', 'enabled', 'disabled'],
         }
 
+    if with_output:
+        spec.update({
+            'output_file': {'type': 'path'},
+            'offset': {'default': 0, 'type': 'int'},
+            'limit': {'type': 'int'},
+        })
+
     if vsys_dg is not None:
         if isinstance(vsys_dg, bool):
             param = 'vsys_dg'
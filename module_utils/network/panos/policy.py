@@ -0,0 +1,329 @@
+# This code is part of Ansible, but is an independent component.
+# This particular file snippet, and this file snippet only, is BSD licensed.
+# Modules you write using this snippet, which is embedded dynamically by Ansible
+# still belong to the author of the module, and may assign their own license
+# to the complete work.
+#
+# Copyright (c) 2020 Palo Alto Networks techbizdev, <techbizdev@paloaltonetworks.com>
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright notice,
+#      this list of conditions and the following disclaimer in the documentation
+#      and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+# USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Field mappings for the policy modules.
+
+The module param names of the policy modules don't match the pandevice
+param names, so the mapping between the two lives here to be shared by the
+single rule modules and the bulk modules.  The rule filters used by the
+facts modules live here as well.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import re
+
+from ansible.module_utils.six import string_types
+
+
+# (module param, pandevice param, argument spec) for SecurityRule.
+SECURITY_RULE_FIELDS = (
+    ('rule_name', 'name', dict(required=True)),
+    ('source_zone', 'fromzone', dict(type='list', default=['any'])),
+    ('source_ip', 'source', dict(type='list', default=['any'])),
+    ('source_user', 'source_user', dict(type='list', default=['any'])),
+    ('hip_profiles', 'hip_profiles', dict(type='list', default=['any'])),
+    ('destination_zone', 'tozone', dict(type='list', default=['any'])),
+    ('destination_ip', 'destination', dict(type='list', default=['any'])),
+    ('application', 'application', dict(type='list', default=['any'])),
+    ('service', 'service', dict(type='list', default=['application-default'])),
+    ('category', 'category', dict(type='list', default=['any'])),
+    ('action', 'action', dict(
+        default='allow',
+        choices=['allow', 'deny', 'drop', 'reset-client', 'reset-server', 'reset-both'],
+    )),
+    ('log_setting', 'log_setting', dict()),
+    ('log_start', 'log_start', dict(type='bool', default=False)),
+    ('log_end', 'log_end', dict(type='bool', default=True)),
+    ('description', 'description', dict()),
+    ('rule_type', 'type', dict(default='universal', choices=['universal', 'intrazone', 'interzone'])),
+    ('tag_name', 'tag', dict(type='list')),
+    ('negate_source', 'negate_source', dict(type='bool', default=False)),
+    ('negate_destination', 'negate_destination', dict(type='bool', default=False)),
+    ('disabled', 'disabled', dict(type='bool', default=False)),
+    ('schedule', 'schedule', dict()),
+    ('icmp_unreachable', 'icmp_unreachable', dict(type='bool')),
+    ('disable_server_response_inspection', 'disable_server_response_inspection',
+     dict(type='bool', default=False)),
+    ('group_profile', 'group', dict()),
+    ('antivirus', 'virus', dict()),
+    ('spyware', 'spyware', dict()),
+    ('vulnerability', 'vulnerability', dict()),
+    ('url_filtering', 'url_filtering', dict()),
+    ('file_blocking', 'file_blocking', dict()),
+    ('wildfire_analysis', 'wildfire_analysis', dict()),
+    ('data_filtering', 'data_filtering', dict()),
+    ('target', 'target', dict(type='list')),
+    ('negate_target', 'negate_target', dict(type='bool')),
+)
+
+
+def argument_spec(fields):
+    """Returns a new argument spec for the given fields."""
+    return dict((param, dict(spec)) for param, _, spec in fields)
+
+
+def object_spec(fields, params):
+    """Returns the pandevice kwargs for the given module params."""
+    return dict((name, params.get(param)) for param, name, _ in fields)
+
+
+def security_rule_argument_spec():
+    return argument_spec(SECURITY_RULE_FIELDS)
+
+
+def security_rule_spec(params):
+    return object_spec(SECURITY_RULE_FIELDS, params)
+
+
+# (module param, pandevice param, argument spec) for NatRule.
+NAT_RULE_FIELDS = (
+    ('rule_name', 'name', dict(required=True)),
+    ('description', 'description', dict()),
+    ('nat_type', 'nat_type', dict(default='ipv4', choices=['ipv4', 'nat64', 'nptv6'])),
+    ('source_zone', 'fromzone', dict(type='list')),
+    ('source_ip', 'source', dict(type='list', default=['any'])),
+    ('destination_zone', 'tozone', dict()),
+    ('destination_ip', 'destination', dict(type='list', default=['any'])),
+    ('to_interface', 'to_interface', dict(default='any')),
+    ('service', 'service', dict(default='any')),
+    ('snat_type', 'source_translation_type', dict(
+        choices=['static-ip', 'dynamic-ip-and-port', 'dynamic-ip'])),
+    ('snat_address_type', 'source_translation_address_type', dict(
+        choices=['interface-address', 'translated-address'], default='interface-address')),
+    ('snat_static_address', 'source_translation_static_translated_address', dict()),
+    ('snat_dynamic_address', 'source_translation_translated_addresses', dict(type='list')),
+    ('snat_interface', 'source_translation_interface', dict()),
+    ('snat_interface_address', 'source_translation_ip_address', dict()),
+    ('snat_bidirectional', 'source_translation_static_bi_directional', dict(type='bool')),
+    ('dnat_address', 'destination_translated_address', dict()),
+    ('dnat_port', 'destination_translated_port', dict()),
+    ('tag', 'tag', dict(type='list')),
+)
+
+
+def nat_rule_argument_spec():
+    return argument_spec(NAT_RULE_FIELDS)
+
+
+def nat_rule_spec(params):
+    """Returns the NatRule kwargs for the given module params.
+
+    Only the translation params that apply to the source and destination
+    translation in use are set.
+
+    Returns:
+        dict: The kwargs, or None if dynamic-ip is missing its addresses.
+    """
+    ans = object_spec(NAT_RULE_FIELDS, params)
+
+    snat_type = params.get('snat_type')
+    keep = []
+    if snat_type == 'static-ip' and params.get('snat_static_address'):
+        keep = ['snat_type', 'snat_static_address']
+        if params.get('snat_bidirectional'):
+            keep.append('snat_bidirectional')
+    elif snat_type == 'dynamic-ip-and-port':
+        keep = ['snat_type', 'snat_address_type']
+        if params.get('snat_interface'):
+            keep.append('snat_interface')
+            if params.get('snat_interface_address'):
+                keep.append('snat_interface_address')
+        else:
+            keep.append('snat_dynamic_address')
+    elif snat_type == 'dynamic-ip':
+        if not params.get('snat_dynamic_address'):
+            return None
+        keep = ['snat_type', 'snat_dynamic_address']
+
+    if params.get('dnat_address'):
+        keep.append('dnat_address')
+        if params.get('dnat_port'):
+            keep.append('dnat_port')
+
+    for param, name, _ in NAT_RULE_FIELDS:
+        if param.startswith(('snat_', 'dnat_')) and param not in keep:
+            ans[name] = None
+
+    return ans
+
+
+# (module param, member xpaths, pandevice params) for the security rule
+# filters.  A rule passes a filter if any of the filter's values is a member
+# of any of the listed params.
+SECURITY_RULE_FILTERS = (
+    ('tag_name', ('tag',), ('tag',)),
+    ('zone', ('from', 'to'), ('fromzone', 'tozone')),
+    ('address', ('source', 'destination'), ('source', 'destination')),
+    ('application', ('application',), ('application',)),
+)
+
+
+def filter_argument_spec(filters):
+    """Returns the argument spec for the given filters.
+
+    Besides the member filters, there is always I(disabled) and
+    I(rule_regex).
+    """
+    ans = dict((param, dict(type='list')) for param, _, _ in filters)
+    ans['disabled'] = dict(type='bool')
+    ans['rule_regex'] = dict()
+    return ans
+
+
+def xpath_literal(value):
+    """Quotes `value` as an xpath string literal."""
+    if "'" not in value:
+        return "'{0}'".format(value)
+    if '"' not in value:
+        return '"{0}"'.format(value)
+    return 'concat({0})'.format(', "\'", '.join(
+        "'{0}'".format(x) for x in value.split("'")))
+
+
+def filter_predicate(filters, params):
+    """Returns the xpath predicate for the filters in `params`.
+
+    The rule name regex can't be expressed in xpath, so it is left out; use
+    filter_matches() on the results for that.
+
+    Returns:
+        str: The predicate (without the brackets), or None if there are no
+        filters that can be done in xpath.
+    """
+    terms = []
+    for param, paths, _ in filters:
+        if not params.get(param):
+            continue
+        terms.append('({0})'.format(' or '.join(
+            '{0}/member={1}'.format(path, xpath_literal(value))
+            for path in paths for value in params[param])))
+
+    if params.get('disabled') is True:
+        terms.append("disabled='yes'")
+    elif params.get('disabled') is False:
+        terms.append("not(disabled='yes')")
+
+    return ' and '.join(terms) or None
+
+
+def filter_matches(filters, params, obj, name_only=False):
+    """Checks a pandevice rule against the filters in `params`.
+
+    If `name_only` is set, `obj` only has its name, so only the rule name
+    regex is checked.
+    """
+    if params.get('rule_regex') and re.search(params['rule_regex'], obj.name) is None:
+        return False
+
+    if name_only:
+        return True
+
+    if params.get('disabled') is not None and bool(obj.disabled) != params['disabled']:
+        return False
+
+    for param, _, names in filters:
+        if not params.get(param):
+            continue
+        members = set()
+        for name in names:
+            value = getattr(obj, name) or []
+            # NatRule.tozone is a single zone.
+            if isinstance(value, string_types):
+                value = [value]
+            members.update(value)
+        if members.isdisjoint(params[param]):
+            return False
+
+    return True
+
+
+def security_rule_filter_argument_spec():
+    return filter_argument_spec(SECURITY_RULE_FILTERS)
+
+
+# (module param, member xpaths, pandevice params) for the NAT rule filters.
+NAT_RULE_FILTERS = (
+    ('tag', ('tag',), ('tag',)),
+    ('zone', ('from', 'to'), ('fromzone', 'tozone')),
+    ('address', ('source', 'destination'), ('source', 'destination')),
+)
+
+SNAT_TYPES = ('static-ip', 'dynamic-ip-and-port', 'dynamic-ip')
+
+
+def nat_rule_filter_argument_spec():
+    """Returns the argument spec for the NAT rule filters.
+
+    Besides the member filters, there is I(snat_type) (with "none" for no
+    source translation) and I(dnat).
+    """
+    ans = filter_argument_spec(NAT_RULE_FILTERS)
+    ans['snat_type'] = dict(type='list', choices=list(SNAT_TYPES) + ['none'])
+    ans['dnat'] = dict(type='bool')
+    return ans
+
+
+def nat_rule_filter_predicate(params):
+    """Returns the xpath predicate for the NAT rule filters in `params`."""
+    terms = []
+    predicate = filter_predicate(NAT_RULE_FILTERS, params)
+    if predicate is not None:
+        terms.append(predicate)
+
+    if params.get('snat_type'):
+        terms.append('({0})'.format(' or '.join(
+            'not(source-translation/*)' if x == 'none' else 'source-translation/' + x
+            for x in params['snat_type'])))
+
+    dnat = '(destination-translation or dynamic-destination-translation)'
+    if params.get('dnat') is True:
+        terms.append(dnat)
+    elif params.get('dnat') is False:
+        terms.append('not{0}'.format(dnat))
+
+    return ' and '.join(terms) or None
+
+
+def nat_rule_filter_matches(params, obj, name_only=False):
+    """Checks a NatRule against the NAT rule filters in `params`."""
+    if not filter_matches(NAT_RULE_FILTERS, params, obj, name_only):
+        return False
+
+    if name_only:
+        return True
+
+    if params.get('snat_type') and (
+            obj.source_translation_type or 'none') not in params['snat_type']:
+        return False
+
+    dnat = obj.destination_translated_address or obj.destination_dynamic_translated_address
+    if params.get('dnat') is not None and bool(dnat) != params['dnat']:
+        return False
+
+    return True
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#  Copyright 2020 Palo Alto Networks, Inc
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Runs the benchmark scenarios against the fake XML API server.
+
+Each scenario is a playbook in the scenarios/ directory.  For each one,
+the fake device is reset, the playbook is run with ansible-playbook using
+this checkout's modules and module_utils, and the wall time plus the
+server side call and byte counts are recorded.  The module side API call
+records (see PANOS_PROFILE_FILE) are kept as well, so the calls can be
+traced back to the modules that made them.
+
+Example:
+
+    python tests/fakeapi/bench.py --count 50 --latency 0.02 --output run1.json
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.abspath(os.path.join(HERE, '..', '..'))
+SCENARIOS = os.path.join(HERE, 'scenarios')
+
+sys.path.insert(0, HERE)
+import server  # noqa: E402
+
+
+def scenario_names():
+    return sorted(
+        x[:-4] for x in os.listdir(SCENARIOS) if x.endswith('.yml'))
+
+
+def run_scenario(name, device, port, count, verbose=False):
+    """Runs one scenario, returning its results."""
+    device.reset()
+
+    fd, profile = tempfile.mkstemp(prefix='panos_profile', suffix='.jsonl')
+    os.close(fd)
+
+    env = dict(os.environ)
+    env.update({
+        'ANSIBLE_LIBRARY': os.path.join(ROOT, 'library'),
+        'ANSIBLE_MODULE_UTILS': os.path.join(ROOT, 'module_utils'),
+        'ANSIBLE_HOST_KEY_CHECKING': 'False',
+        'ANSIBLE_RETRY_FILES_ENABLED': 'False',
+        'PANOS_PROFILE_FILE': profile,
+    })
+    extra_vars = {
+        # The modules need pandevice, so use the interpreter running this.
+        'ansible_python_interpreter': sys.executable,
+        'count': count,
+        'provider': {
+            'ip_address': '127.0.0.1',
+            'port': port,
+            'username': device.username,
+            'password': device.password,
+        },
+    }
+    cmd = [
+        'ansible-playbook', '-i', 'localhost,',
+        '-e', json.dumps(extra_vars),
+        os.path.join(SCENARIOS, '{0}.yml'.format(name)),
+    ]
+
+    start = time.time()
+    proc = subprocess.Popen(
+        cmd, env=env, stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    output = proc.communicate()[0].decode('utf-8', 'replace')
+    wall = time.time() - start
+    if verbose or proc.returncode != 0:
+        print(output)
+
+    by_module = {}
+    with open(profile) as f:
+        for line in f:
+            rec = json.loads(line)
+            info = by_module.setdefault(rec.get('module'), {'calls': 0, 'elapsed': 0})
+            info['calls'] += 1
+            info['elapsed'] = round(info['elapsed'] + rec['elapsed'], 4)
+    os.remove(profile)
+
+    return {
+        'scenario': name,
+        'count': count,
+        'ok': proc.returncode == 0,
+        'wall': round(wall, 3),
+        'server': device.stats,
+        'modules': by_module,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark modules against the fake XML API')
+    parser.add_argument('--scenario', action='append', choices=scenario_names(),
+                        help='scenario to run (can be repeated; default: all)')
+    parser.add_argument('--count', type=int, default=20,
+                        help='number of objects the scenarios create')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='seconds the fake server adds to each request')
+    parser.add_argument('--commit-time', type=float, default=1,
+                        help='seconds each commit job takes')
+    parser.add_argument('--port', type=int, default=18443)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='show the ansible-playbook output')
+    args = parser.parse_args()
+
+    device = server.FakeDevice(latency=args.latency, commit_time=args.commit_time)
+    httpd = server.serve(device, port=args.port)
+
+    results = []
+    fmt = '{0:<20} {1:>4} {2:>9} {3:>9} {4:>12} {5:>12}'
+    print(fmt.format('scenario', 'ok', 'wall', 'requests', 'req bytes', 'resp bytes'))
+    try:
+        for name in args.scenario or scenario_names():
+            ans = run_scenario(name, device, args.port, args.count, args.verbose)
+            results.append(ans)
+            print(fmt.format(
+                name, 'yes' if ans['ok'] else 'NO', ans['wall'],
+                ans['server']['requests'], ans['server']['request_bytes'],
+                ans['server']['response_bytes']))
+    finally:
+        httpd.shutdown()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'count': args.count,
+                'latency': args.latency,
+                'results': results,
+            }, f, indent=4, sort_keys=True)
+
+    return 0 if all(x['ok'] for x in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
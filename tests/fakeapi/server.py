@@ -0,0 +1,728 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#  Copyright 2020 Palo Alto Networks, Inc
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""A stand-in for the PAN-OS XML API, for running the modules offline.
+
+This is not an emulator:  it keeps a config tree in memory and implements
+enough of the XML API (keygen, config get/show/set/edit/delete/move/rename/
+multi-config, op commands, and commit jobs) for pandevice to work against
+it.  Every request is counted, so the calls, bytes, and time a playbook
+needs can be measured without a real firewall.
+
+Besides /api/, the server has two endpoints of its own:
+
+    GET  /_fake/stats   The request counters as JSON.
+    POST /_fake/reset   Reloads the config and zeroes the counters.
+
+Run it with --help for the options.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import copy
+import json
+import os
+import random
+import re
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, urlparse
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs, urlparse
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CONFIG = os.path.join(HERE, '..', '..', 'samples', 'running-config_sample.xml')
+
+
+class ApiError(Exception):
+    """An XML API error response."""
+    def __init__(self, msg, code=None, http_status=200, attrib=None):
+        super(ApiError, self).__init__(msg)
+        self.code = code
+        self.http_status = http_status
+        self.attrib = attrib or {}
+
+
+def parse_xpath(xpath):
+    """Splits an XML API xpath into (tag, predicate) steps.
+
+    Predicates can be [@name='x'], [text()='x'], or [.='x'], or an
+    expression of comparisons (path='x'), bare paths, and, or, not(), and
+    parentheses, such as [(from/member='trust' or to/member='trust') and
+    not(disabled='yes')].  A trailing /@name step is returned as
+    ('@name', None).
+    """
+    steps, buf, quote, depth = [], '', None, 0
+    for ch in xpath:
+        if quote:
+            buf += ch
+            if ch == quote:
+                quote = None
+        elif ch in ('"', "'"):
+            quote = ch
+            buf += ch
+        elif ch == '[':
+            depth += 1
+            buf += ch
+        elif ch == ']':
+            depth -= 1
+            buf += ch
+        elif ch == '/' and depth == 0:
+            if buf:
+                steps.append(buf)
+            buf = ''
+        else:
+            buf += ch
+    if buf:
+        steps.append(buf)
+
+    ans = []
+    for step in steps:
+        if '[' not in step:
+            ans.append((step, None))
+            continue
+        tag, pred = step.split('[', 1)
+        pred = pred[:-1]
+        simple = SIMPLE_PREDICATE.match(pred)
+        if simple is None:
+            ans.append((tag, ('expr', _PredicateParser(pred).parse())))
+        else:
+            value = simple.group(2) if simple.group(2) is not None else simple.group(3)
+            ans.append((tag, ('name' if simple.group(1) == '@name' else 'text', value)))
+    return ans
+
+
+SIMPLE_PREDICATE = re.compile(r"""^\s*(@name|text\(\)|\.)\s*=\s*(?:'([^']*)'|"([^"]*)")\s*$""")
+PREDICATE_TOKEN = re.compile(r"""\s*('[^']*'|"[^"]*"|\(|\)|=|[^\s()='"]+)""")
+
+
+class _PredicateParser(object):
+    """Parses a predicate expression into nested tuples."""
+    def __init__(self, text):
+        self.tokens = []
+        pos = 0
+        while text[pos:].strip():
+            m = PREDICATE_TOKEN.match(text, pos)
+            if m is None:
+                raise ApiError('Invalid predicate: {0}'.format(text), '12')
+            self.tokens.append(m.group(1))
+            pos = m.end()
+        self.text = text
+
+    def parse(self):
+        ans = self._or()
+        if self.tokens:
+            raise ApiError('Invalid predicate: {0}'.format(self.text), '12')
+        return ans
+
+    def _next(self, expected=None):
+        if not self.tokens or (expected is not None and self.tokens[0] != expected):
+            raise ApiError('Invalid predicate: {0}'.format(self.text), '12')
+        return self.tokens.pop(0)
+
+    def _or(self):
+        ans = self._and()
+        while self.tokens and self.tokens[0] == 'or':
+            self._next()
+            ans = ('or', ans, self._and())
+        return ans
+
+    def _and(self):
+        ans = self._unary()
+        while self.tokens and self.tokens[0] == 'and':
+            self._next()
+            ans = ('and', ans, self._unary())
+        return ans
+
+    def _unary(self):
+        tok = self._next()
+        if tok == 'not':
+            self._next('(')
+            ans = ('not', self._or())
+            self._next(')')
+            return ans
+        if tok == '(':
+            ans = self._or()
+            self._next(')')
+            return ans
+        if self.tokens and self.tokens[0] == '=':
+            self._next()
+            value = self._next()
+            if value[0] not in ('"', "'"):
+                raise ApiError('Invalid predicate: {0}'.format(self.text), '12')
+            return ('eq', tok, value[1:-1])
+        return ('exists', tok)
+
+
+def _values(elm, path):
+    """Returns the texts / attribute values at the relative `path`."""
+    nodes = [elm]
+    for step in path.split('/'):
+        if step.startswith('@'):
+            return [n.get(step[1:]) for n in nodes if n.get(step[1:]) is not None]
+        if step in ('.', 'text()'):
+            continue
+        nodes = [c for n in nodes for c in n if step in ('*', c.tag)]
+    return [n.text or '' for n in nodes]
+
+
+def _evaluate(elm, expr):
+    op = expr[0]
+    if op == 'or':
+        return _evaluate(elm, expr[1]) or _evaluate(elm, expr[2])
+    if op == 'and':
+        return _evaluate(elm, expr[1]) and _evaluate(elm, expr[2])
+    if op == 'not':
+        return not _evaluate(elm, expr[1])
+    if op == 'eq':
+        return expr[2] in _values(elm, expr[1])
+    return bool(_values(elm, expr[1]))
+
+
+def _matches(elm, tag, pred):
+    if tag != '*' and elm.tag != tag:
+        return False
+    if pred is None:
+        return True
+    if pred[0] == 'name':
+        return elm.get('name') == pred[1]
+    if pred[0] == 'expr':
+        return _evaluate(elm, pred[1])
+    return (elm.text or '') == pred[1]
+
+
+class FakeDevice(object):
+    """The in-memory device state.
+
+    Args:
+        config(str): Path to the XML config to load.
+        username(str): The admin username.
+        password(str): The admin password.
+        latency(float): Seconds to add to each request.
+        jitter(float): Max random seconds to add on top of `latency`.
+        commit_time(float): Seconds a commit job takes.
+        info(dict): Overrides for the "show system info" fields.
+    """
+    API_KEY = 'LUFRPT1mYWtlYXBpa2V5'
+
+    def __init__(self, config=DEFAULT_CONFIG, username='admin', password='admin',
+                 latency=0, jitter=0, commit_time=1, info=None):
+        self.config_file = config
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.jitter = jitter
+        self.commit_time = commit_time
+        self.info = {
+            'hostname': 'fakefw',
+            'ip-address': '127.0.0.1',
+            'model': 'PA-VM',
+            'serial': '007000000000001',
+            'sw-version': '9.0.0',
+            'multi-vsys': 'off',
+        }
+        self.info.update(info or {})
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.root = ET.parse(self.config_file).getroot()
+            self.dirty = False
+            self.jobs = {}
+            self.next_job = 1
+            self.stats = {
+                'requests': 0,
+                'errors': 0,
+                'request_bytes': 0,
+                'response_bytes': 0,
+                'elapsed': 0,
+                'by_type': {},
+            }
+
+    # Request handling.
+
+    def handle(self, query, request_bytes):
+        """Returns (http status, response XML) for a request."""
+        start = time.time()
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+
+        kind = query.get('type')
+        if kind == 'config':
+            kind = query.get('action')
+        status = 200
+        with self.lock:
+            try:
+                result, attrib = self._dispatch(query)
+                resp = ET.Element('response', dict({'status': 'success'}, **attrib))
+                if result is not None:
+                    resp.append(result)
+            except ApiError as e:
+                status = e.http_status
+                resp = ET.Element('response', dict({'status': 'error'}, **e.attrib))
+                if e.code is not None:
+                    resp.set('code', e.code)
+                msg = ET.SubElement(resp, 'msg')
+                ET.SubElement(msg, 'line').text = str(e)
+                self.stats['errors'] += 1
+            body = ET.tostring(resp)
+
+            info = self.stats['by_type'].setdefault(
+                kind or 'unknown', {'requests': 0, 'response_bytes': 0})
+            info['requests'] += 1
+            info['response_bytes'] += len(body)
+            self.stats['requests'] += 1
+            self.stats['request_bytes'] += request_bytes
+            self.stats['response_bytes'] += len(body)
+            self.stats['elapsed'] = round(self.stats['elapsed'] + time.time() - start, 4)
+
+        return status, body
+
+    def _dispatch(self, query):
+        kind = query.get('type')
+        if kind == 'keygen':
+            return self._keygen(query)
+        if query.get('key') != self.API_KEY:
+            raise ApiError('Invalid credentials.', '403', 403)
+        if kind == 'config':
+            action = query.get('action')
+            func = getattr(self, '_config_' + (action or '').replace('-', '_'), None)
+            if func is None:
+                raise ApiError('Unsupported action: {0}'.format(action), '12')
+            return func(query)
+        elif kind == 'op':
+            try:
+                cmd = ET.fromstring(query.get('cmd', ''))
+            except ET.ParseError:
+                raise ApiError('Malformed command', '17')
+            return self._op(cmd)
+        elif kind == 'commit':
+            return self._commit(query)
+        elif kind == 'user-id':
+            return None, {}
+        raise ApiError('Unsupported type: {0}'.format(kind), '12')
+
+    def _keygen(self, query):
+        if (query.get('user'), query.get('password')) != (self.username, self.password):
+            raise ApiError('Invalid credentials.', '403', 403)
+        result = ET.Element('result')
+        ET.SubElement(result, 'key').text = self.API_KEY
+        return result, {}
+
+    # Config tree helpers.
+
+    def _find(self, xpath):
+        """Returns the elements at `xpath` and if it ended in /@name."""
+        # No xpath means the whole config.
+        steps = parse_xpath(xpath or '/config')
+        if not steps or steps[0][0] != 'config':
+            raise ApiError('Invalid xpath: {0}'.format(xpath), '12')
+        name_only = steps[-1][0] == '@name'
+        if name_only:
+            steps = steps[:-1]
+        nodes = [self.root]
+        for tag, pred in steps[1:]:
+            nodes = [c for n in nodes for c in n if _matches(c, tag, pred)]
+        return nodes, name_only
+
+    def _find_or_create(self, xpath):
+        node = self.root
+        for tag, pred in parse_xpath(xpath)[1:]:
+            for c in node:
+                if _matches(c, tag, pred):
+                    node = c
+                    break
+            else:
+                c = ET.SubElement(node, tag)
+                if pred is not None and pred[0] == 'name':
+                    c.set('name', pred[1])
+                elif pred is not None and pred[0] == 'text':
+                    c.text = pred[1]
+                node = c
+        return node
+
+    def _parent_of(self, target):
+        for elm in self.root.iter():
+            for c in elm:
+                if c is target:
+                    return elm
+
+    @staticmethod
+    def _parse_element(text):
+        if not text:
+            raise ApiError('Missing element', '6')
+        try:
+            return list(ET.fromstring('<root>{0}</root>'.format(text)))
+        except ET.ParseError as e:
+            raise ApiError('Malformed element: {0}'.format(e), '6')
+
+    def _merge(self, dst, src):
+        dst.attrib.update(src.attrib)
+        if len(src) == 0 and src.text is not None and src.text.strip():
+            dst.text = src.text
+        for c in src:
+            for d in dst:
+                if d.tag != c.tag:
+                    continue
+                if c.tag == 'entry' and d.get('name') != c.get('name'):
+                    continue
+                if c.tag == 'member' and d.text != c.text:
+                    continue
+                self._merge(d, c)
+                break
+            else:
+                dst.append(copy.deepcopy(c))
+
+    # Config actions.
+
+    def _config_get(self, query):
+        nodes, name_only = self._find(query.get('xpath', ''))
+        result = ET.Element('result', {
+            'total-count': str(len(nodes)), 'count': str(len(nodes))})
+        for n in nodes:
+            if name_only:
+                ET.SubElement(result, n.tag, {'name': n.get('name', '')})
+            else:
+                result.append(copy.deepcopy(n))
+        return result, {} if nodes else {'code': '7'}
+
+    def _config_show(self, query):
+        nodes, name_only = self._find(query.get('xpath', ''))
+        if not nodes:
+            raise ApiError('No such node', '7')
+        return self._config_get(query)[0], {}
+
+    def _config_set(self, query):
+        node = self._find_or_create(query.get('xpath', ''))
+        wrapper = ET.Element(node.tag)
+        wrapper.extend(self._parse_element(query.get('element')))
+        self._merge(node, wrapper)
+        self.dirty = True
+        return self._msg('command succeeded'), {'code': '20'}
+
+    def _config_edit(self, query):
+        xpath = query.get('xpath', '')
+        elms = self._parse_element(query.get('element'))
+        if len(elms) != 1:
+            raise ApiError('edit requires exactly one element', '12')
+        nodes, _ = self._find(xpath)
+        if nodes:
+            parent = self._parent_of(nodes[0])
+            idx = list(parent).index(nodes[0])
+            parent.remove(nodes[0])
+            parent.insert(idx, elms[0])
+        else:
+            parent = self._find_or_create(xpath.rsplit('/', 1)[0])
+            parent.append(elms[0])
+        self.dirty = True
+        return self._msg('command succeeded'), {'code': '20'}
+
+    def _config_delete(self, query):
+        nodes, _ = self._find(query.get('xpath', ''))
+        for n in nodes:
+            self._parent_of(n).remove(n)
+        self.dirty = True
+        return self._msg('command succeeded'), {'code': '20' if nodes else '7'}
+
+    def _config_move(self, query):
+        nodes, _ = self._find(query.get('xpath', ''))
+        if not nodes:
+            raise ApiError('No such node', '7')
+        node = nodes[0]
+        parent = self._parent_of(node)
+        where = query.get('where')
+        parent.remove(node)
+        if where == 'top':
+            parent.insert(0, node)
+        elif where == 'bottom':
+            parent.append(node)
+        elif where in ('before', 'after'):
+            siblings = list(parent)
+            for idx, x in enumerate(siblings):
+                if x.tag == node.tag and x.get('name') == query.get('dst'):
+                    parent.insert(idx if where == 'before' else idx + 1, node)
+                    break
+            else:
+                parent.append(node)
+                raise ApiError('{0} does not exist'.format(query.get('dst')), '12')
+        else:
+            raise ApiError('Invalid where: {0}'.format(where), '12')
+        self.dirty = True
+        return self._msg('command succeeded'), {'code': '20'}
+
+    def _config_rename(self, query):
+        nodes, _ = self._find(query.get('xpath', ''))
+        if not nodes:
+            raise ApiError('No such node', '7')
+        nodes[0].set('name', query.get('newname'))
+        self.dirty = True
+        return self._msg('command succeeded'), {'code': '20'}
+
+    def _config_multi_config(self, query):
+        try:
+            request = ET.fromstring(query.get('element', ''))
+        except ET.ParseError as e:
+            raise ApiError('Malformed element: {0}'.format(e), '6')
+        backup = copy.deepcopy(self.root)
+        result = ET.Element('result')
+        for op in request:
+            sub = dict(op.attrib)
+            if len(op):
+                sub['element'] = ''.join(
+                    ET.tostring(x).decode('utf-8') for x in op)
+            try:
+                getattr(self, '_config_' + op.tag)(sub)
+            except (ApiError, AttributeError) as e:
+                self.root = backup
+                raise ApiError(str(e), '12', attrib={'id': op.get('id', '')})
+            ET.SubElement(result, 'response', {
+                'status': 'success', 'code': '20', 'id': op.get('id', '')})
+        return result, {'code': '20'}
+
+    # Op commands.
+
+    def _op(self, cmd):
+        path = []
+        node = cmd
+        while True:
+            path.append(node.tag)
+            children = list(node)
+            if len(children) != 1:
+                break
+            node = children[0]
+        path = ' '.join(path)
+
+        result = ET.Element('result')
+        if path == 'show system info':
+            system = ET.SubElement(result, 'system')
+            for k, v in self.info.items():
+                ET.SubElement(system, k).text = v
+        elif path.startswith('show jobs'):
+            jid = cmd.findtext('./jobs/id')
+            if jid is not None:
+                if jid not in self.jobs:
+                    raise ApiError('job {0} not found'.format(jid), '12')
+                result.append(self._job(jid))
+            else:
+                for jid in sorted(self.jobs, key=int):
+                    result.append(self._job(jid))
+        elif path.startswith('show config running'):
+            result.append(copy.deepcopy(self.root))
+        elif path.startswith('show config candidate'):
+            result.append(copy.deepcopy(self.root))
+        elif path == 'check pending-changes':
+            result.text = 'yes' if self.dirty else 'no'
+        elif path == 'check full-commit-required':
+            result.text = 'no'
+        elif path == 'show session info':
+            for k, v in (('num-active', '0'), ('num-max', '256000'), ('pps', '0'), ('kbps', '0')):
+                ET.SubElement(result, k).text = v
+        elif path == 'show session meter':
+            for vsys in self.root.findall('./devices/entry/vsys/entry'):
+                entry = ET.SubElement(result, 'entry')
+                ET.SubElement(entry, 'vsys').text = vsys.get('name')[4:]
+                ET.SubElement(entry, 'current').text = '0'
+                ET.SubElement(entry, 'maximum').text = '0'
+        elif path == 'show high-availability all':
+            ET.SubElement(result, 'enabled').text = 'no'
+        return result, {}
+
+    # Commit jobs.
+
+    def _commit(self, query):
+        if not self.dirty:
+            return self._msg('There are no changes to commit.'), {'code': '19'}
+        self.dirty = False
+        jid = str(self.next_job)
+        self.next_job += 1
+        action = query.get('action')
+        self.jobs[jid] = {
+            'type': 'CommitAll' if action == 'all' else 'Commit',
+            'start': time.time(),
+        }
+        result = self._msg('Commit job enqueued with jobid {0}'.format(jid))
+        ET.SubElement(result, 'job').text = jid
+        return result, {'code': '19'}
+
+    def _job(self, jid):
+        info = self.jobs[jid]
+        done = time.time() - info['start'] >= self.commit_time
+        fmt = '%Y/%m/%d %H:%M:%S'
+        tenq = time.strftime(fmt, time.localtime(info['start']))
+        tfin = time.strftime(fmt, time.localtime(info['start'] + self.commit_time))
+        job = ET.Element('job')
+        fields = [
+            ('tenq', tenq),
+            ('tfin', tfin if done else None),
+            ('id', jid),
+            ('user', self.username),
+            ('type', info['type']),
+            ('status', 'FIN' if done else 'ACT'),
+            ('result', 'OK' if done else 'PEND'),
+            ('progress', '100' if done else '50'),
+            ('warnings', None),
+        ]
+        for k, v in fields:
+            ET.SubElement(job, k).text = v
+        details = ET.SubElement(job, 'details')
+        if done:
+            ET.SubElement(details, 'line').text = 'Configuration committed successfully'
+        if info['type'] == 'CommitAll':
+            entry = ET.SubElement(ET.SubElement(job, 'devices'), 'entry')
+            for k, v in [
+                    ('serial-no', self.info['serial']),
+                    ('devicename', self.info['hostname']),
+                    ('result', 'OK' if done else 'PEND'),
+                    ('status', 'commit succeeded' if done else 'commit pending'),
+                    ('tstart', tenq),
+                    ('tfin', tfin if done else None)]:
+                ET.SubElement(entry, k).text = v
+        return job
+
+    @staticmethod
+    def _msg(text):
+        result = ET.Element('result')
+        msg = ET.SubElement(result, 'msg')
+        ET.SubElement(msg, 'line').text = text
+        return result
+
+
+class Handler(BaseHTTPRequestHandler):
+    device = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status, body, content_type='application/xml; charset=utf-8'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _query(self):
+        url = urlparse(self.path)
+        raw = url.query
+        if self.command == 'POST':
+            length = int(self.headers.get('Content-Length') or 0)
+            data = self.rfile.read(length).decode('utf-8')
+            raw = '&'.join(x for x in (raw, data) if x)
+        query = dict((k, v[-1]) for k, v in parse_qs(raw, keep_blank_values=True).items())
+        return url.path, query, len(raw)
+
+    def _handle(self):
+        path, query, size = self._query()
+        if path == '/_fake/stats':
+            body = json.dumps(self.device.stats).encode('utf-8')
+            return self._send(200, body, 'application/json')
+        elif path == '/_fake/reset':
+            self.device.reset()
+            return self._send(200, b'{}', 'application/json')
+        elif path.rstrip('/') != '/api':
+            return self._send(404, b'not found', 'text/plain')
+        status, body = self.device.handle(query, size)
+        self._send(status, body)
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def make_cert(directory):
+    """Creates a self signed cert + key with openssl, returning the path."""
+    path = os.path.join(directory, 'fakeapi.pem')
+    subprocess.check_call([
+        'openssl', 'req', '-x509', '-nodes', '-newkey', 'rsa:2048',
+        '-days', '30', '-subj', '/CN=localhost',
+        '-keyout', path, '-out', path,
+    ], stdout=subprocess.DEVNULL if hasattr(subprocess, 'DEVNULL') else None,
+        stderr=subprocess.STDOUT)
+    return path
+
+
+def serve(device, host='127.0.0.1', port=8443, cert=None, plain=False):
+    """Returns a started server (in a daemon thread) for `device`."""
+    handler = type('BoundHandler', (Handler, ), {'device': device})
+    httpd = Server((host, port), handler)
+    if not plain:
+        if cert is None:
+            cert = make_cert(tempfile.mkdtemp(prefix='fakeapi'))
+        if hasattr(ssl, 'SSLContext'):
+            ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER if hasattr(ssl, 'PROTOCOL_TLS_SERVER') else ssl.PROTOCOL_SSLv23)
+            ctx.load_cert_chain(cert)
+            httpd.socket = ctx.wrap_socket(httpd.socket, server_side=True)
+        else:
+            httpd.socket = ssl.wrap_socket(httpd.socket, certfile=cert, server_side=True)
+    t = threading.Thread(target=httpd.serve_forever)
+    t.daemon = True
+    t.start()
+    return httpd
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake PAN-OS XML API server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8443)
+    parser.add_argument('--config', default=DEFAULT_CONFIG,
+                        help='XML config to load (default: the sample running config)')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='seconds added to each request')
+    parser.add_argument('--jitter', type=float, default=0,
+                        help='max random seconds added on top of --latency')
+    parser.add_argument('--commit-time', type=float, default=1,
+                        help='seconds each commit job takes')
+    parser.add_argument('--version', default='9.0.0', help='PAN-OS version to report')
+    parser.add_argument('--cert', help='PEM with cert and key (default: generate one)')
+    parser.add_argument('--plain', action='store_true', help='serve plain HTTP')
+    args = parser.parse_args()
+
+    device = FakeDevice(
+        args.config, args.username, args.password, args.latency, args.jitter,
+        args.commit_time, {'sw-version': args.version})
+    httpd = serve(device, args.host, args.port, args.cert, args.plain)
+    print('Serving on {0}://{1}:{2}'.format(
+        'http' if args.plain else 'https', args.host, args.port))
+    sys.stdout.flush()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        httpd.shutdown()
+
+
+if __name__ == '__main__':
+    main()